@@ -131,4 +131,109 @@ CREATE TABLE user_activity_history(
     CONSTRAINT user_activity_history_userid_fkey FOREIGN key(userid) REFERENCES users(id) ON DELETE CASCADE,
     CONSTRAINT user_activity_history_entitytype_fkey FOREIGN key(entitytype) REFERENCES entity(id),
     CONSTRAINT user_activity_history_activitytype_fkey FOREIGN key(activitytype) REFERENCES activity(id)
-);
\ No newline at end of file
+);
+
+-- Trigram indexes for title/synopsis search (SEARCH_BACKEND=postgres)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS anime_title_trgm_idx ON anime USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS manga_title_trgm_idx ON manga USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS anime_synopsis_trgm_idx ON anime USING gin (synopsis gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS manga_synopsis_trgm_idx ON manga USING gin (synopsis gin_trgm_ops);
+
+-- Release-date indexes for the recommender's year filters and "latest" ordering
+CREATE INDEX IF NOT EXISTS anime_start_date_idx ON anime (start_date);
+CREATE INDEX IF NOT EXISTS manga_start_date_idx ON manga (start_date);
+
+-- MAL ids: the ingest upserts on these instead of deduplicating by title.
+-- Rows loaded before this column existed keep NULL until the ingest matches them by title.
+ALTER TABLE anime ADD COLUMN IF NOT EXISTS mal_id INT;
+ALTER TABLE manga ADD COLUMN IF NOT EXISTS mal_id INT;
+CREATE UNIQUE INDEX IF NOT EXISTS anime_mal_id_key ON anime (mal_id);
+CREATE UNIQUE INDEX IF NOT EXISTS manga_mal_id_key ON manga (mal_id);
+CREATE INDEX IF NOT EXISTS anime_unkeyed_title_idx ON anime (title) WHERE mal_id IS NULL;
+CREATE INDEX IF NOT EXISTS manga_unkeyed_title_idx ON manga (title) WHERE mal_id IS NULL;
+
+-- Columns the ingest writes beyond the original anime table, and ids for newly inserted titles.
+-- The first loads stored MAL ids in id, so both sequences start after the largest id.
+ALTER TABLE anime ADD COLUMN IF NOT EXISTS agerating VARCHAR(50);
+ALTER TABLE anime ADD COLUMN IF NOT EXISTS studios TEXT;
+CREATE SEQUENCE IF NOT EXISTS anime_id_seq OWNED BY anime.id;
+ALTER TABLE anime ALTER COLUMN id SET DEFAULT nextval('anime_id_seq');
+SELECT setval('anime_id_seq', COALESCE((SELECT max(id) FROM anime), 0) + 1, false);
+SELECT setval(pg_get_serial_sequence('manga', 'id'), COALESCE((SELECT max(id) FROM manga), 0) + 1, false);
+
+-- Delta sync: md5 of each ingested record, so unchanged titles are not rewritten
+ALTER TABLE anime ADD COLUMN IF NOT EXISTS record_hash CHAR(32);
+ALTER TABLE manga ADD COLUMN IF NOT EXISTS record_hash CHAR(32);
+
+-- Genre, studio and author dimensions. The ingest derives them from the comma-separated
+-- genres/studios/authors columns; fill them for existing rows with
+-- python data_ingest.py --rebuild-dimensions
+CREATE TABLE IF NOT EXISTS genre (
+    id     SERIAL PRIMARY KEY,
+    name   VARCHAR(100) NOT NULL UNIQUE,
+    slug   VARCHAR(100) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS studio (
+    id     SERIAL PRIMARY KEY,
+    name   VARCHAR(255) NOT NULL UNIQUE,
+    slug   VARCHAR(255) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS author (
+    id     SERIAL PRIMARY KEY,
+    name   VARCHAR(255) NOT NULL UNIQUE,
+    slug   VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS item_genre (
+    entity_type  VARCHAR(20) NOT NULL CHECK (entity_type IN ('Anime', 'Manga')),
+    item_id      INT NOT NULL,
+    genre_id     INT NOT NULL REFERENCES genre(id),
+    PRIMARY KEY (entity_type, item_id, genre_id)
+);
+CREATE TABLE IF NOT EXISTS item_studio (
+    entity_type  VARCHAR(20) NOT NULL CHECK (entity_type IN ('Anime', 'Manga')),
+    item_id      INT NOT NULL,
+    studio_id    INT NOT NULL REFERENCES studio(id),
+    PRIMARY KEY (entity_type, item_id, studio_id)
+);
+CREATE TABLE IF NOT EXISTS item_author (
+    entity_type  VARCHAR(20) NOT NULL CHECK (entity_type IN ('Anime', 'Manga')),
+    item_id      INT NOT NULL,
+    author_id    INT NOT NULL REFERENCES author(id),
+    PRIMARY KEY (entity_type, item_id, author_id)
+);
+
+-- Reverse lookups used by the recommender's semi-joins ("items with genre X")
+CREATE INDEX IF NOT EXISTS genre_slug_idx ON genre (slug);
+CREATE INDEX IF NOT EXISTS item_genre_genre_idx ON item_genre (entity_type, genre_id, item_id);
+CREATE INDEX IF NOT EXISTS item_studio_studio_idx ON item_studio (entity_type, studio_id, item_id);
+CREATE INDEX IF NOT EXISTS item_author_author_idx ON item_author (entity_type, author_id, item_id);
+
+-- Embedding pipeline (embedding_pipeline.py). Vectors are cached by sha256 of (model, normalized text)
+-- as raw float32 bytes. entity_embedding records which cached text each title or review was last
+-- embedded from, so unchanged ones are skipped on re-runs
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    text_hash   CHAR(64) PRIMARY KEY,
+    model       VARCHAR(100) NOT NULL,
+    dim         INT NOT NULL,
+    vector      BYTEA NOT NULL,
+    created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS entity_embedding (
+    entity_type  VARCHAR(20) NOT NULL CHECK (entity_type IN ('Anime', 'Manga', 'Review')),
+    entity_id    INT NOT NULL,
+    model        VARCHAR(100) NOT NULL,
+    text_hash    CHAR(64) NOT NULL REFERENCES embedding_cache(text_hash),
+    updated_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (entity_type, entity_id, model)
+);
+
+-- Chatbot query parses (query_cache.py), shared by app workers when QUERY_CACHE_BACKEND=postgres.
+-- query_hash is the sha256 of the parser version and the normalized message
+CREATE TABLE IF NOT EXISTS query_cache (
+    query_hash  CHAR(64) PRIMARY KEY,
+    message     TEXT NOT NULL,
+    parsed      JSONB NOT NULL,
+    created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -1,99 +1,21 @@
 import streamlit as st
-from PIL import Image
 import pandas as pd
-import streamlit.components.v1 as components
 from sqlalchemy import text
 
-#Import modules
-from modules.anime_page import anime, anime_details
-from modules.manga_page import manga, manga_details
-from modules.community_page import community
-from modules.recommender_page import recommender
-from modules.auth_page import signup, login, reset_password, forgot_password
+#Page modules are imported lazily by page_loader when their operation is first opened
+from page_loader import get_page
 from modules.user_log import log_user_activity
-from modules.user_profile import profile
-from modules.admin_page import admin_panel
 from config import Config
 
-from db_utils import get_connection, load_table_as_df
-
-
-
-
-def create_carousel_html(items, title_field="title", img_field="main_picture", badge_field=None, badge_prefix="⭐"):
-    html = """
-    <style>
-    .carousel-container {
-        display: flex;
-        overflow-x: auto;
-        gap: 14px;
-        padding: 10px;
-        scroll-behavior: smooth;
-    }
-    .carousel-container::-webkit-scrollbar {
-        height: 8px;
-    }
-    .carousel-container::-webkit-scrollbar-thumb {
-        background-color: #666;
-        border-radius: 10px;
-    }
-    .carousel-item {
-        flex: 0 0 auto;
-        width: 200px;
-        height: 280px;
-        border-radius: 12px;
-        overflow: hidden;
-        position: relative;
-        box-shadow: 0 4px 12px rgba(0,0,0,0.35);
-        transition: transform 0.25s ease;
-    }
-    .carousel-item:hover {
-        transform: scale(1.05);
-    }
-    .carousel-item img {
-        width: 100%;
-        height: 100%;
-        object-fit: cover;
-    }
-    .carousel-caption {
-        position: absolute;
-        bottom: 0;
-        left: 0;
-        right: 0;
-        padding: 8px;
-        background: linear-gradient(180deg, rgba(0,0,0,0.0), rgba(0,0,0,0.7));
-        color: #fff;
-        font-size: 14px;
-        text-align: center;
-    }
-    .rating-badge {
-        position: absolute;
-        top: 8px;
-        left: 8px;
-        background: rgba(0,0,0,0.7);
-        color: #ffd700;
-        padding: 3px 8px;
-        border-radius: 8px;
-        font-size: 15px;
-    }
-    </style>
-    <div class="carousel-container">
-    """
-    for _, row in items.iterrows():
-        img = row[img_field]
-        title = str(row[title_field]).replace('"', '&quot;')
-        badge = ""
-        if badge_field and not pd.isna(row.get(badge_field)):
-            badge = f'<div class="rating-badge">{badge_prefix} {row[badge_field]}</div>'
-        html += f"""
-        <div class="carousel-item">
-            <img src="{img}" alt="{title}">
-            {badge}
-            <div class="carousel-caption">{title}</div>
-        </div>
-        """
-    html += "</div>"
-    return html
+from db_utils import get_connection
+from catalog_store import get_catalog_store
+from catalog import load_catalog_table
+from catalog_snapshot import get_catalog_snapshots, load_catalog
+from search_index import get_title_index
+from pg_search import search_titles
+from rankings import get_rankings
+from carousel import CAROUSEL_CSS, get_carousel_html
+from image_cache import get_image_cache
 
 
 if __name__ == '__main__':
@@ -113,14 +35,25 @@ if __name__ == '__main__':
                             Config.DB_PORT,
                             Config.DB_NAME)
 
+    #catalog tables are shared by every session and only reloaded when their TTL expires;
+    #anime and manga start from the ingest's snapshot while it matches the database
+    catalog = get_catalog_store(default_ttl=Config.CATALOG_TTL_SECONDS)
+    snapshots = get_catalog_snapshots(Config.CATALOG_SNAPSHOT_DIR) if Config.CATALOG_SNAPSHOTS else None
+    catalog.register('anime', lambda: load_catalog(engine, 'anime', snapshots))
+    catalog.register('manga', lambda: load_catalog(engine, 'manga', snapshots))
+    catalog.register('users', lambda: load_catalog_table(engine, 'users'), ttl=Config.USERS_TTL_SECONDS)
+
+    #pictures are served from the local thumbnail cache once downloaded
+    images = get_image_cache(mode=Config.IMAGE_CACHE_MODE)
+
     #anime data
-    anime_df = load_table_as_df(engine, 'anime')
+    anime_df = catalog.get('anime')
 
     #manga data
-    manga_df = load_table_as_df(engine, 'manga')
+    manga_df = catalog.get('manga')
 
     #user data
-    user_df =  load_table_as_df(engine, 'users')
+    user_df = catalog.get('users')
 
     #list of genres
     genres_list = ["Action", "Adventure", "Comedy", "Drama", "Fantasy", "Slice of Life", "Horror",
@@ -135,15 +68,15 @@ if __name__ == '__main__':
     with st.sidebar:
 
         if not st.session_state.logged_in:
-            image = Image.open("images/anime_background.jpeg")
-            st.image(image, use_container_width=True)
+            st.image("images/anime_background.jpeg", use_container_width=True)
             st.title(':red[Welcome to OtakuConnect] 🚀')
             if st.button("Home 🏠", type='primary', use_container_width=True):
                 st.session_state.operation = "home"
 
             if st.button("Log in", type='primary', use_container_width=True):
                 st.session_state.operation = "login"
-                user_df = load_table_as_df(engine, 'users')
+                catalog.invalidate('users')
+                user_df = catalog.get('users')
 
             if st.button("Sign Up", type='primary', use_container_width=True):
                 st.session_state.operation = "signup"
@@ -207,10 +140,9 @@ if __name__ == '__main__':
         # 🔍 Search box
         search_term = st.text_input("Search Anime or Manga by Name").strip()
 
-        # Convert dates safely
-        anime_df['start_date'] = pd.to_datetime(anime_df['start_date'], errors='coerce')
-        manga_df['start_date'] = pd.to_datetime(manga_df['start_date'], errors='coerce')
-        today = pd.Timestamp.today()
+        # Top-N and latest slices are precomputed once per catalog version
+        anime_rankings = get_rankings(catalog, 'anime', anime_df, recent_months=3)
+        manga_rankings = get_rankings(catalog, 'manga', manga_df, recent_months=12)
 
         # --- Latest Animes Panel -----------------------------------------
         st.markdown("""
@@ -234,18 +166,26 @@ if __name__ == '__main__':
             color: #e63946;
             margin-top: 8px;
         }
+        """ + CAROUSEL_CSS + """
         </style>
         """, unsafe_allow_html=True)
 
         items_per_row = 3
+        search_limit = 30
 
         # --- If user entered a search term ---
         if search_term:
             st.subheader(f"🔍 Search Results for '{search_term}'")
 
-            # Filter both anime & manga by title (case-insensitive)
-            search_anime = anime_df[anime_df['title'].str.contains(search_term, case=False, na=False)]
-            search_manga = manga_df[manga_df['title'].str.contains(search_term, case=False, na=False)]
+            # Best matches first for both anime & manga (case and punctuation insensitive)
+            if Config.SEARCH_BACKEND == "postgres":
+                search_anime, _ = search_titles(engine, 'anime', search_term, limit=search_limit)
+                search_manga, _ = search_titles(engine, 'manga', search_term, limit=search_limit)
+            else:
+                anime_index = get_title_index(catalog, 'anime', anime_df)
+                manga_index = get_title_index(catalog, 'manga', manga_df)
+                search_anime = anime_df.iloc[anime_index.search_rows(search_term, limit=search_limit)]
+                search_manga = manga_df.iloc[manga_index.search_rows(search_term, limit=search_limit)]
 
             if search_anime.empty and search_manga.empty:
                 st.info("No matching Anime or Manga found.")
@@ -257,9 +197,9 @@ if __name__ == '__main__':
                         cols = st.columns(items_per_row)
                         for col, (_, anime_row) in zip(cols, row.iterrows()):
                             with col:
-                                if pd.notna(anime_row["main_picture"]) and str(anime_row["main_picture"]).strip():
+                                if anime_row["has_picture"]:
                                     st.markdown(
-                                        f'<img class="anime-img" src="{anime_row["main_picture"]}" alt="{anime_row["title"]}">',
+                                        f'<img class="anime-img" src="{images.thumbnail_url(anime_row["main_picture"])}" alt="{anime_row["title"]}">',
                                         unsafe_allow_html=True
                                     )
                                 if st.button(anime_row["title"], key=f"anime_search_{anime_row['title']}", use_container_width=True):
@@ -274,9 +214,9 @@ if __name__ == '__main__':
                         cols = st.columns(items_per_row)
                         for col, (_, manga_row) in zip(cols, row.iterrows()):
                             with col:
-                                if pd.notna(manga_row["main_picture"]) and str(manga_row["main_picture"]).strip():
+                                if manga_row["has_picture"]:
                                     st.markdown(
-                                        f'<img class="manga-img" src="{manga_row["main_picture"]}" alt="{manga_row["title"]}">',
+                                        f'<img class="manga-img" src="{images.thumbnail_url(manga_row["main_picture"])}" alt="{manga_row["title"]}">',
                                         unsafe_allow_html=True
                                     )
                                 if st.button(manga_row["title"], key=f"manga_search_{manga_row['title']}", use_container_width=True):
@@ -288,22 +228,18 @@ if __name__ == '__main__':
         else:
             with st.container(border=True):
                 # --- Top Rated ---
-                top_rated_anime = anime_df.sort_values(by='mean', ascending=False).head(20)
+                top_rated_anime = anime_rankings['top_rated']
                 st.markdown("### 🔥 :red[Top Rated Animes]")
-                components.html(create_carousel_html(top_rated_anime, badge_field="mean"), height=300, scrolling=False)
+                st.markdown(get_carousel_html(catalog, 'anime', 'top_rated', top_rated_anime, badge_field="mean", df=anime_df, images=images), unsafe_allow_html=True)
                 
                 # --- Most Viewed Animes ---
-                most_viewed_anime = anime_df.sort_values(by='popularity', ascending=False).head(20)
+                most_viewed_anime = anime_rankings['most_viewed']
                 st.markdown("### 👑 :red[Most Viewed Animes]")
-                components.html(create_carousel_html(most_viewed_anime, badge_field="popularity", badge_prefix="👁"), height=300, scrolling=False)
+                st.markdown(get_carousel_html(catalog, 'anime', 'most_viewed', most_viewed_anime, badge_field="popularity", badge_prefix="👁", df=anime_df, images=images), unsafe_allow_html=True)
             
 
-            # Latest Anime (released within last 2 months)
-            latest_anime = anime_df[
-                (anime_df['start_date'] > today - pd.DateOffset(months=3)) &
-                (anime_df['start_date'] <= today)
-            ][['title', 'main_picture']].dropna(subset=['main_picture'])
-            latest_anime = latest_anime[latest_anime['main_picture'].apply(lambda x: isinstance(x, str) and x.strip() != '')]
+            # Latest Anime (released within last 3 months)
+            latest_anime = anime_rankings['recent']
 
             st.subheader(":red[Latest Animes]")
             for i in range(0, len(latest_anime), items_per_row):
@@ -311,9 +247,9 @@ if __name__ == '__main__':
                 cols = st.columns(items_per_row)
                 for col, (_, anime_row) in zip(cols, row.iterrows()):
                     with col:
-                        if pd.notna(anime_row["main_picture"]) and str(anime_row["main_picture"]).strip():
+                        if anime_row["has_picture"]:
                             st.markdown(
-                                f'<img class="anime-img" src="{anime_row["main_picture"]}" alt="{anime_row["title"]}">',
+                                f'<img class="anime-img" src="{images.thumbnail_url(anime_row["main_picture"])}" alt="{anime_row["title"]}">',
                                 unsafe_allow_html=True
                             )
                         if st.button(anime_row["title"], key=f"anime_{anime_row['title']}", use_container_width=True):
@@ -327,22 +263,18 @@ if __name__ == '__main__':
                 
                 st.write(" ")
                 # --- Top Rated Mangas ---
-                top_rated_manga = manga_df.sort_values(by='mean', ascending=False).head(20)
+                top_rated_manga = manga_rankings['top_rated']
                 st.markdown("### 📖 :red[Top Rated Mangas]")
-                components.html(create_carousel_html(top_rated_manga, badge_field="mean"), height=300, scrolling=False)
+                st.markdown(get_carousel_html(catalog, 'manga', 'top_rated', top_rated_manga, badge_field="mean", df=manga_df, images=images), unsafe_allow_html=True)
 
                 # --- Most Viewed Mangas ---
-                most_viewed_manga = manga_df.sort_values(by='popularity', ascending=False).head(20)
+                most_viewed_manga = manga_rankings['most_viewed']
                 st.markdown("### 🌟 :red[Most Viewed Mangas]")
-                components.html(create_carousel_html(most_viewed_manga, badge_field="popularity", badge_prefix="👁"), height=300, scrolling=False)
+                st.markdown(get_carousel_html(catalog, 'manga', 'most_viewed', most_viewed_manga, badge_field="popularity", badge_prefix="👁", df=manga_df, images=images), unsafe_allow_html=True)
             
 
             # Latest Manga (released within last 12 months)
-            latest_manga = manga_df[
-                (manga_df['start_date'] > today - pd.DateOffset(months=12)) &
-                (manga_df['start_date'] <= today)
-            ][['title', 'main_picture']].dropna(subset=['main_picture'])
-            latest_manga = latest_manga[latest_manga['main_picture'].apply(lambda x: isinstance(x, str) and x.strip() != '')]
+            latest_manga = manga_rankings['recent']
 
             st.subheader(":red[Latest Mangas]")
             for i in range(0, len(latest_manga), items_per_row):
@@ -350,9 +282,9 @@ if __name__ == '__main__':
                 cols = st.columns(items_per_row)
                 for col, (_, manga_row) in zip(cols, row.iterrows()):
                     with col:
-                        if pd.notna(manga_row["main_picture"]) and str(manga_row["main_picture"]).strip():
+                        if manga_row["has_picture"]:
                             st.markdown(
-                                f'<img class="manga-img" src="{manga_row["main_picture"]}" alt="{manga_row["title"]}">',
+                                f'<img class="manga-img" src="{images.thumbnail_url(manga_row["main_picture"])}" alt="{manga_row["title"]}">',
                                 unsafe_allow_html=True
                             )
                         if st.button(manga_row["title"], key=f"manga_{manga_row['title']}", use_container_width=True):
@@ -361,23 +293,23 @@ if __name__ == '__main__':
                             st.rerun()
        
     elif st.session_state.operation == 'anime':
-        anime(anime_df)
+        get_page('anime')(anime_df, engine)
 
     elif st.session_state.operation == 'anime_details':
-        anime_details(anime_df, engine, log_user_activity)
+        get_page('anime_details')(anime_df, engine, log_user_activity)
 
     elif st.session_state.operation == 'manga':
-        manga(manga_df)
+        get_page('manga')(manga_df, engine)
 
     elif st.session_state.operation == 'manga_details':
-        manga_details(manga_df, engine, log_user_activity)
+        get_page('manga_details')(manga_df, engine, log_user_activity)
 
     elif st.session_state.operation == 'community':
-        community(user_df, engine)
+        get_page('community')(user_df, engine)
 
     elif st.session_state.operation == 'recommender':
         if st.session_state.logged_in:
-            recommender(anime_df, manga_df, engine)
+            get_page('recommender')(anime_df, manga_df, engine)
         else:
             st.warning("Please log in to use Shuffle For Me.")
             if st.button("Login Now"):
@@ -385,22 +317,22 @@ if __name__ == '__main__':
                 st.rerun()
                 
     elif st.session_state.operation == "admin_panel":
-        admin_panel(engine)
+        get_page('admin_panel')(engine)
         
     elif st.session_state.operation == 'login':
-        login(engine)
+        get_page('login')(engine)
 
     elif st.session_state.operation == 'signup':
-        signup(engine, user_df, genres_list)
+        get_page('signup')(engine, user_df, genres_list)
 
     elif st.session_state.operation == 'edit_profile':
-        profile(user_df, engine)
+        get_page('edit_profile')(user_df, engine)
 
     elif st.session_state.operation == "forgot_password":
-        forgot_password(engine)
+        get_page('forgot_password')(engine)
 
     elif st.session_state.operation == "reset_password":
-        reset_password(engine)
+        get_page('reset_password')(engine)
 
 
 
@@ -0,0 +1,329 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from catalog_snapshot import SNAPSHOT_TABLES, load_catalog
+from catalog_dimensions import entity_type
+from embeddings import build_content_store, build_model_store, get_item_embeddings, load_entity_vectors
+from genre_index import GenreIndex
+from pg_vectors import sync_item_vectors
+
+# <repo>/data/ann, independent of the directory the app is started from
+DEFAULT_INDEX_DIR = Path(__file__).resolve().parents[2] / "data" / "ann"
+
+ANN_BACKENDS = ("exact", "hnsw", "faiss")
+
+# Filters letting fewer rows through than this (or this share of the catalog)
+# are searched exactly over the survivors: cheaper than a filtered graph walk
+EXACT_SEARCH_ROWS = 4096
+EXACT_SEARCH_FRACTION = 0.05
+# Candidates fetched from the index per requested result, re-ranked exactly
+OVERSAMPLE = 3
+# Saved index layout; format 1 also indexed titles without vectors, so those saves are rebuilt
+INDEX_FORMAT = 2
+
+
+class HnswBackend:
+    """hnswlib HNSW graph over inner product, labelled by catalog id."""
+
+    name = "hnsw"
+    suffix = ".hnsw"
+
+    def __init__(self, dim, m=16, ef_construction=200, ef_search=64):
+        import hnswlib  # optional: only needed when RECOMMENDER_INDEX=hnsw
+
+        self.dim = dim
+        self.ef_search = ef_search
+        self.params = {"m": m, "ef_construction": ef_construction}
+        self.index = hnswlib.Index(space="ip", dim=dim)
+        self.initialized = False
+
+    def add(self, ids, vectors):
+        if not self.initialized:
+            self.index.init_index(max_elements=max(len(ids), 1024), M=self.params["m"],
+                                  ef_construction=self.params["ef_construction"])
+            self.initialized = True
+        needed = self.index.get_current_count() + len(ids)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(max(needed, 2 * self.index.get_max_elements()))
+        self.index.add_items(vectors, ids)
+
+    def search(self, query, k, allowed_ids=None):
+        allowed = set(allowed_ids.tolist()) if allowed_ids is not None else None
+        self.index.set_ef(max(self.ef_search, k))
+        labels, _ = self.index.knn_query(query[None], k=k,
+                                         filter=(lambda label: label in allowed) if allowed is not None else None)
+        return labels[0].astype(np.int64)
+
+    def __len__(self):
+        return self.index.get_current_count()
+
+    def save(self, path):
+        self.index.save_index(str(path))
+
+    @classmethod
+    def load(cls, path, dim, **params):
+        backend = cls(dim, **params)
+        backend.index.load_index(str(path))
+        backend.initialized = True
+        return backend
+
+
+class FaissBackend:
+    """faiss index (HNSW by default, or an IVF-PQ factory string) over inner product, keyed by catalog id."""
+
+    name = "faiss"
+    suffix = ".faiss"
+
+    def __init__(self, dim, description="HNSW32", ef_search=64, nprobe=16, index=None):
+        import faiss  # optional: only needed when RECOMMENDER_INDEX=faiss
+
+        self.faiss = faiss
+        self.dim = dim
+        self.description = description
+        self.ef_search = ef_search
+        self.nprobe = nprobe
+        if index is None:
+            index = faiss.IndexIDMap2(faiss.index_factory(dim, description, faiss.METRIC_INNER_PRODUCT))
+        self.index = index
+
+    def add(self, ids, vectors):
+        if not self.index.is_trained:
+            # IVF/PQ learn their coarse centroids and codebooks from the first batch
+            self.index.train(vectors)
+        self.index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+
+    def search(self, query, k, allowed_ids=None):
+        faiss = self.faiss
+        if "IVF" in self.description:
+            params = faiss.SearchParametersIVF()
+            params.nprobe = self.nprobe
+        else:
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = max(self.ef_search, k)
+        if allowed_ids is not None:
+            selector = faiss.IDSelectorBatch(np.asarray(allowed_ids, dtype=np.int64))
+            params.sel = selector
+        _, labels = self.index.search(query[None], k, params=params)
+        labels = labels[0]
+        return labels[labels >= 0]
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def save(self, path):
+        self.faiss.write_index(self.index, str(path))
+
+    @classmethod
+    def load(cls, path, dim, **params):
+        import faiss
+
+        return cls(dim, index=faiss.read_index(str(path)), **params)
+
+
+BACKENDS = {"hnsw": HnswBackend, "faiss": FaissBackend}
+
+
+def metadata_mask(df, media_types=None, statuses=None, min_rating=None):
+    """Boolean mask over a catalog table's rows for the recommender's metadata pre-filter.
+
+    Anime and manga live in separate tables (and indexes); ``media_types``
+    narrows further on MAL's ``media_type`` column where the table has one.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if media_types and "media_type" in df:
+        mask &= df["media_type"].isin(media_types).to_numpy(dtype=bool)
+    if statuses:
+        mask &= df["status"].isin(statuses).to_numpy(dtype=bool)
+    if min_rating is not None:
+        mask &= (df["mean"] >= min_rating).fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+class ItemIndex:
+    """Nearest-neighbour search over an EmbeddingStore, optionally through an ANN backend.
+
+    The ANN index only proposes candidates: they are re-scored with the
+    store's current vectors and ranked exactly, so scores and tie-breaking
+    match exact search and an index built from slightly older
+    vectors costs recall, not correctness. Without a backend, or when the
+    pre-filter leaves few enough rows, the store is searched exactly.
+    """
+
+    def __init__(self, store, backend=None, indexed_ids=()):
+        self.store = store
+        self.backend = backend
+        self.indexed_ids = np.sort(np.asarray(indexed_ids, dtype=np.int64))
+
+    @property
+    def name(self):
+        return self.backend.name if self.backend is not None else "exact"
+
+    def add(self, ids=None):
+        """Index the store's rows for ``ids`` (default: every id not indexed yet); returns how many were added.
+
+        Rows without a vector yet (titles the pipeline has not embedded) are
+        left out, so a later update picks them up once they have one.
+        """
+        if self.backend is None:
+            return 0
+        ids = self.store.ids if ids is None else np.asarray(list(ids), dtype=np.int64)
+        positions = self.store.positions(ids[ids >= 0])
+        positions = positions[~self.store.empty[positions]]
+        new_ids = np.setdiff1d(self.store.ids[positions], self.indexed_ids)
+        if not len(new_ids):
+            return 0
+        self.backend.add(new_ids, self.store.vectors[self.store.positions(new_ids)])
+        self.indexed_ids = np.union1d(self.indexed_ids, new_ids)
+        return len(new_ids)
+
+    def search(self, query, k, mask=None, exclude_ids=()):
+        """Positions and scores of the ``k`` items most similar to ``query``, as ``EmbeddingStore.top_k``."""
+        store = self.store
+        allowed = np.ones(len(store), dtype=bool) if mask is None else np.asarray(mask, dtype=bool).copy()
+        excluded = store.positions(exclude_ids) if len(exclude_ids) else np.empty(0, dtype=np.int64)
+        filtered = not allowed.all()
+        allowed[store.empty] = False
+        allowed[excluded] = False
+        candidates = np.flatnonzero(allowed)
+        k = min(k, len(candidates))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if self.backend is None or len(candidates) <= max(EXACT_SEARCH_ROWS, EXACT_SEARCH_FRACTION * len(store)):
+            return store.rank(query, candidates, k)
+
+        # Unfiltered searches drop excluded items afterwards; filtered ones leave them out of the filter
+        fetch = min(k * OVERSAMPLE, len(candidates)) if filtered \
+            else min(k * OVERSAMPLE + len(excluded), len(self.indexed_ids))
+        try:
+            labels = self.backend.search(np.asarray(query, dtype=np.float32), fetch,
+                                         store.ids[candidates] if filtered else None)
+        except RuntimeError as error:
+            # hnswlib raises when a filtered walk finds fewer than ``fetch`` items
+            print(f"{self.name} search fell back to exact: {error}")
+            return store.rank(query, candidates, k)
+        positions = store.positions(labels)
+        positions = positions[allowed[positions]]
+        if len(positions) < k:
+            return store.rank(query, candidates, k)
+        return store.rank(query, positions, k)
+
+    def paths(self, directory, table_name):
+        base = Path(directory) / f"{table_name}-{self.name}"
+        return {"index": base.with_suffix(self.backend.suffix), "ids": base.with_suffix(".ids.npy"),
+                "meta": base.with_suffix(".json")}
+
+    def save(self, directory, table_name):
+        """Write the index, its ids and a manifest; the manifest is replaced last so readers never mix versions."""
+        if self.backend is None:
+            return None
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        paths = self.paths(directory, table_name)
+        tmp_index = paths["index"].with_name(paths["index"].name + ".tmp")
+        self.backend.save(tmp_index)
+        os.replace(tmp_index, paths["index"])
+        tmp_ids = paths["ids"].with_name(paths["ids"].name + ".tmp")
+        with open(tmp_ids, "wb") as f:
+            np.save(f, self.indexed_ids)
+        os.replace(tmp_ids, paths["ids"])
+        meta = {"table": table_name, "backend": self.name, "source": self.store.source,
+                "dim": self.store.dim, "count": len(self.indexed_ids), "format": INDEX_FORMAT}
+        tmp_meta = paths["meta"].with_name(paths["meta"].name + ".tmp")
+        tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_meta, paths["meta"])
+        return meta
+
+
+def build_item_index(store, backend="hnsw", **params):
+    """A new index over every row of ``store``; ``backend="exact"`` needs no index at all."""
+    if backend == "exact":
+        return ItemIndex(store)
+    index = ItemIndex(store, BACKENDS[backend](store.dim, **params))
+    index.add()
+    return index
+
+
+def load_item_index(store, table_name, backend="hnsw", directory=DEFAULT_INDEX_DIR, save=True, **params):
+    """The table's saved index with titles ingested since added, or a fresh build.
+
+    A saved index is reused when it was built from the same embedding
+    space; otherwise, or if it cannot be read or its files are from
+    different saves, it is rebuilt. Falls back to exact search when the
+    backend's library is not installed. Only the ingest saves (``save``);
+    app workers keep their additions in memory.
+    """
+    if backend == "exact":
+        return ItemIndex(store)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ANN backend '{backend}', expected one of {ANN_BACKENDS}")
+    try:
+        index = ItemIndex(store, BACKENDS[backend](store.dim, **params))
+    except ImportError as error:
+        print(f"{backend} index unavailable ({error}); using exact search")
+        return ItemIndex(store)
+
+    paths = index.paths(directory, table_name)
+    try:
+        meta = json.loads(paths["meta"].read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        meta = None
+    if meta and (meta.get("source"), meta.get("dim"), meta.get("format")) == (store.source, store.dim, INDEX_FORMAT):
+        try:
+            index = ItemIndex(store, BACKENDS[backend].load(paths["index"], store.dim, **params),
+                              np.load(paths["ids"]))
+            if not len(index.backend) == len(index.indexed_ids) == meta.get("count"):
+                raise ValueError(f"index has {len(index.backend)} items, ids file {len(index.indexed_ids)}, "
+                                 f"manifest {meta.get('count')}")
+        except Exception as error:
+            print(f"Rebuilding {table_name} {backend} index: {error}")
+            index = ItemIndex(store, BACKENDS[backend](store.dim, **params))
+
+    added = index.add()
+    if added:
+        print(f"{table_name} {backend} index: added {added} items ({len(index.indexed_ids)} total)")
+        if save:
+            index.save(directory, table_name)
+    return index
+
+
+def get_item_index(catalog, table_name, backend="exact", directory=None, df=None, engine=None, model=None):
+    """Item index for a catalog table, loaded or updated once per catalog version.
+
+    ``engine`` and ``model`` select pipeline embeddings, as in get_item_embeddings.
+    The saved index is only read here: update_item_indexes, run by the
+    ingest, is its single writer.
+    """
+    if df is None:
+        df = catalog.get(table_name)
+    # Resolved outside the builder: derived() holds the table's lock while building
+    store = get_item_embeddings(catalog, table_name, df, engine, model)
+    directory = directory or DEFAULT_INDEX_DIR
+    return catalog.derived(table_name, f"item_index:{backend}:{store.source}",
+                           lambda frame: load_item_index(store, table_name, backend, directory, save=False),
+                           df=df)
+
+
+def update_item_indexes(engine, backend, directory=None, snapshots=None, tables=SNAPSHOT_TABLES, model=None,
+                        pgvector_index="hnsw"):
+    """Add newly ingested titles to the saved indexes; run at the end of an ingest.
+
+    ``backend="pgvector"`` syncs the vectors into Postgres instead, with a
+    ``pgvector_index`` ("hnsw" or "ivfflat") index.
+    """
+    counts = {}
+    for table_name in tables:
+        df = load_catalog(engine, table_name, snapshots)
+        genre_index = GenreIndex.from_series(df["genres"])
+        ids, vectors = load_entity_vectors(engine, entity_type(table_name), model) if model else ((), None)
+        if len(ids):
+            store = build_model_store(df, ids, vectors, model)
+        else:
+            store = build_content_store(df, genre_index)
+        if backend == "pgvector":
+            counts[table_name] = sync_item_vectors(engine, table_name, store, genre_index, pgvector_index)["vectors"]
+        else:
+            counts[table_name] = len(load_item_index(store, table_name, backend,
+                                                     directory or DEFAULT_INDEX_DIR).indexed_ids)
+    return counts
@@ -0,0 +1,107 @@
+"""Recall vs latency of the ANN item indexes against exact top-k.
+
+Synthetic clustered unit vectors stand in for item embeddings; each query
+is a perturbed item. Backends whose library is not installed (hnswlib,
+faiss-cpu) are skipped. Run from src/OtakuConnect:
+    python -m benchmarks.bench_ann
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from ann_index import BACKENDS, ItemIndex, build_item_index, load_item_index, metadata_mask
+from embeddings import EmbeddingStore
+
+K = 10
+# Backend parameter sets, cheapest first
+SWEEPS = {
+    "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128, 256)],
+    "faiss": [{"ef_search": ef} for ef in (16, 32, 64, 128, 256)],
+}
+STATUSES = np.array(["finished_airing", "currently_airing", "not_yet_aired"])
+
+
+def synthetic_store(n_items, dim, seed=7):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(n_items // 500, 8), dim))
+    vectors = centers[rng.integers(0, len(centers), n_items)] + 0.6 * rng.normal(size=(n_items, dim))
+    df = pd.DataFrame({
+        "id": np.arange(1, n_items + 1),
+        "status": pd.Categorical(STATUSES[rng.choice(3, n_items, p=[0.8, 0.15, 0.05])]),
+        "mean": rng.uniform(5, 9.5, n_items).astype("float32"),
+    })
+    return df, EmbeddingStore(df["id"], vectors, source="synthetic")
+
+
+def measure(index, queries, reference, mask):
+    hits, times = 0, []
+    for query, expected in zip(queries, reference):
+        start = time.perf_counter()
+        positions, _ = index.search(query, K, mask=mask)
+        times.append(time.perf_counter() - start)
+        hits += len(np.intersect1d(positions, expected))
+    times = np.asarray(times) * 1e3
+    return hits / (K * len(queries)), np.percentile(times, 50), np.percentile(times, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    df, store = synthetic_store(args.items, args.dim)
+    rng = np.random.default_rng(11)
+    queries = store.vectors[rng.integers(0, len(store), args.queries)] + 0.1 * rng.normal(size=(args.queries, args.dim))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+    filters = {
+        "none": None,
+        "finished, >=7": metadata_mask(df, statuses=["finished_airing"], min_rating=7),
+        "airing, >=9": metadata_mask(df, statuses=["currently_airing"], min_rating=9),
+    }
+
+    print(f"{len(store)} items, {store.dim} dims, {len(queries)} queries, k={K}")
+    exact = ItemIndex(store)
+    indexes = []
+    for backend, sweep in SWEEPS.items():
+        try:
+            start = time.perf_counter()
+            index = build_item_index(store, backend)
+        except ImportError as error:
+            print(f"skipping {backend}: {error}")
+            continue
+        print(f"{backend} build: {time.perf_counter() - start:.1f}s")
+        indexes.append((index, sweep))
+
+        # Round trip through disk and an incremental add of the newest tenth of the catalog
+        with tempfile.TemporaryDirectory() as directory:
+            head = len(store) - len(store) // 10
+            partial = ItemIndex(store, BACKENDS[backend](store.dim))
+            partial.add(store.ids[:head])
+            partial.save(directory, "bench")
+            start = time.perf_counter()
+            reloaded = load_item_index(store, "bench", backend, directory)
+            print(f"{backend} load + add {len(store) - head} items: {time.perf_counter() - start:.1f}s "
+                  f"({len(reloaded.indexed_ids)} indexed)")
+
+    print(f"{'filter':<14} {'rows':>7} {'index':<6} {'params':<16} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, mask in filters.items():
+        rows = len(store) if mask is None else int(mask.sum())
+        reference = [exact.search(query, K, mask=mask)[0] for query in queries]
+        recall, p50, p99 = measure(exact, queries, reference, mask)
+        print(f"{label:<14} {rows:>7} {'exact':<6} {'':<16} {recall:>7.3f} {p50:>8.2f} {p99:>8.2f}")
+        for index, sweep in indexes:
+            for params in sweep:
+                for name, value in params.items():
+                    setattr(index.backend, name, value)
+                recall, p50, p99 = measure(index, queries, reference, mask)
+                described = " ".join(f"{name}={value}" for name, value in params.items())
+                print(f"{label:<14} {rows:>7} {index.name:<6} {described:<16} {recall:>7.3f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
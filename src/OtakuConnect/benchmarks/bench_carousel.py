@@ -0,0 +1,61 @@
+"""Compare the old iterrows/+= carousel builder with carousel.create_carousel_html.
+
+Run from src/OtakuConnect:
+    python -m benchmarks.bench_carousel
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from carousel import CAROUSEL_CSS, create_carousel_html
+
+
+def legacy_carousel_html(items, title_field="title", img_field="main_picture", badge_field=None, badge_prefix="⭐"):
+    """The previous builder: CSS per carousel, iterrows() and string += in a loop."""
+    html = "<style>" + CAROUSEL_CSS + "</style>\n<div class=\"carousel-container\">"
+    for _, row in items.iterrows():
+        img = row[img_field]
+        title = str(row[title_field]).replace('"', '&quot;')
+        badge = ""
+        if badge_field and not pd.isna(row.get(badge_field)):
+            badge = f'<div class="rating-badge">{badge_prefix} {row[badge_field]}</div>'
+        html += f"""
+        <div class="carousel-item">
+            <img src="{img}" alt="{title}">
+            {badge}
+            <div class="carousel-caption">{title}</div>
+        </div>
+        """
+    html += "</div>"
+    return html
+
+
+def synthetic_items(n_items, seed=3):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "title": [f"Title \"{i}\" Season {i % 7}" for i in range(n_items)],
+        "main_picture": [f"https://cdn.myanimelist.net/images/anime/{i}/{i * 7}.jpg" for i in range(n_items)],
+        "mean": pd.array(np.round(rng.uniform(5, 10, n_items), 2), dtype="float32"),
+    })
+
+
+def best_of(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number
+
+
+def main():
+    print(f"{'items':>6} {'legacy ms':>10} {'join ms':>9} {'speedup':>8} {'legacy KB':>10} {'join KB':>8}")
+    for n_items in (20, 200, 2_000):
+        items = synthetic_items(n_items)
+        number = max(1, 2_000 // n_items)
+        legacy = best_of(lambda: legacy_carousel_html(items, badge_field="mean"), number)
+        joined = best_of(lambda: create_carousel_html(items, badge_field="mean"), number)
+        legacy_size = len(legacy_carousel_html(items, badge_field="mean").encode()) / 1024
+        joined_size = len(create_carousel_html(items, badge_field="mean").encode()) / 1024
+        print(f"{n_items:>6} {legacy * 1e3:>10.3f} {joined * 1e3:>9.3f} {legacy / joined:>7.1f}x "
+              f"{legacy_size:>10.1f} {joined_size:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
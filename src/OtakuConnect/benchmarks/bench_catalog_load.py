@@ -0,0 +1,73 @@
+"""Cold catalog load: Postgres read vs memory-mapped Arrow snapshot.
+
+Fills a scratch ``ingest_bench`` schema from the mock MAL server (as
+bench_ingest does), then times what a fresh worker pays for each catalog
+table: the typed Postgres load, the snapshot fingerprint check and the
+snapshot read. Needs a local Postgres:
+    INGEST_BENCH_DSN=postgresql+psycopg2://postgres@localhost/otaku_bench python -m benchmarks.bench_catalog_load
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.bench_ingest import SCHEMA, scratch_engine
+from benchmarks.mock_mal_server import start_mock_server
+from catalog import load_catalog_table
+from catalog_snapshot import SNAPSHOT_TABLES, CatalogSnapshots, table_fingerprint
+from ingest_pipeline import ingest_ranking
+from mal_client import MALClient
+
+
+def best_of(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("INGEST_BENCH_DSN"),
+                        help="SQLAlchemy URL of a scratch Postgres database (default: $INGEST_BENCH_DSN)")
+    parser.add_argument("--total", type=int, default=10000, help="titles per media type")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("pass --dsn or set INGEST_BENCH_DSN to a local Postgres database")
+
+    server = start_mock_server(total=args.total, rate=1000)
+    engine = scratch_engine(args.dsn)
+    client = MALClient("bench", base_url=server.base_url, rate=500, burst=8, max_workers=8)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for table_name in SNAPSHOT_TABLES:
+                ingest_ranking(client, engine, table_name, args.total, 100)
+
+        with tempfile.TemporaryDirectory() as directory:
+            snapshots = CatalogSnapshots(directory)
+            print(f"{'table':<6} {'rows':>7} {'postgres ms':>12} {'fingerprint ms':>15} {'snapshot ms':>12} "
+                  f"{'speedup':>8}")
+            for table_name in SNAPSHOT_TABLES:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    reference = load_catalog_table(engine, table_name)
+                    snapshots.write(table_name, reference, table_fingerprint(engine, table_name))
+                    pd.testing.assert_frame_equal(reference, snapshots.read(table_name))
+                    postgres = best_of(lambda: load_catalog_table(engine, table_name))
+                fingerprint = best_of(lambda: table_fingerprint(engine, table_name))
+                snapshot = best_of(lambda: snapshots.read(table_name))
+                print(f"{table_name:<6} {len(reference):>7} {postgres * 1e3:>12.1f} {fingerprint * 1e3:>15.1f} "
+                      f"{snapshot * 1e3:>12.1f} {postgres / (fingerprint + snapshot):>7.1f}x")
+    finally:
+        server.shutdown()
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+
+if __name__ == "__main__":
+    main()
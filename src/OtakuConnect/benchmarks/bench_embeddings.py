@@ -0,0 +1,75 @@
+"""Embedding pipeline against the local stand-in server: one text per request vs batched and cached.
+
+Texts are synthetic catalog entries (title, genres, creators, synopsis)
+from the mock MAL payload. Passes:
+  single  - one request per text, sequential (a sample, extrapolated)
+  cold    - batched, parallel requests under the client's rate limit
+  warm    - the same texts again: every vector comes from the cache
+  delta   - a tenth of the texts edited: only those are embedded
+Run from src/OtakuConnect:
+    python -m benchmarks.bench_embeddings
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.mock_embedding_server import start_embedding_server
+from benchmarks.mock_mal_server import make_node
+from embedding_pipeline import EmbeddingPipeline, HashingEmbedder, HTTPEmbedder, MemoryEmbeddingCache
+
+
+def synthetic_texts(total):
+    texts = []
+    for position in range(total):
+        node = make_node("anime", position)
+        genres = ", ".join(genre["name"] for genre in node["genres"])
+        studios = ", ".join(studio["name"] for studio in node["studios"])
+        texts.append(f"{node['title']}\nGenres: {genres}\nStudios: {studios}\n{node['synopsis']}")
+    return texts
+
+
+def run(pipeline, embedder, texts):
+    requests_before = embedder.stats["requests"]
+    start = time.perf_counter()
+    _, vectors = pipeline.embed(texts)
+    return time.perf_counter() - start, embedder.stats["requests"] - requests_before, vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--total", type=int, default=5000, help="texts to embed")
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=20.0, help="client requests per second")
+    parser.add_argument("--single-sample", type=int, default=100, help="texts sent one per request")
+    args = parser.parse_args()
+
+    server = start_embedding_server(rate=args.rate * 2)
+    texts = synthetic_texts(args.total)
+    try:
+        print(f"{'pass':<7} {'texts':>6} {'requests':>9} {'seconds':>8} {'texts/s':>9}")
+
+        embedder = HTTPEmbedder(server.url, "mock", rate=args.rate, max_workers=1)
+        single = EmbeddingPipeline(embedder, MemoryEmbeddingCache(), batch_size=1, max_workers=1)
+        seconds, requests, _ = run(single, embedder, texts[:args.single_sample])
+        rate = args.single_sample / seconds
+        print(f"{'single':<7} {args.single_sample:>6} {requests:>9} {seconds:>8.2f} {rate:>9.0f}"
+              f"   (~{args.total / rate:.0f}s for all {args.total})")
+
+        embedder = HTTPEmbedder(server.url, "mock", rate=args.rate, max_workers=args.workers)
+        pipeline = EmbeddingPipeline(embedder, MemoryEmbeddingCache(), args.batch_size, args.workers)
+        edited = [text + " (revised)" if i % 10 == 0 else text for i, text in enumerate(texts)]
+        for label, batch in (("cold", texts), ("warm", texts), ("delta", edited)):
+            seconds, requests, vectors = run(pipeline, embedder, batch)
+            print(f"{label:<7} {len(batch):>6} {requests:>9} {seconds:>8.2f} {len(batch) / seconds:>9.0f}")
+
+        # The stand-in serves the deterministic local model: vectors must match it exactly
+        assert np.allclose(vectors, HashingEmbedder().embed(edited), atol=1e-6)
+        print("pipeline:", pipeline.stats, "| client:", embedder.stats, "| server:", server.counts)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare the apply-based genre filter with the GenreIndex masks.
+
+Run from src/OtakuConnect:
+    python -m benchmarks.bench_genre_filter
+"""
+import random
+import timeit
+
+import pandas as pd
+
+from genre_index import GenreIndex
+
+GENRES = ["Action", "Adventure", "Award Winning", "Comedy", "Drama", "Ecchi", "Fantasy",
+          "Gourmet", "Horror", "Mecha", "Military", "Music", "Musical", "Mystery", "Parody",
+          "Psychological", "Romance", "School", "Sci-Fi", "Seinen", "Shoujo", "Shounen",
+          "Slice of Life", "Sports", "Super Power", "Supernatural", "Suspense", "Thriller"]
+
+
+def synthetic_genres(n_items, seed=7):
+    rng = random.Random(seed)
+    return pd.Series([", ".join(rng.sample(GENRES, rng.randint(1, 6))) for _ in range(n_items)])
+
+
+def apply_all_of(genres, selected):
+    return genres.fillna("").apply(lambda x: all(g in x for g in selected))
+
+
+def apply_any_of(genres, selected):
+    def has_matching_genre(genres_str):
+        genre_list = [g.strip() for g in str(genres_str).split(',')]
+        return any(g in genre_list for g in selected)
+    return genres.apply(has_matching_genre)
+
+
+def best_of(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number
+
+
+def main():
+    selected = ["Action", "Drama"]
+    print(f"{'items':>8} {'build ms':>10} {'apply all ms':>13} {'index all ms':>13} "
+          f"{'apply any ms':>13} {'index any ms':>13} {'speedup all':>12}")
+    for n_items in (1_000, 10_000, 100_000):
+        genres = synthetic_genres(n_items)
+        build = best_of(lambda: GenreIndex.from_series(genres), 1)
+        index = GenreIndex.from_series(genres)
+
+        number = 3 if n_items >= 100_000 else 10
+        apply_all = best_of(lambda: apply_all_of(genres, selected), number)
+        index_all = best_of(lambda: index.mask_all(selected), number * 10)
+        apply_any = best_of(lambda: apply_any_of(genres, selected), number)
+        index_any = best_of(lambda: index.mask_any(selected), number * 10)
+
+        print(f"{n_items:>8} {build * 1e3:>10.2f} {apply_all * 1e3:>13.3f} {index_all * 1e3:>13.3f} "
+              f"{apply_any * 1e3:>13.3f} {index_any * 1e3:>13.3f} {apply_all / index_all:>11.0f}x")
+
+    # Substring matching in the old filter lets "Music" match "Musical"
+    genres = pd.Series(["Musical, Drama", "Music, Drama"])
+    index = GenreIndex.from_series(genres)
+    print("\n'Music' matches (apply):", int(apply_all_of(genres, ["Music"]).sum()),
+          "| (index):", int(index.mask_all(["Music"]).sum()))
+
+
+if __name__ == "__main__":
+    main()
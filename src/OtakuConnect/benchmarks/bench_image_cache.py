@@ -0,0 +1,70 @@
+"""Fill and serve the picture cache against the local CDN stand-in.
+
+Reports download throughput at different worker counts, thumbnail sizes
+against the originals, the cost of a warm ``thumbnail_url`` lookup and of
+reopening the store's index. Everything is written to a temporary
+directory. Run from src/OtakuConnect:
+    python -m benchmarks.bench_image_cache
+"""
+import os
+import tempfile
+import time
+import timeit
+
+from PIL import Image
+
+from benchmarks.mock_image_server import start_image_server
+from image_cache import ImageCache
+
+N_PICTURES = 200
+
+
+def picture_urls(base_url, n_pictures, media_type="anime"):
+    return [f"{base_url}/images/{media_type}/{item_id % 97}/{item_id}.jpg" for item_id in range(1, n_pictures + 1)]
+
+
+def main():
+    server = start_image_server(latency=0.02)
+    urls = picture_urls(server.base_url, N_PICTURES)
+
+    print(f"{'workers':>7} {'pictures':>9} {'seconds':>8} {'pics/s':>8}")
+    for max_workers in (1, 4, 8):
+        with tempfile.TemporaryDirectory() as root:
+            cache = ImageCache(root, max_workers=max_workers)
+            start = time.perf_counter()
+            result = cache.prefetch(urls)
+            elapsed = time.perf_counter() - start
+            assert result["fetched"] == N_PICTURES, result
+            print(f"{max_workers:>7} {N_PICTURES:>9} {elapsed:>8.2f} {N_PICTURES / elapsed:>8.0f}")
+
+    with tempfile.TemporaryDirectory() as root:
+        cache = ImageCache(root, max_workers=8)
+        cache.prefetch(urls)
+        requests_before = server.requests
+        assert cache.prefetch(urls)["cached"] == N_PICTURES and server.requests == requests_before
+
+        digest = cache.cached_hash(urls[0])
+        with Image.open(cache.thumbnail_path(digest)) as thumb:
+            assert thumb.size == cache.thumb_size and thumb.format == "WEBP"
+        print(f"\noriginals: {cache.stats['bytes'] / N_PICTURES / 1024:.1f} KiB/picture, "
+              f"thumbnails: {cache.stats['thumb_bytes'] / N_PICTURES / 1024:.1f} KiB/picture "
+              f"({cache.thumb_size[0]}x{cache.thumb_size[1]} WebP)")
+
+        number = 10_000
+        lookup = timeit.timeit(lambda: cache.thumbnail_url(urls[number % N_PICTURES]), number=number) / number
+        print(f"warm thumbnail_url: {lookup * 1e6:.2f} µs/call")
+
+        start = time.perf_counter()
+        reopened = ImageCache(root)
+        print(f"reopen index of {len(reopened)} pictures: {(time.perf_counter() - start) * 1e3:.1f} ms")
+        assert reopened.thumbnail_url(urls[0]).startswith(reopened.url_prefix)
+
+        lazy = ImageCache(os.path.join(root, "lazy"), max_workers=8)
+        assert lazy.thumbnail_url(urls[0]) == urls[0]
+        lazy.wait()
+        print(f"lazy miss then hit: {lazy.thumbnail_url(urls[0])}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
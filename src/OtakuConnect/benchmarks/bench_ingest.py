@@ -0,0 +1,127 @@
+"""End-to-end ingest benchmark: mock MAL API -> transform -> Postgres upsert.
+
+Both media types stream side by side, as in ``data_ingest.py``, into a
+scratch ``ingest_bench`` schema built from the catalog part of
+TableCreation.sql. The first pass inserts every title, the second reads
+the same payload again so every row is skipped by its record hash. Each
+pass appends its per-stage metrics (HTTP latency percentiles, pages/sec,
+transform and write time, rows, retries) as JSON lines to ``--output``,
+tagged with the git commit, so runs from different releases can be
+compared. The mock payload is deterministic. Needs a local Postgres:
+    INGEST_BENCH_DSN=postgresql+psycopg2://postgres@localhost/otaku_bench python -m benchmarks.bench_ingest
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine
+
+from benchmarks.mock_mal_server import start_mock_server
+from ingest_checkpoint import DEFAULT_STATE_DIR
+from ingest_metrics import IngestMetrics
+from ingest_pipeline import INGEST_JOBS, ingest_ranking
+from mal_client import MALClient
+
+SCHEMA = "ingest_bench"
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "TableCreation.sql")
+# Statements of TableCreation.sql that touch the catalog and its dimension tables
+CATALOG_TABLES = re.compile(r"\b(anime|manga|genre|studio|author|item_genre|item_studio|item_author)\b")
+
+
+def catalog_statements(path=SCHEMA_FILE):
+    """CREATE/ALTER statements for the ingest's tables; trigram indexes are left out."""
+    with open(path, encoding="utf-8") as f:
+        lines = [line for line in f if not line.lstrip().startswith(("#", "--"))]
+    statements = [statement.strip() for statement in "".join(lines).split(";")]
+    return [statement for statement in statements
+            if statement and CATALOG_TABLES.search(statement) and "trgm" not in statement]
+
+
+def scratch_engine(dsn):
+    """Engine whose search_path is a freshly created ``ingest_bench`` schema."""
+    admin = create_engine(dsn)
+    with admin.begin() as connection:
+        connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        connection.exec_driver_sql(f"CREATE SCHEMA {SCHEMA}")
+    admin.dispose()
+
+    engine = create_engine(dsn, connect_args={"options": f"-csearch_path={SCHEMA}"})
+    with engine.begin() as connection:
+        for statement in catalog_statements():
+            connection.exec_driver_sql(statement.replace("%", "%%"))
+    return engine
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_pass(server, engine, label, args, events):
+    client = MALClient("bench", base_url=server.base_url, rate=args.rate, burst=args.workers,
+                       max_workers=args.workers)
+    metrics = IngestMetrics(events, labels={"benchmark": "ingest", "pass": label, "commit": git_commit(),
+                                            "total": args.total})
+    client.metrics = metrics
+    with ThreadPoolExecutor(max_workers=len(INGEST_JOBS)) as pool, contextlib.redirect_stdout(io.StringIO()):
+        futures = {media: pool.submit(ingest_ranking, client, engine, media, args.total, 100, None, metrics)
+                   for media in INGEST_JOBS}
+        results = {media: future.result() for media, future in futures.items()}
+    metrics.write_summary(results=results, mal=client.stats)
+
+    stages = metrics.summary()
+    http = metrics.latency_summary()["http"]
+    pages = sum(totals["pages"] for name, totals in stages.items() if name.endswith("fetch"))
+    transform = sum(totals["seconds"] for name, totals in stages.items() if name.endswith("transform"))
+    write = sum(totals["seconds"] for name, totals in stages.items() if name.endswith("write"))
+    rows = {key: sum(result[key] for result in results.values()) for key in ("inserted", "updated", "unchanged")}
+    print(f"{label:<6} {pages:>6} {http['p50_ms']:>8.1f} {http['p99_ms']:>8.1f} {transform:>10.2f} "
+          f"{write:>8.2f} {rows['inserted']:>9} {rows['unchanged']:>10} {client.stats['retries']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("INGEST_BENCH_DSN"),
+                        help="SQLAlchemy URL of a scratch Postgres database (default: $INGEST_BENCH_DSN)")
+    parser.add_argument("--total", type=int, default=3000, help="titles per media type")
+    parser.add_argument("--rate", type=float, default=200.0, help="client requests per second")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.02, help="mock seconds per page")
+    parser.add_argument("--output", default=os.path.join(DEFAULT_STATE_DIR, "bench_ingest.jsonl"),
+                        help="JSON lines file the metrics are appended to ('-' for stdout)")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("pass --dsn or set INGEST_BENCH_DSN to a local Postgres database")
+
+    server = start_mock_server(total=args.total, rate=args.rate * 2, latency=args.latency)
+    engine = scratch_engine(args.dsn)
+    if args.output == "-":
+        events = sys.stdout
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        events = open(args.output, "a", encoding="utf-8")
+
+    print(f"{'pass':<6} {'pages':>6} {'http p50':>8} {'http p99':>8} {'transform':>10} {'write':>8} "
+          f"{'inserted':>9} {'unchanged':>10} {'retries':>8}")
+    try:
+        for label in ("cold", "warm"):
+            run_pass(server, engine, label, args, events)
+    finally:
+        if events is not sys.stdout:
+            events.close()
+            print(f"metrics appended to {args.output}")
+        server.shutdown()
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+
+if __name__ == "__main__":
+    main()
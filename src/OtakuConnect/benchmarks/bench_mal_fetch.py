@@ -0,0 +1,45 @@
+"""Fetch a ranking from the local mock MAL server sequentially and concurrently.
+
+The mock answers 429 above its per-second limit, so the run also shows how
+many requests were throttled and retried. Run from src/OtakuConnect:
+    python -m benchmarks.bench_mal_fetch
+"""
+import contextlib
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.mock_mal_server import start_mock_server
+from mal_client import MALClient
+
+TOTAL = 1000
+LIMIT = 100
+FIELDS = "id,title,main_picture,mean,genres,start_date"
+
+
+def run(server, label, rate, burst, max_workers, media_types=("anime",)):
+    client = MALClient("bench", base_url=server.base_url, rate=rate, burst=burst, max_workers=max_workers)
+    server.counts.update(ok=0, rate_limited=0, errors=0)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(media_types)) as pool, contextlib.redirect_stdout(io.StringIO()):
+        results = list(pool.map(lambda media: client.fetch_ranking(media, TOTAL, LIMIT, FIELDS), media_types))
+    elapsed = time.perf_counter() - started
+    items = sum(len(result) for result in results)
+    print(f"{label:<34} {elapsed:>7.2f}s {items / elapsed:>9.0f} items/s "
+          f"{client.stats['requests']:>5} req {server.counts['rate_limited']:>4} x 429")
+
+
+def main():
+    # 10 requests/s allowed, 150 ms per page, roughly like the real API
+    server = start_mock_server(total=TOTAL, rate=10, retry_after=1, latency=0.15)
+    print(f"{'mode':<34} {'time':>8} {'throughput':>15} {'requests':>9} {'throttled':>9}")
+    run(server, "old loop pace (1 req/s, 1 worker)", rate=1, burst=1, max_workers=1)
+    run(server, "sequential (1 worker)", rate=10, burst=1, max_workers=1)
+    run(server, "concurrent (4 workers)", rate=8, burst=4, max_workers=4)
+    run(server, "anime + manga in parallel", rate=8, burst=4, max_workers=4, media_types=("anime", "manga"))
+    run(server, "over the limit (429 + Retry-After)", rate=40, burst=20, max_workers=8)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""pgvector recommender engine vs the in-process one: parity and latency.
+
+Fills a scratch ``ingest_bench`` schema from the mock MAL server (as
+bench_ingest does), syncs the anime vectors (content features, then the
+local hashing model) into Postgres with each index type, and runs the
+same taste queries through both engines: unfiltered and with a rating
+filter, always excluding the user's rated titles. "same" is the share of
+queries whose ids and scores are identical to the in-process engine.
+Needs a local Postgres with the vector extension available:
+    INGEST_BENCH_DSN=postgresql+psycopg2://postgres@localhost/otaku_bench python -m benchmarks.bench_pgvector
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+
+import numpy as np
+from sqlalchemy import create_engine
+
+from ann_index import ItemIndex, metadata_mask
+from benchmarks.bench_ingest import SCHEMA, scratch_engine
+from benchmarks.mock_mal_server import start_mock_server
+from catalog import load_catalog_table
+from embedding_pipeline import HashingEmbedder, catalog_texts
+from embeddings import build_content_store, build_model_store
+from genre_index import GenreIndex
+from ingest_pipeline import ingest_ranking
+from mal_client import MALClient
+from pg_vectors import PGVECTOR_METHODS, load_taste_vector, similar_items, sync_item_vectors
+
+K = 10
+TABLE = "anime"
+FILTERS = {"none": None, "mean >= 8": 8.0}
+
+
+def synthetic_users(store, genre_index, count, seed=5):
+    """(ratings, favorite genres) pairs: a few rated titles each, and two favorite genres."""
+    rng = np.random.default_rng(seed)
+    users = []
+    for _ in range(count):
+        rated = rng.choice(store.ids, int(rng.integers(1, 8)), replace=False)
+        ratings = list(zip(rated.tolist(), rng.integers(1, 11, len(rated)).tolist()))
+        users.append((ratings, list(rng.choice(genre_index.vocabulary, 2, replace=False))))
+    return users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("INGEST_BENCH_DSN"),
+                        help="SQLAlchemy URL of a scratch Postgres database (default: $INGEST_BENCH_DSN)")
+    parser.add_argument("--total", type=int, default=10000, help="titles per media type")
+    parser.add_argument("--users", type=int, default=100, help="taste queries per filter")
+    parser.add_argument("--ef-search", type=int, default=100)
+    parser.add_argument("--probes", type=int, default=10)
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("pass --dsn or set INGEST_BENCH_DSN to a local Postgres database")
+
+    server = start_mock_server(total=args.total, rate=1000)
+    scratch_engine(args.dsn).dispose()
+    # The vector type lives where the extension was installed, usually public
+    engine = create_engine(args.dsn, connect_args={"options": f"-csearch_path={SCHEMA},public"})
+    client = MALClient("bench", base_url=server.base_url, rate=500, burst=8, max_workers=8)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            ingest_ranking(client, engine, TABLE, args.total, 100)
+            df = load_catalog_table(engine, TABLE)
+
+        genre_index = GenreIndex.from_series(df["genres"])
+        texts = catalog_texts(engine, TABLE)
+        embedder = HashingEmbedder()
+        stores = {
+            "content": build_content_store(df, genre_index),
+            embedder.model: build_model_store(df, texts.index.to_numpy(), embedder.embed(texts.tolist()), embedder.model),
+        }
+        print(f"{TABLE}: {len(df)} rows, k={K}, {args.users} users per filter, "
+              f"ef_search={args.ef_search}, probes={args.probes}")
+        print(f"{'vectors':<15} {'index':<8} {'filter':<10} {'engine':<15} {'same':>6} {'p50 ms':>8} {'p99 ms':>8}")
+        for label, store in stores.items():
+            index = ItemIndex(store)
+            users = synthetic_users(store, genre_index, args.users)
+            for method in PGVECTOR_METHODS:
+                start = time.perf_counter()
+                synced = sync_item_vectors(engine, TABLE, store, genre_index, method)
+                print(f"{label:<15} {method:<8} sync {synced['vectors']} vectors: {time.perf_counter() - start:.1f}s")
+                for filter_label, min_rating in FILTERS.items():
+                    mask = metadata_mask(df, min_rating=min_rating)
+                    conditions, params = (["mean >= :min_rating"], {"min_rating": min_rating}) if min_rating else ([], {})
+                    timings = {"in-process": [], "pgvector": [], "pgvector exact": []}
+                    same = {"pgvector": 0, "pgvector exact": 0}
+                    for ratings, genres in users:
+                        exclude = [item_id for item_id, _ in ratings]
+                        start = time.perf_counter()
+                        taste = store.user_vector(ratings, genres, genre_index)
+                        positions, scores = index.search(taste, K, mask=mask, exclude_ids=exclude)
+                        timings["in-process"].append(time.perf_counter() - start)
+                        expected = (store.ids[positions].tolist(), scores.tolist())
+                        for engine_label, exact in (("pgvector", False), ("pgvector exact", True)):
+                            start = time.perf_counter()
+                            found = similar_items(engine, TABLE, "id", load_taste_vector(engine, TABLE, ratings, genres),
+                                                  K, conditions, params, exclude, args.ef_search, args.probes, exact)
+                            timings[engine_label].append(time.perf_counter() - start)
+                            same[engine_label] += (found["id"].tolist(), found["similarity"].tolist()) == expected
+                    for engine_label, times in timings.items():
+                        times = np.asarray(times) * 1e3
+                        share = f"{same[engine_label] / len(users):.1%}" if engine_label in same else ""
+                        print(f"{label:<15} {method:<8} {filter_label:<10} {engine_label:<15} "
+                              f"{share:>6} {np.percentile(times, 50):>8.2f} "
+                              f"{np.percentile(times, 99):>8.2f}")
+    finally:
+        server.shutdown()
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Chatbot query parse cache: model round trip per search vs the normalized-message cache.
+
+The model is a stand-in that sleeps ``--model-ms`` per parse, like the
+chat completion parse_query waits for. Searches mix the example queries
+from the chatbot page, retyped with different case, punctuation and
+spacing, with one-off queries that always miss. With ``--dsn`` a second
+"worker" with an empty LRU also reads the first one's parses from the
+shared query_cache table. Run from src/OtakuConnect:
+    python -m benchmarks.bench_query_cache
+    INGEST_BENCH_DSN=... python -m benchmarks.bench_query_cache
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+from sqlalchemy import create_engine
+
+from benchmarks.bench_ingest import SCHEMA, SCHEMA_FILE
+from query_cache import PostgresQueryStore, QueryCache
+
+EXAMPLES = [
+    "Show me 5 action anime from the last 3 years",
+    "I want top-rated romance manga",
+    "Give me sci-fi anime similar to what I've watched",
+    "Show me the best comedy anime",
+    "Find me ongoing thriller manga from 2020",
+    "I need hidden gem fantasy anime",
+]
+
+
+def retyped(message, rng):
+    """The same request as a user might type it again."""
+    variants = [message, message.lower(), message.upper(), message + "!", message + "?", "  " + message + " ",
+                message.replace(" ", "  "), message.replace("'", "")]
+    return variants[rng.integers(len(variants))]
+
+
+def workload(total, repeat_share, seed=3):
+    rng = np.random.default_rng(seed)
+    return [retyped(EXAMPLES[rng.integers(len(EXAMPLES))], rng) if rng.random() < repeat_share
+            else f"Recommend {i} anime like title number {rng.integers(1_000_000)}" for i in range(total)]
+
+
+def model_parse(message, delay):
+    time.sleep(delay)
+    return {"top_rated": "best" in message.lower(), "genre_considered": [], "number_of_recommendations": 5}
+
+
+def run(cache, messages, delay):
+    hits, misses = [], []
+    for message in messages:
+        start = time.perf_counter()
+        parsed = cache.get(message) if cache is not None else None
+        if parsed is None:
+            parsed = model_parse(message, delay)
+            if cache is not None:
+                cache.put(message, parsed)
+            misses.append(time.perf_counter() - start)
+        else:
+            hits.append(time.perf_counter() - start)
+    return np.asarray(hits), np.asarray(misses)
+
+
+def report(label, messages, hits, misses, cache, scale=1):
+    total = (hits.sum() + misses.sum()) * scale
+    hit_p50 = f"{np.percentile(hits, 50) * 1e6:.1f}" if len(hits) else "-"
+    hit_p99 = f"{np.percentile(hits, 99) * 1e6:.1f}" if len(hits) else "-"
+    rate = f"{cache.summary()['hit_rate']:.1%}" if cache is not None else "-"
+    print(f"{label:<15} {len(messages):>8} {rate:>8} {hit_p50:>10} {hit_p99:>10} "
+          f"{np.percentile(misses, 50) * 1e3 if len(misses) else 0:>11.1f} {total:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--searches", type=int, default=400)
+    parser.add_argument("--repeat-share", type=float, default=0.8, help="share of searches retyping an example")
+    parser.add_argument("--model-ms", type=float, default=400, help="stand-in model latency per parse")
+    parser.add_argument("--dsn", default=os.environ.get("INGEST_BENCH_DSN"),
+                        help="SQLAlchemy URL of a scratch Postgres database for the shared store")
+    args = parser.parse_args()
+
+    messages = workload(args.searches, args.repeat_share)
+    delay = args.model_ms / 1e3
+    print(f"{'pass':<15} {'searches':>8} {'hit rate':>8} {'hit p50 us':>10} {'hit p99 us':>10} "
+          f"{'miss p50 ms':>11} {'total s':>9}")
+    # Uncached: every search pays the round trip, so a sample is timed and extrapolated
+    sample = messages[:max(len(messages) // 10, 1)]
+    hits, misses = run(None, sample, delay)
+    report("no cache*", messages, hits, misses, None, scale=len(messages) / len(sample))
+
+    cache = QueryCache("bench")
+    hits, misses = run(cache, messages, delay)
+    report("memory", messages, hits, misses, cache)
+    print(" ", cache.summary())
+
+    if args.dsn:
+        admin = create_engine(args.dsn)
+        with admin.begin() as connection:
+            connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            connection.exec_driver_sql(f"CREATE SCHEMA {SCHEMA}")
+        engine = create_engine(args.dsn, connect_args={"options": f"-csearch_path={SCHEMA}"})
+        with open(SCHEMA_FILE, encoding="utf-8") as f:
+            statement = next(s for s in f.read().split(";") if "CREATE TABLE IF NOT EXISTS query_cache" in s)
+        try:
+            with engine.begin() as connection:
+                connection.exec_driver_sql(statement)
+            first = QueryCache("bench", store=PostgresQueryStore(engine))
+            hits, misses = run(first, messages, delay)
+            report("shared, first", messages, hits, misses, first)
+            second = QueryCache("bench", store=PostgresQueryStore(engine))
+            hits, misses = run(second, messages, delay)
+            report("shared, second", messages, hits, misses, second)
+            print(" ", second.summary())
+        finally:
+            with admin.begin() as connection:
+                connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    print("* a tenth of the searches timed; total extrapolated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Similarity top-k over the item embedding store: argpartition vs a full sort.
+
+Run from src/OtakuConnect:
+    python -m benchmarks.bench_recommend
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_genre_filter import synthetic_genres
+from embeddings import build_content_store
+from genre_index import GenreIndex
+
+K = 20
+
+
+def synthetic_catalog(n_items, seed=7):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(1, n_items + 1),
+        "genres": synthetic_genres(n_items, seed),
+        "studios": [f"Studio {i}" for i in rng.integers(0, 400, n_items)],
+        "mean": rng.uniform(5, 9.5, n_items).round(2),
+    })
+
+
+def full_sort(store, query, mask):
+    scores = store.scores(query)
+    candidates = np.flatnonzero(mask)
+    return candidates[np.argsort(-scores[candidates], kind="stable")[:K]]
+
+
+def best_of(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number
+
+
+def main():
+    print(f"{'items':>8} {'build ms':>10} {'user vec ms':>12} {'sort top-k ms':>14} {'argpartition ms':>16} "
+          f"{'speedup':>8}")
+    for n_items in (10_000, 100_000, 500_000):
+        df = synthetic_catalog(n_items)
+        genres = GenreIndex.from_series(df["genres"])
+        build = best_of(lambda: build_content_store(df, genres), 1)
+        store = build_content_store(df, genres)
+
+        ratings = pd.DataFrame({"id": np.arange(1, 201), "rating": np.resize([10, 9, 8, 3, 6], 200)})
+        user = best_of(lambda: store.user_vector(ratings, ["Action", "Drama"], genres), 10)
+        taste = store.user_vector(ratings, ["Action", "Drama"], genres)
+        mask = (df["mean"] >= 7).to_numpy()
+
+        positions, _ = store.top_k(taste, K, mask=mask)
+        assert (positions == full_sort(store, taste, mask)).all()
+        number = 5 if n_items >= 500_000 else 20
+        sort = best_of(lambda: full_sort(store, taste, mask), number)
+        partition = best_of(lambda: store.top_k(taste, K, mask=mask), number)
+        print(f"{n_items:>8} {build * 1e3:>10.1f} {user * 1e3:>12.2f} {sort * 1e3:>14.2f} "
+              f"{partition * 1e3:>16.2f} {sort / partition:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
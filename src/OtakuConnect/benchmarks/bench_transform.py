@@ -0,0 +1,90 @@
+"""Compare the per-row .apply transforms with the vectorized mal_transform layer.
+
+Payloads are synthetic MAL nodes from the mock server, including missing
+pictures, empty genre lists and year-only or year-month dates. Both paths
+must produce the same frame. Run from src/OtakuConnect:
+    python -m benchmarks.bench_transform
+"""
+import timeit
+
+import pandas as pd
+
+from benchmarks.mock_mal_server import make_node
+from mal_transform import transform_anime, transform_manga
+
+
+def legacy_fix_date(date):
+    try:
+        return pd.to_datetime(date, errors="raise").date()
+    except:
+        if isinstance(date, str) and date.isdigit() and len(date) == 4:
+            return pd.to_datetime(f"{date}-01-01").date()
+        else:
+            return None
+
+
+def legacy_transform_anime(anime_list):
+    animedf = pd.DataFrame(anime_list)
+    animedf['genres'] = animedf['genres'].apply(lambda g: ", ".join(d['name'] for d in g) if isinstance(g, list) else "")
+    animedf['main_picture'] = animedf['main_picture'].apply(lambda x: x['medium'] if isinstance(x, dict) else None)
+    animedf['studios'] = animedf['studios'].apply(lambda g: ", ".join(d['name'] for d in g) if isinstance(g, list) else None)
+    animedf = animedf.rename(columns={'rating': 'agerating', 'id': 'mal_id'})
+    animedf["start_date"] = animedf["start_date"].apply(legacy_fix_date)
+    animedf["end_date"] = animedf["end_date"].apply(legacy_fix_date)
+    animedf['title'] = animedf['title'].str.replace('"', '')
+    return animedf
+
+
+def legacy_transform_manga(manga_list):
+    mangadf = pd.DataFrame(manga_list)
+    mangadf["authors"] = mangadf["authors"].apply(lambda a: ", ".join([f"{d['node']['first_name']} {d['node']['last_name']}" for d in a]) if isinstance(a, list) else "")
+    mangadf['genres'] = mangadf['genres'].apply(lambda g: ", ".join(d['name'] for d in g) if isinstance(g, list) else "")
+    mangadf['main_picture'] = mangadf['main_picture'].apply(lambda x: x['medium'] if isinstance(x, dict) else None)
+    mangadf["start_date"] = mangadf["start_date"].apply(legacy_fix_date)
+    mangadf["end_date"] = mangadf["end_date"].apply(legacy_fix_date)
+    mangadf['title'] = mangadf['title'].str.replace('"', '')
+    mangadf = mangadf.rename(columns={'id': 'mal_id'})
+    return mangadf
+
+
+def synthetic_nodes(media_type, n_items):
+    nodes = [make_node(media_type, position) for position in range(n_items)]
+    for position, node in enumerate(nodes):
+        # Edge cases MAL really returns
+        if position % 50 == 7:
+            node.pop("main_picture")
+        if position % 40 == 3:
+            node["genres"] = []
+        if position % 30 == 11:
+            node["title"] = f'"{node["title"]}" Special'
+    return nodes
+
+
+def check_same(legacy, vectorized):
+    """Same columns and values; None, NaN and NaT all count as missing."""
+    columns = sorted(legacy.columns)
+    assert columns == sorted(vectorized.columns)
+    legacy, vectorized = legacy[columns].astype(object), vectorized[columns].astype(object)
+    pd.testing.assert_frame_equal(legacy.where(legacy.notna(), None), vectorized.where(vectorized.notna(), None))
+
+
+def best_of(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number
+
+
+def main():
+    print(f"{'media':<6} {'rows':>7} {'apply ms':>10} {'vector ms':>10} {'speedup':>8}")
+    for media_type, legacy, vectorized in (("anime", legacy_transform_anime, transform_anime),
+                                           ("manga", legacy_transform_manga, transform_manga)):
+        for n_items in (100, 1_000, 10_000):
+            nodes = synthetic_nodes(media_type, n_items)
+            check_same(legacy(nodes), vectorized(nodes))
+            number = max(1, 1_000 // n_items)
+            legacy_time = best_of(lambda: legacy(nodes), number)
+            vector_time = best_of(lambda: vectorized(nodes), number)
+            print(f"{media_type:<6} {n_items:>7} {legacy_time * 1e3:>10.1f} {vector_time * 1e3:>10.1f} "
+                  f"{legacy_time / vector_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Local stand-in for an OpenAI-compatible embeddings API, including 429 rate limiting.
+
+``POST /v1/embeddings`` with ``{"model": ..., "input": [...]}`` answers
+with HashingEmbedder vectors, so results are deterministic. Each request
+costs ``latency`` seconds plus ``per_text`` per input, like a real model
+server where batching amortizes the round trip. Requests above ``rate``
+per second get 429 with a Retry-After header; batches larger than
+``max_batch`` get 400.
+Run from src/OtakuConnect:
+    python -m benchmarks.mock_embedding_server --port 8767
+and point the pipeline at it with EMBEDDING_BACKEND=http EMBEDDING_URL=http://127.0.0.1:8767/v1/embeddings
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from embedding_pipeline import HashingEmbedder
+
+
+class MockEmbeddingServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the mock's settings and request counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address, dim=256, rate=20.0, retry_after=1, latency=0.05, per_text=0.0005, max_batch=2048):
+        super().__init__(address, MockEmbeddingHandler)
+        self.embedder = HashingEmbedder(dim)
+        self.rate = rate
+        self.retry_after = retry_after
+        self.latency = latency
+        self.per_text = per_text
+        self.max_batch = max_batch
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.counts = {"ok": 0, "rate_limited": 0, "texts": 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/embeddings"
+
+    def allow(self):
+        """Fixed one-second window limiter."""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.window_start, self.window_count = now, 0
+            self.window_count += 1
+            allowed = self.window_count <= self.rate
+            self.counts["ok" if allowed else "rate_limited"] += 1
+            return allowed
+
+
+class MockEmbeddingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.rstrip("/") != "/v1/embeddings":
+            self._send_json(404, {"error": "not_found"})
+            return
+        if not self.server.allow():
+            self._send_json(429, {"error": "too_many_requests"}, {"Retry-After": str(self.server.retry_after)})
+            return
+        try:
+            request = json.loads(body)
+            texts = request["input"]
+        except (ValueError, KeyError):
+            self._send_json(400, {"error": "invalid_request"})
+            return
+        if isinstance(texts, str):
+            texts = [texts]
+        if len(texts) > self.server.max_batch:
+            self._send_json(400, {"error": f"at most {self.server.max_batch} inputs per request"})
+            return
+
+        time.sleep(self.server.latency + self.server.per_text * len(texts))
+        vectors = self.server.embedder.embed(texts)
+        with self.server.lock:
+            self.server.counts["texts"] += len(texts)
+        self._send_json(200, {
+            "object": "list",
+            "model": request.get("model", self.server.embedder.model),
+            "data": [{"object": "embedding", "index": i, "embedding": vector.tolist()}
+                     for i, vector in enumerate(vectors)],
+            "usage": {"prompt_tokens": sum(len(text.split()) for text in texts)},
+        })
+
+
+def start_embedding_server(host="127.0.0.1", port=0, **settings):
+    """Start the mock in a background thread; ``server.url`` is the embeddings endpoint."""
+    server = MockEmbeddingServer((host, port), **settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--rate", type=float, default=20.0, help="requests per second before 429s")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--per-text", type=float, default=0.0005, help="extra seconds per input text")
+    args = parser.parse_args()
+
+    server = MockEmbeddingServer((args.host, args.port), dim=args.dim, rate=args.rate,
+                                 retry_after=args.retry_after, latency=args.latency, per_text=args.per_text)
+    print(f"Mock embeddings API on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print("Requests:", server.counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Local stand-in for MAL's picture CDN.
+
+Every ``GET /images/...`` path answers with a deterministic JPEG poster
+(same path, same bytes) so the image cache can be exercised offline.
+Pair it with the mock MAL API's ``--picture-base`` to run a full
+``data_ingest.py --images`` locally. Run from src/OtakuConnect:
+    python -m benchmarks.mock_image_server --port 8766
+"""
+import argparse
+import hashlib
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image, ImageDraw
+
+POSTER_SIZE = (225, 318)
+
+
+def make_poster(path, size=POSTER_SIZE):
+    """JPEG bytes of a poster whose colours are derived from ``path``."""
+    digest = hashlib.md5(path.encode()).digest()
+    image = Image.new("RGB", size, tuple(digest[:3]))
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    draw.rectangle((width // 8, height // 8, width * 7 // 8, height * 3 // 4), fill=tuple(digest[3:6]))
+    draw.text((width // 8, height * 13 // 16), path.rsplit("/", 1)[-1], fill=(255, 255, 255))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+class MockImageServer(ThreadingHTTPServer):
+    """Threaded HTTP server with per-request latency and a request counter."""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0):
+        super().__init__(address, MockImageHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class MockImageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        if not self.path.startswith("/images/"):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = make_poster(self.path)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_image_server(host="127.0.0.1", port=0, latency=0.0):
+    """Start the stand-in in a background thread; ``server.base_url`` replaces the CDN host."""
+    server = MockImageServer((host, port), latency=latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per picture")
+    args = parser.parse_args()
+
+    server = MockImageServer((args.host, args.port), latency=args.latency)
+    print(f"Mock picture CDN on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print("Requests:", server.requests)
+
+
+if __name__ == "__main__":
+    main()
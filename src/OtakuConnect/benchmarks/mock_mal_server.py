@@ -0,0 +1,201 @@
+"""Local stand-in for the MAL ranking API, including its 429 rate limiting.
+
+Serves ``/v2/{anime,manga}/ranking`` and ``/v2/{anime,manga}/{id}`` with
+synthetic titles. Requests above ``rate`` per second get ``429`` with a
+Retry-After header and ``error_rate`` of the rest fail with 503, so the
+ingest client's limiter, backoff and resume handling can be exercised
+without a client id. Bumping ``server.revision`` changes the score and
+popularity of a tenth of the titles, for exercising delta syncs.
+``picture_base`` points the picture URLs at another host, such as
+benchmarks/mock_image_server.py.
+Run from src/OtakuConnect:
+    python -m benchmarks.mock_mal_server --port 8765 --rate 5
+and point the ingest at it with MAL_BASE_URL=http://127.0.0.1:8765/v2
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+GENRES = ["Action", "Adventure", "Comedy", "Drama", "Fantasy", "Romance", "Sci-Fi", "Slice of Life"]
+CDN_BASE = "https://cdn.myanimelist.net"
+STATUSES = {
+    "anime": ["finished_airing", "currently_airing", "not_yet_aired"],
+    "manga": ["finished", "currently_publishing", "on_hiatus"],
+}
+
+
+def make_node(media_type, position, revision=0):
+    """Deterministic synthetic node for ranking ``position`` (0-based)."""
+    item_id = position + 1
+    drift = revision if revision and item_id % 10 == revision % 10 else 0
+    node = {
+        "id": item_id,
+        "title": f"Mock {media_type.title()} {item_id}",
+        "main_picture": {
+            "medium": f"{CDN_BASE}/images/{media_type}/{item_id % 97}/{item_id}.jpg",
+            "large": f"{CDN_BASE}/images/{media_type}/{item_id % 97}/{item_id}l.jpg",
+        },
+        "mean": round(9.5 - position * 0.0004 - drift * 0.01, 2),
+        "rank": item_id,
+        "popularity": (item_id * 7919) % 20000 + 1 + drift,
+        "status": STATUSES[media_type][item_id % 3],
+        "genres": [{"id": g + 1, "name": GENRES[g]} for g in {item_id % 8, (item_id * 3) % 8}],
+        "start_date": ["2001-04-03", "1999", "2015-10", ""][item_id % 4] or None,
+        "end_date": "2002-03-26" if item_id % 2 else None,
+        "synopsis": f"Synthetic synopsis for {media_type} {item_id}. " * 4,
+    }
+    if media_type == "anime":
+        node.update({
+            "num_episodes": 12 + item_id % 40,
+            "duration": 1440,
+            "rating": ["pg_13", "r", "g"][item_id % 3],
+            "studios": [{"id": 1 + item_id % 20, "name": f"Studio {item_id % 20}"}],
+        })
+    else:
+        node.update({
+            "authors": [{"node": {"id": item_id, "first_name": "Author", "last_name": str(item_id % 50)},
+                         "role": "Story & Art"}],
+            "num_volumes": item_id % 30,
+            "num_chapters": item_id % 300,
+            "num_pages": 0,
+            "media_type": ["manga", "manhwa", "light_novel"][item_id % 3],
+        })
+    # Missing keys are how MAL reports unknown values
+    return {key: value for key, value in node.items() if value is not None}
+
+
+class MockMALServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the mock's settings and request counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address, total=10000, rate=5.0, retry_after=1, latency=0.0, error_rate=0.0, picture_base=None):
+        super().__init__(address, MockMALHandler)
+        self.total = total
+        self.rate = rate
+        self.retry_after = retry_after
+        self.latency = latency
+        self.error_rate = error_rate
+        self.picture_base = picture_base
+        self.revision = 0
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.counts = {"ok": 0, "rate_limited": 0, "errors": 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v2"
+
+    def node(self, media_type, position):
+        node = make_node(media_type, position, self.revision)
+        if self.picture_base and "main_picture" in node:
+            node["main_picture"] = {size: url.replace(CDN_BASE, self.picture_base.rstrip("/"))
+                                    for size, url in node["main_picture"].items()}
+        return node
+
+    def allow(self):
+        """Fixed one-second window limiter, like MAL's own throttling."""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.window_start, self.window_count = now, 0
+            self.window_count += 1
+            allowed = self.window_count <= self.rate
+            self.counts["ok" if allowed else "rate_limited"] += 1
+            return allowed
+
+
+class MockMALHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "v2" or parts[1] not in STATUSES:
+            self._send_json(404, {"error": "not_found"})
+            return
+        if parts[2] != "ranking" and not parts[2].isdigit():
+            self._send_json(404, {"error": "not_found"})
+            return
+        if not self.headers.get("X-MAL-CLIENT-ID"):
+            self._send_json(401, {"error": "invalid_token"})
+            return
+        if not self.server.allow():
+            self._send_json(429, {"error": "too_many_requests"}, {"Retry-After": str(self.server.retry_after)})
+            return
+        if random.random() < self.server.error_rate:
+            with self.server.lock:
+                self.server.counts["errors"] += 1
+            self._send_json(503, {"error": "service_unavailable"})
+            return
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if parts[2].isdigit():
+            position = int(parts[2]) - 1
+            if not 0 <= position < self.server.total:
+                self._send_json(404, {"error": "not_found"})
+            else:
+                self._send_json(200, self.server.node(parts[1], position))
+            return
+
+        query = parse_qs(url.query)
+        offset = int(query.get("offset", ["0"])[0])
+        limit = min(int(query.get("limit", ["100"])[0]), 500)
+        stop = min(offset + limit, self.server.total)
+        data = [{"node": self.server.node(parts[1], position), "ranking": {"rank": position + 1}}
+                for position in range(offset, stop)]
+        self._send_json(200, {"data": data, "paging": {}})
+
+
+def start_mock_server(host="127.0.0.1", port=0, **settings):
+    """Start the mock in a background thread; ``server.base_url`` is the API root."""
+    server = MockMALServer((host, port), **settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--total", type=int, default=10000, help="titles per media type")
+    parser.add_argument("--rate", type=float, default=5.0, help="requests per second before 429s")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per successful page")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of pages answered with 503")
+    parser.add_argument("--picture-base", help="host serving the pictures, e.g. http://127.0.0.1:8766")
+    args = parser.parse_args()
+
+    server = MockMALServer((args.host, args.port), total=args.total, rate=args.rate,
+                           retry_after=args.retry_after, latency=args.latency, error_rate=args.error_rate,
+                           picture_base=args.picture_base)
+    print(f"Mock MAL API on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print("Requests:", server.counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+from html import escape
+
+import pandas as pd
+
+# Injected once per page with st.markdown; carousel fragments only carry markup
+CAROUSEL_CSS = """
+.carousel-container {
+    display: flex;
+    overflow-x: auto;
+    gap: 14px;
+    padding: 10px;
+    scroll-behavior: smooth;
+}
+.carousel-container::-webkit-scrollbar {
+    height: 8px;
+}
+.carousel-container::-webkit-scrollbar-thumb {
+    background-color: #666;
+    border-radius: 10px;
+}
+.carousel-item {
+    flex: 0 0 auto;
+    width: 200px;
+    height: 280px;
+    border-radius: 12px;
+    overflow: hidden;
+    position: relative;
+    box-shadow: 0 4px 12px rgba(0,0,0,0.35);
+    transition: transform 0.25s ease;
+}
+.carousel-item:hover {
+    transform: scale(1.05);
+}
+.carousel-item img {
+    width: 100%;
+    height: 100%;
+    object-fit: cover;
+}
+.carousel-caption {
+    position: absolute;
+    bottom: 0;
+    left: 0;
+    right: 0;
+    padding: 8px;
+    background: linear-gradient(180deg, rgba(0,0,0,0.0), rgba(0,0,0,0.7));
+    color: #fff;
+    font-size: 14px;
+    text-align: center;
+}
+.rating-badge {
+    position: absolute;
+    top: 8px;
+    left: 8px;
+    background: rgba(0,0,0,0.7);
+    color: #ffd700;
+    padding: 3px 8px;
+    border-radius: 8px;
+    font-size: 15px;
+}
+"""
+
+
+def _format_badge(value):
+    if isinstance(value, float):
+        # float32 ratings come back as e.g. 8.899999618530273
+        return f"{round(value, 2):g}"
+    return str(value)
+
+
+def create_carousel_html(items, title_field="title", img_field="main_picture", badge_field=None, badge_prefix="⭐",
+                         image_url=None):
+    """Render carousel markup for a DataFrame slice in a single join pass.
+
+    The markup is kept on one line so Streamlit's markdown renderer never
+    mistakes indented HTML for a code block. ``image_url`` maps a picture
+    URL to the one to render (e.g. ImageCache.thumbnail_url).
+    """
+    titles = items[title_field].astype(str).tolist()
+    images = items[img_field].fillna("").astype(str).tolist()
+    if image_url is not None:
+        images = [image_url(img) if img else img for img in images]
+    badges = items[badge_field].tolist() if badge_field else [None] * len(titles)
+
+    cards = []
+    for title, img, badge in zip(titles, images, badges):
+        title = escape(title, quote=True)
+        badge_html = "" if badge is None or pd.isna(badge) else (
+            f'<div class="rating-badge">{badge_prefix} {escape(_format_badge(badge))}</div>'
+        )
+        cards.append(
+            f'<div class="carousel-item"><img src="{escape(img, quote=True)}" alt="{title}">'
+            f'{badge_html}<div class="carousel-caption">{title}</div></div>'
+        )
+    return '<div class="carousel-container">' + "".join(cards) + "</div>"
+
+
+def get_carousel_html(catalog, table_name, kind, items, badge_field=None, badge_prefix="⭐", df=None, images=None):
+    """Carousel markup cached per (catalog version, carousel kind, badge field).
+
+    With an ImageCache, markup is also keyed on how many of the pictures are
+    stored, so each thumbnail that lands replaces its CDN URL on the next
+    render, while renders between downloads reuse the markup. The count only
+    grows within a catalog version, so at most one entry per picture is built.
+    """
+    cached = images.cached_count(items["main_picture"].tolist()) if images is not None else 0
+    image_url = images.thumbnail_url if images is not None else None
+    return catalog.derived(
+        table_name, ("carousel", kind, badge_field, badge_prefix, cached),
+        lambda frame: create_carousel_html(items, badge_field=badge_field, badge_prefix=badge_prefix,
+                                           image_url=image_url),
+        df=df,
+    )
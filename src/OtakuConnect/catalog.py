@@ -0,0 +1,88 @@
+from db_utils import apply_dtypes, load_typed_table
+
+# Columns each consumer needs from the shared catalog. Long text such as
+# synopsis is not cached; detail views fetch it per item with load_rows_by_id.
+ANIME_COLUMNS = ['id', 'title', 'main_picture', 'mean', 'rank', 'popularity', 'status',
+                 'genres', 'num_episodes', 'start_date', 'end_date', 'agerating', 'studios']
+
+MANGA_COLUMNS = ['id', 'title', 'main_picture', 'authors', 'mean', 'rank', 'popularity',
+                 'status', 'genres', 'num_volumes', 'num_chapters', 'media_type',
+                 'start_date', 'end_date']
+
+# Detail views: the catalog columns plus synopsis, never SELECT * (the pgvector
+# engine adds an embedding column to both tables)
+ANIME_DETAIL_COLUMNS = ANIME_COLUMNS + ['synopsis']
+MANGA_DETAIL_COLUMNS = MANGA_COLUMNS + ['synopsis']
+
+# Password hashes never enter the cache
+USER_COLUMNS = ['id', 'firstname', 'lastname', 'username', 'email', 'favoritegenres',
+                'avatar_path', 'roleid', 'accountstatus', 'accountcreateddate']
+
+ANIME_DTYPES = {
+    'id': 'Int32',
+    'mean': 'float32',
+    'rank': 'Int32',
+    'popularity': 'Int32',
+    'num_episodes': 'Int32',
+    'status': 'category',
+    'agerating': 'category',
+    'start_date': 'datetime64[ns]',
+    'end_date': 'datetime64[ns]',
+}
+
+MANGA_DTYPES = {
+    'id': 'Int32',
+    'mean': 'float32',
+    'rank': 'Int32',
+    'popularity': 'Int32',
+    'num_volumes': 'Int32',
+    'num_chapters': 'Int32',
+    'status': 'category',
+    'media_type': 'category',
+    'start_date': 'datetime64[ns]',
+    'end_date': 'datetime64[ns]',
+}
+
+USER_DTYPES = {
+    'id': 'Int32',
+    'roleid': 'category',
+    'accountstatus': 'category',
+}
+
+CATALOG_TABLES = {
+    'anime': (ANIME_COLUMNS, ANIME_DTYPES),
+    'manga': (MANGA_COLUMNS, MANGA_DTYPES),
+    'users': (USER_COLUMNS, USER_DTYPES),
+}
+
+
+AIRING_STATUSES = ('currently_airing', 'currently_publishing')
+
+
+def enrich_catalog(table_name, df):
+    """Add the derived columns pages rely on, computed once per catalog version.
+
+    ``start_date``/``end_date`` are already datetime64 after loading; this adds
+    ``has_picture``.
+    """
+    if table_name not in ('anime', 'manga'):
+        return df
+    df['has_picture'] = (df['main_picture'].fillna('').astype(str).str.strip() != '').to_numpy(dtype=bool)
+    return df
+
+
+def load_catalog_table(engine, table_name):
+    """Load a catalog table with its projected columns, compact dtypes and derived fields."""
+    columns, dtypes = CATALOG_TABLES[table_name]
+    df = enrich_catalog(table_name, load_typed_table(engine, table_name, columns, dtypes))
+
+    report = df.attrs["memory_report"]
+    print(f"Loaded {table_name}: {report['rows']} rows, "
+          f"{report['typed_bytes'] / 1e6:.2f} MB "
+          f"(saved {report['saved_bytes'] / 1e6:.2f} MB vs default dtypes)")
+    return df
+
+
+def apply_catalog_dtypes(table_name, df):
+    """Give an ad-hoc query result the same dtypes and derived fields as the cached table."""
+    return enrich_catalog(table_name, apply_dtypes(df, CATALOG_TABLES[table_name][1]))
@@ -0,0 +1,128 @@
+import re
+
+# Dimensions split out of the comma-separated text columns, per catalog table.
+# Each has a lookup table ``<dimension>(id, name, slug)`` and a link table
+# ``item_<dimension>(entity_type, item_id, <dimension>_id)``.
+DIMENSIONS = {
+    "anime": {"genres": "genre", "studios": "studio"},
+    "manga": {"genres": "genre", "authors": "author"},
+}
+
+# Same normalization as genre_slug, in SQL
+_SLUG_SQL = "btrim(regexp_replace(lower({name}), '[^a-z0-9]+', '-', 'g'), '-')"
+
+
+def genre_slug(name):
+    """Lowercase, hyphen-separated form used to match genres: "Slice of Life" -> "slice-of-life"."""
+    return re.sub(r"[^a-z0-9]+", "-", str(name).lower()).strip("-")
+
+
+def entity_type(table_name):
+    """Entity type label used in link tables, matching Feedback_Table ('Anime'/'Manga')."""
+    return table_name.title()
+
+
+def sync_dimensions(cursor, table_name, mal_ids=None):
+    """Rebuild the dimension links of some (or all) rows of a catalog table.
+
+    Runs on an open cursor so it can share the ingest upsert's transaction;
+    the text columns stay the source of truth and the link tables are
+    derived from them. ``mal_ids=None`` rebuilds every row.
+    """
+    kind = entity_type(table_name)
+    cursor.execute("DROP TABLE IF EXISTS dimension_items")
+    if mal_ids is None:
+        cursor.execute(f"CREATE TEMP TABLE dimension_items ON COMMIT DROP AS SELECT id FROM {table_name}")
+    else:
+        cursor.execute(f"CREATE TEMP TABLE dimension_items ON COMMIT DROP AS "
+                       f"SELECT id FROM {table_name} WHERE mal_id = ANY(%s)", (list(mal_ids),))
+
+    for column, dimension in DIMENSIONS[table_name].items():
+        cursor.execute("DROP TABLE IF EXISTS dimension_pairs")
+        cursor.execute(f"""
+            CREATE TEMP TABLE dimension_pairs ON COMMIT DROP AS
+            SELECT DISTINCT t.id AS item_id, btrim(name) AS name
+            FROM {table_name} t
+            JOIN dimension_items i ON i.id = t.id,
+                 regexp_split_to_table(t.{column}, ',') AS name
+            WHERE btrim(name) <> ''
+        """)
+        # Sorted, so concurrent transactions adding overlapping names lock them in the same order
+        cursor.execute(f"""
+            INSERT INTO {dimension} (name, slug)
+            SELECT name, {_SLUG_SQL.format(name='name')} FROM (SELECT DISTINCT name FROM dimension_pairs) n
+            ORDER BY name
+            ON CONFLICT (name) DO NOTHING
+        """)
+        cursor.execute(f"DELETE FROM item_{dimension} l USING dimension_items i "
+                       f"WHERE l.entity_type = %s AND l.item_id = i.id", (kind,))
+        cursor.execute(f"""
+            INSERT INTO item_{dimension} (entity_type, item_id, {dimension}_id)
+            SELECT %s, p.item_id, d.id
+            FROM dimension_pairs p JOIN {dimension} d ON d.name = p.name
+            ON CONFLICT DO NOTHING
+        """, (kind,))
+
+
+def register_dimension_names(engine, table_name, df):
+    """Add the genre/studio/author names of a batch of rows in their own short transaction.
+
+    Run before the batch's upsert: anime and manga pages are written at the
+    same time and share the genre table, so new names are committed here,
+    in name order, instead of being held by each page's transaction.
+    """
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            for column, dimension in DIMENSIONS[table_name].items():
+                if column not in df:
+                    continue
+                # Split and trimmed like sync_dimensions (btrim strips spaces only)
+                names = sorted({name.strip(" ") for value in df[column].dropna()
+                                for name in str(value).split(",")} - {""})
+                if names:
+                    cursor.execute(f"""
+                        INSERT INTO {dimension} (name, slug)
+                        SELECT name, {_SLUG_SQL.format(name='name')} FROM unnest(%s::text[]) AS name
+                        ORDER BY name
+                        ON CONFLICT (name) DO NOTHING
+                    """, (names,))
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def rebuild_dimensions(engine, table_name):
+    """Populate the dimension tables for every row, e.g. right after creating them."""
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            sync_dimensions(cursor, table_name)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def genre_filter_sql(table_name, param="genres"):
+    """WHERE-clause semi-join keeping rows tagged with any genre slug in ``:param``.
+
+    Bind ``param`` as an expanding parameter. The lookup goes through the
+    (entity_type, genre_id, item_id) index instead of scanning the genres text.
+    """
+    return (f"{table_name}.id IN (SELECT ig.item_id FROM item_genre ig JOIN genre g ON g.id = ig.genre_id "
+            f"WHERE ig.entity_type = '{entity_type(table_name)}' AND g.slug IN :{param})")
+
+
+def similar_genre_filter_sql(table_name, param="liked_ids"):
+    """WHERE-clause semi-join keeping rows that share a genre with the item ids in ``:param``."""
+    kind = entity_type(table_name)
+    return (f"{table_name}.id IN (SELECT ig.item_id FROM item_genre ig "
+            f"WHERE ig.entity_type = '{kind}' AND ig.genre_id IN ("
+            f"SELECT liked.genre_id FROM item_genre liked "
+            f"WHERE liked.entity_type = '{kind}' AND liked.item_id IN :{param}))")
@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import pyarrow as pa
+from sqlalchemy import text
+
+from catalog import CATALOG_TABLES, load_catalog_table
+
+# <repo>/data/snapshots, independent of the directory the app is started from
+DEFAULT_SNAPSHOT_DIR = Path(__file__).resolve().parents[2] / "data" / "snapshots"
+
+# Bump when the columns, dtypes or derived fields of a catalog table change,
+# so snapshots written by older code are ignored instead of misread
+SNAPSHOT_FORMAT = 2
+
+# Only the MAL catalog changes solely through the ingest; users stay on their short TTL
+SNAPSHOT_TABLES = ("anime", "manga")
+
+
+def table_fingerprint(engine, table_name):
+    """Cheap fingerprint of a catalog table's contents: row count, max id and the record hashes.
+
+    Every ingest write changes ``record_hash``, so a snapshot whose
+    fingerprint matches the database holds the same rows.
+    """
+    query = text(f"SELECT count(*), coalesce(max(id), 0), "
+                 f"md5(coalesce(string_agg(coalesce(record_hash, ''), ',' ORDER BY id), '')) FROM {table_name}")
+    with engine.connect() as connection:
+        count, max_id, digest = connection.execute(query).one()
+    return f"{count}:{max_id}:{digest}"
+
+
+class CatalogSnapshots:
+    """Versioned Arrow IPC snapshots of the typed, enriched catalog tables.
+
+    Each write adds ``<table>-v<format>-<timestamp>.arrow`` and then
+    atomically repoints ``<table>.json`` at it, so readers never see a half
+    written file; the ``keep`` newest files per table are kept for readers
+    that still have an older one mapped. Files are uncompressed so they can
+    be memory-mapped: numeric and boolean columns are used straight from the
+    page cache and only strings are materialized for pandas.
+    """
+
+    def __init__(self, directory=DEFAULT_SNAPSHOT_DIR, keep=2):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def manifest(self, table_name):
+        """The current snapshot's manifest, or None if there is no usable one."""
+        path = self.directory / f"{table_name}.json"
+        try:
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        if manifest.get("format") != SNAPSHOT_FORMAT or not (self.directory / manifest["file"]).exists():
+            return None
+        return manifest
+
+    def write(self, table_name, df, fingerprint):
+        """Write ``df`` as the table's new snapshot and return its manifest."""
+        arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+        version = time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + f"{time.time() % 1:.6f}"[1:]
+        name = f"{table_name}-v{SNAPSHOT_FORMAT}-{version}.arrow"
+        tmp_path = self.directory / f"{name}.tmp"
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table)
+        os.replace(tmp_path, self.directory / name)
+
+        manifest = {
+            "table": table_name,
+            "format": SNAPSHOT_FORMAT,
+            "file": name,
+            "fingerprint": fingerprint,
+            "rows": len(df),
+            "created_at": time.time(),
+        }
+        manifest_path = self.directory / f"{table_name}.json"
+        with self._lock:
+            tmp_manifest = manifest_path.with_suffix(".json.tmp")
+            tmp_manifest.write_text(json.dumps(manifest), encoding="utf-8")
+            os.replace(tmp_manifest, manifest_path)
+            self._prune(table_name)
+        return manifest
+
+    def _prune(self, table_name):
+        files = sorted(self.directory.glob(f"{table_name}-v*.arrow"))
+        for old in files[:-self.keep]:
+            # Unlinking is safe on POSIX even while another worker has it mapped
+            old.unlink(missing_ok=True)
+
+    def arrow_table(self, table_name, manifest=None):
+        """The snapshot as a memory-mapped ``pyarrow.Table`` (zero-copy columns), or None."""
+        manifest = manifest or self.manifest(table_name)
+        if manifest is None:
+            return None
+        try:
+            source = pa.memory_map(str(self.directory / manifest["file"]), "r")
+            return pa.ipc.open_file(source).read_all()
+        except OSError as error:
+            # Pruned by a newer write between reading the manifest and mapping the file
+            print(f"{table_name} snapshot {manifest['file']} unreadable: {error}")
+            return None
+
+    def read(self, table_name, manifest=None):
+        """The snapshot as a DataFrame with the catalog's dtypes, or None if there is none."""
+        manifest = manifest or self.manifest(table_name)
+        if manifest is None:
+            return None
+        arrow_table = self.arrow_table(table_name, manifest)
+        if arrow_table is None:
+            return None
+        # split_blocks keeps each column in its own block so mapped numeric buffers are not consolidated
+        df = arrow_table.to_pandas(split_blocks=True)
+        df.attrs["memory_report"] = {
+            "table": table_name,
+            "rows": len(df),
+            "columns": len(df.columns),
+            "default_bytes": None,
+            "typed_bytes": int(df.memory_usage(deep=True).sum()),
+            "saved_bytes": None,
+            "snapshot": manifest["file"],
+        }
+        return df
+
+    def _read_current(self, table_name, manifest, fingerprint=None):
+        """Read a snapshot, retrying once with the latest manifest if its file was pruned meanwhile."""
+        df = self.read(table_name, manifest)
+        if df is None:
+            manifest = self.manifest(table_name)
+            if manifest is not None and fingerprint in (None, manifest["fingerprint"]):
+                df = self.read(table_name, manifest)
+        return df
+
+    def load(self, engine, table_name, write_back=False):
+        """Load a catalog table from its snapshot, or from Postgres when it is missing or stale.
+
+        A snapshot is stale when its fingerprint no longer matches the
+        table's. Only the ingest writes snapshots (write_catalog_snapshots),
+        so stale workers do not each add one after a deploy; ``write_back``
+        writes one after a Postgres load. If Postgres cannot be reached for
+        the fingerprint, whatever snapshot exists is served.
+        """
+        manifest = self.manifest(table_name)
+        try:
+            fingerprint = table_fingerprint(engine, table_name)
+        except Exception as error:
+            if manifest is None:
+                raise
+            print(f"Serving {table_name} snapshot {manifest['file']} unchecked: {error}")
+            df = self._read_current(table_name, manifest)
+            if df is None:
+                raise
+            return df
+
+        if manifest is not None and manifest["fingerprint"] == fingerprint:
+            start = time.perf_counter()
+            df = self._read_current(table_name, manifest, fingerprint)
+            if df is not None:
+                print(f"Loaded {table_name} from snapshot {df.attrs['memory_report']['snapshot']}: {len(df)} rows "
+                      f"in {(time.perf_counter() - start) * 1e3:.1f} ms")
+                return df
+
+        state = "not found" if manifest is None else ("is stale" if manifest["fingerprint"] != fingerprint
+                                                      else "was removed")
+        print(f"{table_name} snapshot {state}; loading from Postgres")
+        df = load_catalog_table(engine, table_name)
+        if write_back:
+            self.write(table_name, df, fingerprint)
+        return df
+
+
+def load_catalog(engine, table_name, snapshots=None):
+    """Catalog loader for CatalogStore.register: snapshot-backed for the MAL tables."""
+    if snapshots is None or table_name not in SNAPSHOT_TABLES:
+        return load_catalog_table(engine, table_name)
+    return snapshots.load(engine, table_name)
+
+
+def write_catalog_snapshots(engine, snapshots, tables=SNAPSHOT_TABLES):
+    """Snapshot the current contents of the catalog tables, e.g. at the end of an ingest."""
+    manifests = {}
+    for table_name in tables:
+        if table_name not in CATALOG_TABLES:
+            raise KeyError(f"'{table_name}' is not a catalog table")
+        fingerprint = table_fingerprint(engine, table_name)
+        manifests[table_name] = snapshots.write(table_name, load_catalog_table(engine, table_name), fingerprint)
+    return manifests
+
+
+_snapshots = None
+_snapshots_lock = threading.Lock()
+
+
+def get_catalog_snapshots(directory=None):
+    """Return the snapshot directory handle shared by the process (first call's directory wins)."""
+    global _snapshots
+    if _snapshots is None:
+        with _snapshots_lock:
+            if _snapshots is None:
+                _snapshots = CatalogSnapshots(directory or DEFAULT_SNAPSHOT_DIR)
+    return _snapshots
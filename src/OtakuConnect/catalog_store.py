@@ -0,0 +1,158 @@
+import threading
+import time
+
+
+class CatalogStore:
+    """Process-wide, versioned in-memory cache for catalog tables.
+
+    Every Streamlit session in the process reads from the same store, so a
+    table is only read from Postgres when it is first requested, when its TTL
+    has expired, or when it has been explicitly invalidated.
+    """
+
+    def __init__(self, default_ttl=600):
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._tables = {}
+
+    def register(self, name, loader, ttl=None):
+        """Register a zero-argument loader for a table. Re-registering is a no-op."""
+        with self._lock:
+            if name not in self._tables:
+                self._tables[name] = {
+                    "loader": loader,
+                    "ttl": self.default_ttl if ttl is None else ttl,
+                    "lock": threading.Lock(),
+                    "df": None,
+                    "version": 0,
+                    "loaded_at": None,
+                    "stale": True,
+                    "hits": 0,
+                    "misses": 0,
+                    "refreshes": 0,
+                    "last_refresh_seconds": None,
+                    "total_refresh_seconds": 0.0,
+                    "derived": {},
+                }
+
+    def _entry(self, name):
+        try:
+            return self._tables[name]
+        except KeyError:
+            raise KeyError(f"Catalog table '{name}' is not registered") from None
+
+    def _is_fresh(self, entry):
+        if entry["df"] is None or entry["stale"]:
+            return False
+        if entry["ttl"] is None or entry["ttl"] <= 0:
+            return True
+        return time.monotonic() - entry["loaded_at"] < entry["ttl"]
+
+    def get(self, name):
+        """Return the cached DataFrame for a table, reloading it if expired."""
+        return self._current_df(self._entry(name))
+
+    def _current_df(self, entry):
+        if self._is_fresh(entry):
+            entry["hits"] += 1
+            return entry["df"]
+
+        # Only one session reloads a table; the others wait and reuse the result
+        with entry["lock"]:
+            if self._is_fresh(entry):
+                entry["hits"] += 1
+                return entry["df"]
+            entry["misses"] += 1
+            self._reload(entry)
+            return entry["df"]
+
+    def derived(self, name, key, builder, df=None):
+        """Return builder(df) for the table's current version, building it only once.
+
+        Derived structures (indexes, rankings, rendered fragments) are dropped
+        whenever the table is reloaded. Pass the DataFrame the caller already
+        holds as ``df`` so a reload in between never pairs it with a structure
+        built from a newer version.
+        """
+        entry = self._entry(name)
+        if df is None:
+            df = self._current_df(entry)
+
+        cache = entry["derived"]
+        if entry["df"] is df and key in cache:
+            return cache[key]
+
+        with entry["lock"]:
+            cache = entry["derived"]
+            if entry["df"] is df and key in cache:
+                return cache[key]
+            value = builder(df)
+            if entry["df"] is df:
+                cache[key] = value
+            return value
+
+    def _reload(self, entry):
+        start = time.perf_counter()
+        df = entry["loader"]()
+        elapsed = time.perf_counter() - start
+
+        # Reset derived structures before publishing the new frame
+        entry["derived"] = {}
+        entry["df"] = df
+        entry["version"] += 1
+        entry["loaded_at"] = time.monotonic()
+        entry["stale"] = False
+        entry["refreshes"] += 1
+        entry["last_refresh_seconds"] = elapsed
+        entry["total_refresh_seconds"] += elapsed
+
+    def refresh(self, name):
+        """Force a reload of a table and return the new DataFrame."""
+        entry = self._entry(name)
+        with entry["lock"]:
+            self._reload(entry)
+            return entry["df"]
+
+    def invalidate(self, name=None):
+        """Mark one table (or every table) as stale so the next get() reloads it."""
+        names = [name] if name is not None else list(self._tables)
+        for table in names:
+            self._entry(table)["stale"] = True
+
+    def version(self, name):
+        return self._entry(name)["version"]
+
+    def stats(self):
+        """Hit/miss and refresh-time counters per table."""
+        stats = {}
+        for name, entry in self._tables.items():
+            lookups = entry["hits"] + entry["misses"]
+            memory = {} if entry["df"] is None else entry["df"].attrs.get("memory_report", {})
+            stats[name] = {
+                "version": entry["version"],
+                "rows": 0 if entry["df"] is None else len(entry["df"]),
+                "hits": entry["hits"],
+                "misses": entry["misses"],
+                "hit_rate": entry["hits"] / lookups if lookups else 0.0,
+                "refreshes": entry["refreshes"],
+                "last_refresh_seconds": entry["last_refresh_seconds"],
+                "total_refresh_seconds": entry["total_refresh_seconds"],
+                "age_seconds": None if entry["loaded_at"] is None else time.monotonic() - entry["loaded_at"],
+                "memory_bytes": memory.get("typed_bytes"),
+                "memory_saved_bytes": memory.get("saved_bytes"),
+            }
+        return stats
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_catalog_store(default_ttl=600):
+    """Return the catalog store shared by every session in this process."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CatalogStore(default_ttl=default_ttl)
+    return _store
@@ -14,6 +14,13 @@ class Config:
     DB_HOST = os.environ["DB_HOST"]
     DB_PORT = os.environ["DB_PORT"]
     DB_NAME = os.environ["DB_NAME"]
+
+    # DB connection pool settings
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
     
     # OpenAI Configuration
     AZURE_OPENAI_ENDPOINT = os.environ["OPENAI_ENDPOINT"]
@@ -21,4 +28,62 @@ class Config:
     AZURE_OPENAI_API_VERSION = os.environ["OPENAI_API_VERSION"]
 
     # Data ingestion settings
-    CLIENT_ID = os.environ["CLIENT_ID"] 
\ No newline at end of file
+    CLIENT_ID = os.environ["CLIENT_ID"]
+    MAL_BASE_URL = os.environ.get("MAL_BASE_URL", "https://api.myanimelist.net/v2")
+    MAL_REQUESTS_PER_SECOND = float(os.environ.get("MAL_REQUESTS_PER_SECOND", 2))
+    MAL_BURST = int(os.environ.get("MAL_BURST", 4))
+    MAL_MAX_WORKERS = int(os.environ.get("MAL_MAX_WORKERS", 4))
+    # Checkpoint and page spool for resumable ingests (default: <repo>/data/ingest)
+    INGEST_STATE_DIR = os.environ.get("INGEST_STATE_DIR")
+    # Delta sync (data_ingest.py --delta): airing/publishing titles refresh on every
+    # run, the full ranking is walked again once it is older than this many days
+    INGEST_FULL_SYNC_DAYS = float(os.environ.get("INGEST_FULL_SYNC_DAYS", 7))
+
+    # Catalog cache settings (seconds before a cached table is reloaded)
+    CATALOG_TTL_SECONDS = int(os.environ.get("CATALOG_TTL_SECONDS", 600))
+    USERS_TTL_SECONDS = int(os.environ.get("USERS_TTL_SECONDS", 60))
+
+    # Picture cache: "lazy" downloads pictures when first shown, "prefetched" only
+    # serves what data_ingest.py --images stored, "off" links MAL's CDN directly
+    IMAGE_CACHE_MODE = os.environ.get("IMAGE_CACHE_MODE", "lazy").lower()
+
+    # Catalog snapshots: data_ingest.py writes Arrow snapshots of anime/manga that
+    # workers memory-map at start instead of reading Postgres (default: <repo>/data/snapshots)
+    CATALOG_SNAPSHOTS = os.environ.get("CATALOG_SNAPSHOTS", "true").lower() in ("1", "true", "yes")
+    CATALOG_SNAPSHOT_DIR = os.environ.get("CATALOG_SNAPSHOT_DIR")
+
+    # Title search backend: "memory" (in-process index) or "postgres" (pg_trgm)
+    SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "memory").lower()
+
+    # Recommendation index: "exact" (NumPy top-k), "hnsw" (hnswlib), "faiss" (faiss-cpu)
+    # or "pgvector" (vectors and their index in Postgres, no matrix in the app process);
+    # ANN indexes are saved under ANN_INDEX_DIR (default: <repo>/data/ann)
+    RECOMMENDER_INDEX = os.environ.get("RECOMMENDER_INDEX", "exact").lower()
+    ANN_INDEX_DIR = os.environ.get("ANN_INDEX_DIR")
+    # pgvector engine: index type ("hnsw" or "ivfflat") built by data_ingest.py, search
+    # breadth per query, and PGVECTOR_EXACT to skip the approximate index altogether
+    PGVECTOR_INDEX = os.environ.get("PGVECTOR_INDEX", "hnsw").lower()
+    PGVECTOR_EF_SEARCH = int(os.environ.get("PGVECTOR_EF_SEARCH", 100))
+    PGVECTOR_PROBES = int(os.environ.get("PGVECTOR_PROBES", 10))
+    PGVECTOR_EXACT = os.environ.get("PGVECTOR_EXACT", "false").lower() in ("1", "true", "yes")
+
+    # Embedding pipeline (data_ingest.py --embeddings and new reviews): "local" is a
+    # deterministic hashing model needing no service, "http" any OpenAI-compatible
+    # EMBEDDING_URL, "azure" the EMBEDDING_MODEL deployment of the Azure OpenAI resource above
+    EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "local").lower()
+    EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-3-small")
+    EMBEDDING_URL = os.environ.get("EMBEDDING_URL")
+    EMBEDDING_API_KEY = os.environ.get("EMBEDDING_API_KEY")
+    EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", 128))
+    EMBEDDING_REQUESTS_PER_SECOND = float(os.environ.get("EMBEDDING_REQUESTS_PER_SECOND", 5))
+    EMBEDDING_MAX_WORKERS = int(os.environ.get("EMBEDDING_MAX_WORKERS", 4))
+    # Item vectors the recommender ranks with: "content" (genres, studios, authors) or
+    # "pipeline" (the embedding pipeline's vectors, plus the user's review texts)
+    ITEM_EMBEDDINGS = os.environ.get("ITEM_EMBEDDINGS", "content").lower()
+
+    # Chatbot query parses: "memory" keeps the last QUERY_CACHE_SIZE parses per process for
+    # QUERY_CACHE_TTL_SECONDS, "postgres" also shares them between workers (query_cache table),
+    # "off" disables the cache
+    QUERY_CACHE_BACKEND = os.environ.get("QUERY_CACHE_BACKEND", "memory").lower()
+    QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 1024))
+    QUERY_CACHE_TTL_SECONDS = int(os.environ.get("QUERY_CACHE_TTL_SECONDS", 86400))
@@ -1,11 +1,20 @@
-import requests
-import time
-import pandas as pd
-from sqlalchemy import create_engine
-import streamlit as st
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 from config import Config
-from db_utils import get_connection, load_table_as_df
+from db_utils import get_connection, pool_stats
+from mal_client import MALClient
+from ingest_checkpoint import DEFAULT_STATE_DIR, IngestCheckpoint
+from ingest_metrics import IngestMetrics
+from ingest_pipeline import ANIME_FIELDS, MANGA_FIELDS, INGEST_JOBS, delta_sync, ingest_ranking
+from mal_transform import transform_anime, transform_manga
+from catalog_dimensions import rebuild_dimensions
+from catalog_snapshot import get_catalog_snapshots, write_catalog_snapshots
+from ann_index import update_item_indexes
+from embedding_pipeline import (EmbeddingPipeline, PostgresEmbeddingCache, embed_catalog, embed_reviews,
+                                make_embedder)
+from image_cache import ImageCache
 
 
 CLIENT_ID = Config.CLIENT_ID
@@ -17,135 +26,117 @@ engine = get_connection(Config.DB_USERNAME,
                         Config.DB_PORT,
                         Config.DB_NAME)
 
-ANIMEBASE_URL = "https://api.myanimelist.net/v2/anime/ranking"
-ANIME_FIELDS = "id,title,main_picture,mean,rank,popularity,status,genres,num_episodes,duration,rating,studios,start_date,end_date,synopsis"
+def get_mal_client():
+    """MAL client configured from Config; share one between anime and manga fetches."""
+    return MALClient(CLIENT_ID,
+                     base_url=Config.MAL_BASE_URL,
+                     rate=Config.MAL_REQUESTS_PER_SECOND,
+                     burst=Config.MAL_BURST,
+                     max_workers=Config.MAL_MAX_WORKERS)
 
-MANGABASE_URL = "https://api.myanimelist.net/v2/manga/ranking"
-MANGA_FIELDS = "id,title,authors{first_name,last_name},main_picture,mean,rank,popularity,status,genres,num_pages,num_volumes,num_chapters,media_type,start_date,end_date,synopsis"
-
-def fix_date(date):
-    try:
-        # Try to convert to datetime
-        return pd.to_datetime(date, errors="raise").date()
-    except:
-        # If conversion fails, check if it's a year-only string
-        if isinstance(date, str) and date.isdigit() and len(date) == 4:
-            return pd.to_datetime(f"{date}-01-01").date()
-        else:
-            return None  # or pd.NaT
-        
-def get_anime_data(total=2000, limit=100):
-    anime_list = []
-    for offset in range(0, total, limit):
-        params = {
-            "ranking_type": "all",   # get top ranked anime
-            "limit": limit,
-            "offset": offset,
-            "fields": ANIME_FIELDS
-        }
-        headers = {"X-MAL-CLIENT-ID": CLIENT_ID}
-
-        response = requests.get(ANIMEBASE_URL, headers=headers, params=params)
-
-        if response.status_code != 200:
-            print("Error:", response.status_code, response.text)
-            break
-
-        data = response.json()
-        anime_list.extend([entry["node"] for entry in data["data"]])
-
-        print(f"Fetched {len(anime_list)} anime so far...")
-        time.sleep(1)  
+def get_anime_data(total=2000, limit=100, client=None):
+    client = client or get_mal_client()
+    anime_list = client.fetch_ranking("anime", total, limit, ANIME_FIELDS)
 
     print(f"\n✅ Done! Collected {len(anime_list)} anime entries.")
 
-    animedf=pd.DataFrame(anime_list)
-    animedf['genres'] = animedf['genres'].apply(lambda g: ", ".join(d['name'] for d in g) if isinstance(g, list) else "")
-    animedf['main_picture']=animedf['main_picture'].apply(lambda x: x['medium'])
-    animedf['studios']=animedf['studios'].apply(lambda g: ", ".join(d['name'] for d in g) if isinstance(g, list) else None)
-    animedf= animedf.rename(columns={'rating': 'agerating'})
-    animedf["start_date"] = animedf["start_date"].apply(fix_date)
-    animedf["end_date"] = animedf["end_date"].apply(fix_date)
-    animedf['title'] = animedf['title'].str.replace('"', '')
-    
-    return animedf
-
-
-def get_manga_data(total=2000, limit=100):
-    manga_list = []
-    for offset in range(0, total, limit):
-        params = {
-            "ranking_type": "all",  
-            "limit": limit,
-            "offset": offset,
-            "fields": MANGA_FIELDS
-        }
-        headers = {"X-MAL-CLIENT-ID": CLIENT_ID}
-
-        response = requests.get(MANGABASE_URL, headers=headers, params=params)
-
-        if response.status_code != 200:
-            print("Error:", response.status_code, response.text)
-            break
-
-        data = response.json()
-        manga_list.extend([entry["node"] for entry in data["data"]])
-
-        print(f"Fetched {len(manga_list)} manga so far...")
-        time.sleep(1)   
-
-    print(f"\n✅ Done! Collected {len(manga_list)} manga entries.")
-
-    mangadf = pd.DataFrame(manga_list)
-
-    mangadf["authors"] = mangadf["authors"].apply(lambda a: ", ".join([f"{d['node']['first_name']} {d['node']['last_name']}" for d in a]) if isinstance(a, list) else "")
-    mangadf['genres'] = mangadf['genres'].apply(lambda g: ", ".join(d['name'] for d in g) if isinstance(g, list) else "")
-    mangadf['main_picture']=mangadf['main_picture'].apply(lambda x: x['medium'])
-    mangadf["start_date"] = mangadf["start_date"].apply(fix_date)
-    mangadf["end_date"] = mangadf["end_date"].apply(fix_date)
-    mangadf['title'] = mangadf['title'].str.replace('"', '')
-    
-    return mangadf
+    return transform_anime(anime_list)
 
 
+def get_manga_data(total=2000, limit=100, client=None):
+    client = client or get_mal_client()
+    manga_list = client.fetch_ranking("manga", total, limit, MANGA_FIELDS)
 
+    print(f"\n✅ Done! Collected {len(manga_list)} manga entries.")
 
+    return transform_manga(manga_list)
 
 
 if __name__ == "__main__":
-    print("Data ingestion pipeline")
-
-    # Read existing data
-    existing_animedf = pd.read_sql("SELECT title FROM anime", con=engine)
-    existing_mangadf = pd.read_sql("SELECT title FROM manga", con=engine)
-
-    #animedf = animedf.drop(columns=["id"])
-    #mangadf = mangadf.drop(columns=["id"])
-
-    animedf = get_anime_data(total=10000, limit=100)
-    mangadf = get_manga_data(total=10000, limit=100)
-
-    # Filter wherever title is empty
-    animedf = animedf.dropna(subset=["title"])
-    mangadf = mangadf.dropna(subset=["title"])
-
-    # Filter out rows already in DB
-    animedf = animedf[~animedf["title"].isin(existing_animedf["title"])]
-    mangadf = mangadf[~mangadf["title"].isin(existing_mangadf["title"])]
-
-    #Reordering the columns Anime
-    animedb_columns = ['title', 'main_picture', 'mean', 'rank', 'popularity', 'status',
-        'genres', 'num_episodes', 'start_date', 'end_date', 'synopsis',
-        'agerating', 'studios']
-        
-    animedf = animedf[animedb_columns]
-
-    #Reordering the columns Manga
-    mangadb_columns = ['title', 'main_picture', 'authors', 'mean', 'rank', 'popularity',
-        'status', 'genres', 'num_volumes', 'num_chapters', 'media_type',
-        'start_date', 'end_date', 'synopsis']
-    mangadf = mangadf[mangadb_columns]
-
-    #Dumping data to DB
-    animedf.to_sql("anime", con=engine, if_exists="append", index=False)
-    mangadf.to_sql("manga", con=engine, if_exists="append", index=False)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Load MAL anime and manga rankings into the database.")
+    parser.add_argument("--delta", action="store_true",
+                        help="refresh airing/publishing titles and walk the full ranking only when it is due")
+    parser.add_argument("--rebuild-dimensions", action="store_true",
+                        help="only rebuild the genre/studio/author tables from the stored rows")
+    parser.add_argument("--images", action="store_true",
+                        help="also download pictures into the local thumbnail cache the app serves")
+    parser.add_argument("--embeddings", action="store_true",
+                        help="also embed titles and reviews whose text changed (EMBEDDING_* settings)")
+    parser.add_argument("--metrics-jsonl", metavar="PATH",
+                        help="append per-stage metrics to PATH as JSON lines ('-' for stdout)")
+    args = parser.parse_args()
+
+    if args.rebuild_dimensions:
+        for media in INGEST_JOBS:
+            rebuild_dimensions(engine, media)
+            print(f"Rebuilt {media} dimensions")
+        raise SystemExit(0)
+
+    print("Data ingestion pipeline" + (" (delta sync)" if args.delta else ""))
+
+    # Anime and manga stream side by side under one shared rate limit
+    client = get_mal_client()
+    checkpoint = IngestCheckpoint(Config.INGEST_STATE_DIR or DEFAULT_STATE_DIR)
+    events = None
+    if args.metrics_jsonl:
+        events = sys.stdout if args.metrics_jsonl == "-" else open(args.metrics_jsonl, "a", encoding="utf-8")
+    metrics = IngestMetrics(events, labels={"mode": "delta" if args.delta else "full"})
+    client.metrics = metrics
+    images = ImageCache() if args.images else None
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        if args.delta:
+            futures = {media: pool.submit(delta_sync, client, engine, media, checkpoint,
+                                          Config.INGEST_FULL_SYNC_DAYS, 10000, 100, metrics, images)
+                       for media in INGEST_JOBS}
+        else:
+            futures = {media: pool.submit(ingest_ranking, client, engine, media, 10000, 100, checkpoint, metrics, images)
+                       for media in INGEST_JOBS}
+        results = {media: future.result() for media, future in futures.items()}
+
+    # Titles whose text changed since the last run, and new or edited reviews, get vectors now
+    embeddings = None
+    if args.embeddings:
+        pipeline = EmbeddingPipeline(make_embedder(Config), PostgresEmbeddingCache(engine),
+                                     batch_size=Config.EMBEDDING_BATCH_SIZE,
+                                     max_workers=Config.EMBEDDING_MAX_WORKERS, metrics=metrics)
+        embeddings = {media: embed_catalog(engine, pipeline, media) for media in INGEST_JOBS}
+        embeddings["reviews"] = embed_reviews(engine, pipeline)
+
+    print("\n✅ Done!")
+    for media, result in results.items():
+        print(f"{media}: {result}")
+    print(metrics.report())
+    print("MAL requests:", client.stats)
+    if embeddings is not None:
+        print("Embeddings:", embeddings, pipeline.stats)
+    if images is not None:
+        # Downloads overlap the MAL fetches; finish the ones still queued
+        images.wait()
+        print("Images:", images.summary())
+    metrics.write_summary(results=results, mal=client.stats,
+                          images=images.summary() if images is not None else None, embeddings=embeddings)
+    if events not in (None, sys.stdout):
+        events.close()
+
+    # Workers start from these instead of reading the tables from Postgres
+    if Config.CATALOG_SNAPSHOTS:
+        for media, manifest in write_catalog_snapshots(engine, get_catalog_snapshots(Config.CATALOG_SNAPSHOT_DIR)).items():
+            print(f"{media} snapshot: {manifest['file']} ({manifest['rows']} rows)")
+
+    # New titles join the saved ANN indexes here rather than on a worker's first recommendation
+    if Config.RECOMMENDER_INDEX != "exact":
+        snapshots = get_catalog_snapshots(Config.CATALOG_SNAPSHOT_DIR) if Config.CATALOG_SNAPSHOTS else None
+        model = make_embedder(Config).model if Config.ITEM_EMBEDDINGS == "pipeline" else None
+        for media, count in update_item_indexes(engine, Config.RECOMMENDER_INDEX, Config.ANN_INDEX_DIR,
+                                                snapshots, model=model, pgvector_index=Config.PGVECTOR_INDEX).items():
+            print(f"{media} {Config.RECOMMENDER_INDEX} index: {count} items")
+
+    # Pages already written stay in the DB; the next run resumes after them
+    for media in INGEST_JOBS:
+        if checkpoint.is_complete(media):
+            checkpoint.clear(media)
+            checkpoint.mark_full_sync(media)
+        elif checkpoint.next_offset(media):
+            print(f"{media} ingest incomplete at offset {checkpoint.next_offset(media)}; rerun to resume.")
+
+    print("DB pool stats:", pool_stats(engine))
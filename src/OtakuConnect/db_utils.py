@@ -1,10 +1,270 @@
+import io
+import threading
+import time
+
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.pool import QueuePool
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check out a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.checkout_count = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with self._wait_lock:
+                self.checkout_count += 1
+                self.total_wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def recreate(self):
+        # Keep the timing counters when SQLAlchemy swaps the pool after a disconnect
+        new_pool = super().recreate()
+        new_pool.checkout_count = self.checkout_count
+        new_pool.total_wait_seconds = self.total_wait_seconds
+        new_pool.max_wait_seconds = self.max_wait_seconds
+        return new_pool
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def build_connection_uri(user, password, host, port, db):
+    return f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{db}"
+
+
+def get_engine(connection_uri, pool_size=5, max_overflow=10, pool_recycle=1800,
+               pool_pre_ping=True, pool_timeout=30):
+    """Return the pooled engine for a DSN, creating it once per process."""
+    engine = _engines.get(connection_uri)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(connection_uri)
+        if engine is None:
+            engine = create_engine(
+                connection_uri,
+                poolclass=TimedQueuePool,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_recycle=pool_recycle,
+                pool_pre_ping=pool_pre_ping,
+                pool_timeout=pool_timeout,
+            )
+            _engines[connection_uri] = engine
+    return engine
+
+
+def get_connection(user, password, host, port, db, **pool_options):
+    """Return the shared pooled engine for the given database credentials.
+
+    Pool options default to the values in Config when not passed explicitly.
+    """
+    if not pool_options:
+        from config import Config
+        pool_options = {
+            "pool_size": Config.DB_POOL_SIZE,
+            "max_overflow": Config.DB_MAX_OVERFLOW,
+            "pool_recycle": Config.DB_POOL_RECYCLE,
+            "pool_pre_ping": Config.DB_POOL_PRE_PING,
+            "pool_timeout": Config.DB_POOL_TIMEOUT,
+        }
+    return get_engine(build_connection_uri(user, password, host, port, db), **pool_options)
+
+
+def pool_stats(engine):
+    """Snapshot of the engine's pool usage, suitable for logging."""
+    pool = engine.pool
+    stats = {
+        "pool_size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+    if isinstance(pool, TimedQueuePool):
+        checkouts = pool.checkout_count
+        stats.update({
+            "checkouts": checkouts,
+            "total_wait_seconds": pool.total_wait_seconds,
+            "avg_wait_seconds": pool.total_wait_seconds / checkouts if checkouts else 0.0,
+            "max_wait_seconds": pool.max_wait_seconds,
+        })
+    return stats
+
+
+def all_pool_stats():
+    """Pool statistics for every engine created in this process, keyed by host/db."""
+    return {engine.url.render_as_string(hide_password=True): pool_stats(engine)
+            for engine in list(_engines.values())}
 
-def get_connection(user, password, host, port, db):
-    connection_uri = f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{db}"
-    return create_engine(connection_uri)
 
 def load_table_as_df(engine, table_name):
     return pd.read_sql(f"SELECT * FROM {table_name};", engine)
 
+
+def apply_dtypes(df, dtypes):
+    """Convert columns in place to the given dtypes, skipping columns that are absent."""
+    for column, dtype in dtypes.items():
+        if column not in df.columns:
+            continue
+        if dtype == "datetime64[ns]":
+            df[column] = pd.to_datetime(df[column], errors="coerce")
+        elif dtype in ("Int16", "Int32", "Int64", "float32"):
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def load_typed_table(engine, table_name, columns, dtypes=None):
+    """Load only the given columns of a table and convert them to compact dtypes.
+
+    The memory used before and after the dtype conversion is stored in
+    ``df.attrs["memory_report"]``.
+    """
+    column_list = ", ".join(columns)
+    df = pd.read_sql(f"SELECT {column_list} FROM {table_name};", engine)
+    default_bytes = int(df.memory_usage(deep=True).sum())
+
+    df = apply_dtypes(df, dtypes or {})
+    typed_bytes = int(df.memory_usage(deep=True).sum())
+
+    df.attrs["memory_report"] = {
+        "table": table_name,
+        "rows": len(df),
+        "columns": len(df.columns),
+        "default_bytes": default_bytes,
+        "typed_bytes": typed_bytes,
+        "saved_bytes": default_bytes - typed_bytes,
+    }
+    return df
+
+
+def _copy_rows(cursor, table_name, df, columns):
+    """COPY a DataFrame's columns into a table on an open cursor; returns the bytes sent.
+
+    Missing values are sent as NULL, empty strings stay empty strings.
+    """
+    payload = df[columns].to_csv(index=False, header=False, na_rep="\\N").encode()
+    cursor.copy_expert(
+        f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        io.BytesIO(payload),
+    )
+    return len(payload)
+
+
+def copy_dataframe(engine, table_name, df, columns=None):
+    """Append a DataFrame to a table with a single Postgres ``COPY ... FROM STDIN``.
+
+    Returns the number of bytes streamed to the server.
+    """
+    if not len(df):
+        return 0
+    columns = list(columns or df.columns)
+
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            nbytes = _copy_rows(cursor, table_name, df, columns)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+    return nbytes
+
+
+def upsert_dataframe(engine, table_name, df, key, columns=None, claim_unkeyed_on=None, skip_unchanged_on=None,
+                     on_changed=None):
+    """Insert or update a batch of rows keyed on a unique column, in one transaction.
+
+    The batch is COPYed into a temporary staging table and merged with
+    ``INSERT ... ON CONFLICT (key) DO UPDATE``, so deduplication happens
+    against the table's unique index instead of in Python. Rows that repeat
+    a key within the batch keep the last occurrence.
+
+    ``claim_unkeyed_on`` names a column (e.g. ``title``) used to adopt rows
+    stored before the key existed: an existing row with a NULL key and the
+    same value gets the incoming key, so it is updated instead of duplicated.
+
+    ``skip_unchanged_on`` names a content-hash column; existing rows whose
+    stored hash equals the incoming one are left untouched (no new row
+    version, no index churn) and counted as unchanged.
+
+    ``on_changed(cursor, keys)`` runs inside the same transaction with the
+    keys of the rows that were inserted or updated, e.g. to maintain
+    derived tables.
+
+    Returns ``{"inserted": n, "updated": n, "unchanged": n, "bytes": n}``.
+    """
+    result = {"inserted": 0, "updated": 0, "unchanged": 0, "bytes": 0}
+    if not len(df):
+        return result
+    columns = list(columns or df.columns)
+    column_list = ", ".join(columns)
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column != key)
+    if skip_unchanged_on:
+        updates += f" WHERE {table_name}.{skip_unchanged_on} IS DISTINCT FROM EXCLUDED.{skip_unchanged_on}"
+    df = df.drop_duplicates(subset=[key], keep="last")
+
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            cursor.execute(f"CREATE TEMP TABLE upsert_stage ON COMMIT DROP AS "
+                           f"SELECT {column_list} FROM {table_name} WITH NO DATA")
+            result["bytes"] = _copy_rows(cursor, "upsert_stage", df, columns)
+
+            if claim_unkeyed_on:
+                cursor.execute(f"""
+                    UPDATE {table_name} t SET {key} = s.{key}
+                    FROM upsert_stage s
+                    WHERE t.{key} IS NULL
+                      AND t.{claim_unkeyed_on} = s.{claim_unkeyed_on}
+                      AND t.id = (SELECT min(id) FROM {table_name} u
+                                  WHERE u.{key} IS NULL AND u.{claim_unkeyed_on} = s.{claim_unkeyed_on})
+                      AND NOT EXISTS (SELECT 1 FROM {table_name} k WHERE k.{key} = s.{key})
+                """)
+
+            # xmax is 0 only for freshly inserted row versions
+            cursor.execute(f"""
+                INSERT INTO {table_name} ({column_list})
+                SELECT {column_list} FROM upsert_stage
+                ON CONFLICT ({key}) DO UPDATE SET {updates}
+                RETURNING {key}, (xmax = 0)
+            """)
+            changed = cursor.fetchall()
+            for _, inserted in changed:
+                result["inserted" if inserted else "updated"] += 1
+            result["unchanged"] = len(df) - result["inserted"] - result["updated"]
+            if on_changed and changed:
+                on_changed(cursor, [changed_key for changed_key, _ in changed])
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+    return result
+
+
+def load_rows_by_id(engine, table_name, ids, columns=None):
+    """Fetch full rows (or the given columns) for a handful of ids."""
+    column_list = ", ".join(columns) if columns else "*"
+    query = text(f"SELECT {column_list} FROM {table_name} WHERE id IN :ids").bindparams(
+        bindparam("ids", expanding=True)
+    )
+    return pd.read_sql(query, engine, params={"ids": [int(i) for i in ids]})
@@ -0,0 +1,360 @@
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+from psycopg2.extras import execute_values
+from requests.adapters import HTTPAdapter
+from sqlalchemy import text
+
+from catalog_dimensions import entity_type
+from embeddings import REVIEW_ENTITY, normalize_rows
+from mal_client import TRANSIENT_STATUSES, backoff_delay, retry_after_seconds
+from rate_limit import TokenBucket
+
+EMBEDDING_BACKENDS = ("local", "http", "azure")
+LOCAL_DIM = 256
+# Texts per embeddings request; OpenAI accepts up to 2048 inputs per call
+DEFAULT_BATCH_SIZE = 128
+# Keys per cache lookup query
+CACHE_CHUNK = 5000
+
+# Creator column embedded with each catalog table's title, genres and synopsis
+CREATOR_COLUMNS = {"anime": "studios", "manga": "authors"}
+
+
+def normalize_text(value):
+    """Unicode-normalized text with runs of whitespace collapsed; what is sent to the model and hashed."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", str(value or ""))).strip()
+
+
+def text_key(model, normalized):
+    """Cache key of a normalized text for one model."""
+    return hashlib.sha256(f"{model}\x1f{normalized}".encode()).hexdigest()
+
+
+class HashingEmbedder:
+    """Deterministic local model: signed feature hashing of word unigrams and bigrams.
+
+    Needs no service or download, so ingests, tests and benchmarks can
+    run the whole pipeline offline. Texts sharing words land close
+    together, which is enough to rank by overlap of genres, creators and
+    synopsis vocabulary.
+    """
+
+    def __init__(self, dim=LOCAL_DIM):
+        self.dim = dim
+        self.model = f"local-hash-{dim}"
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, value in enumerate(texts):
+            words = re.findall(r"\w+", value.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                bucket = zlib.crc32(feature.encode())
+                matrix[row, bucket % self.dim] += 1.0 if bucket & 0x80000000 else -1.0
+        return normalize_rows(matrix)
+
+
+class HTTPEmbedder:
+    """Client for an OpenAI-compatible ``/embeddings`` endpoint (OpenAI, an Azure deployment, a local stand-in).
+
+    Like MALClient, every worker shares one keep-alive session and one
+    token bucket; 429s pause the bucket for the server's Retry-After and
+    other transient failures are retried with jittered backoff.
+    """
+
+    def __init__(self, url, model, headers=None, rate=5.0, burst=None, max_workers=4, timeout=60,
+                 max_retries=5, backoff_base=0.5, backoff_cap=30.0, session=None):
+        self.url = url
+        self.model = model
+        self.bucket = TokenBucket(rate, burst or max_workers)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(2, max_workers * 2))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(headers or {})
+
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "retries": 0, "errors": 0, "texts": 0}
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def embed(self, texts):
+        """Vectors for one batch of texts, in input order."""
+        payload = {"model": self.model, "input": list(texts)}
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self._count("requests")
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+                continue
+
+            if response.status_code not in TRANSIENT_STATUSES or attempt == self.max_retries:
+                break
+            self._count("retries")
+            if response.status_code == 429:
+                self._count("rate_limited")
+                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                if retry_after is not None:
+                    self.bucket.pause(retry_after)
+                    continue
+            time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+
+        if response.status_code != 200:
+            self._count("errors")
+        response.raise_for_status()
+        self._count("texts", len(texts))
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        return normalize_rows([item["embedding"] for item in data])
+
+
+def make_embedder(config):
+    """Embedder for the ``EMBEDDING_*`` settings of ``config`` (the Config class)."""
+    backend = config.EMBEDDING_BACKEND
+    if backend == "local":
+        return HashingEmbedder()
+    if backend == "http":
+        headers = {"Authorization": f"Bearer {config.EMBEDDING_API_KEY}"} if config.EMBEDDING_API_KEY else {}
+        url = config.EMBEDDING_URL
+    elif backend == "azure":
+        # The deployment is named after the model; Azure ignores the model in the body
+        url = (f"{config.AZURE_OPENAI_ENDPOINT.rstrip('/')}/openai/deployments/{config.EMBEDDING_MODEL}"
+               f"/embeddings?api-version={config.AZURE_OPENAI_API_VERSION}")
+        headers = {"api-key": config.AZURE_OPENAI_API_KEY}
+    else:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {EMBEDDING_BACKENDS}")
+    return HTTPEmbedder(url, config.EMBEDDING_MODEL, headers, rate=config.EMBEDDING_REQUESTS_PER_SECOND,
+                        max_workers=config.EMBEDDING_MAX_WORKERS)
+
+
+class MemoryEmbeddingCache:
+    """In-process vector cache, for tests and benchmarks."""
+
+    def __init__(self):
+        self.vectors = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        with self._lock:
+            return {key: self.vectors[key] for key in keys if key in self.vectors}
+
+    def put_many(self, model, vectors):
+        with self._lock:
+            self.vectors.update(vectors)
+
+
+class PostgresEmbeddingCache:
+    """Vectors in the ``embedding_cache`` table, shared by the ingest and every app worker.
+
+    Vectors are stored as raw float32 bytes; a key is only ever written
+    once, since the same model and text always give the same vector.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def get_many(self, keys):
+        keys = list(keys)
+        found = {}
+        raw = self.engine.raw_connection()
+        try:
+            with raw.cursor() as cursor:
+                for start in range(0, len(keys), CACHE_CHUNK):
+                    cursor.execute("SELECT text_hash, vector FROM embedding_cache WHERE text_hash = ANY(%s)",
+                                   (keys[start:start + CACHE_CHUNK],))
+                    for key, vector in cursor:
+                        found[key] = np.frombuffer(vector, dtype=np.float32)
+        finally:
+            raw.close()
+        return found
+
+    def put_many(self, model, vectors):
+        rows = [(key, model, len(vector), np.asarray(vector, dtype=np.float32).tobytes())
+                for key, vector in vectors.items()]
+        raw = self.engine.raw_connection()
+        try:
+            with raw.cursor() as cursor:
+                execute_values(cursor, "INSERT INTO embedding_cache (text_hash, model, dim, vector) VALUES %s "
+                                       "ON CONFLICT (text_hash) DO NOTHING", rows)
+            raw.commit()
+        finally:
+            raw.close()
+
+
+class EmbeddingPipeline:
+    """Embeds texts in large batches, computing only those not in the cache.
+
+    Texts are normalized and keyed by ``text_key(model, text)``, so
+    repeated texts and re-runs over unchanged items cost a cache lookup.
+    Missing texts go out in batches of ``batch_size``, ``max_workers`` at a
+    time; an HTTPEmbedder's token bucket keeps them under the rate limit.
+    Each batch is cached as soon as it returns, so an interrupted run
+    resumes where it stopped. With ``metrics`` (an IngestMetrics), every
+    batch is recorded as an "embed" stage.
+    """
+
+    def __init__(self, embedder, cache, batch_size=DEFAULT_BATCH_SIZE, max_workers=4, metrics=None):
+        self.embedder = embedder
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.metrics = metrics
+        self._stats_lock = threading.Lock()
+        self.stats = {"texts": 0, "cached": 0, "embedded": 0, "batches": 0}
+
+    @property
+    def model(self):
+        return self.embedder.model
+
+    def keys(self, texts):
+        return [text_key(self.model, normalize_text(value)) for value in texts]
+
+    def _embed_batch(self, batch):
+        keys, texts = zip(*batch)
+        if self.metrics is None:
+            vectors = self.embedder.embed(list(texts))
+        else:
+            with self.metrics.stage("embed") as stage:
+                vectors = self.embedder.embed(list(texts))
+                stage.add(rows=len(texts), nbytes=sum(len(value) for value in texts), pages=1)
+        computed = dict(zip(keys, vectors))
+        self.cache.put_many(self.model, computed)
+        with self._stats_lock:
+            self.stats["embedded"] += len(computed)
+            self.stats["batches"] += 1
+        return computed
+
+    def embed(self, texts):
+        """``(keys, vectors)`` for a list of texts, one unit row per text."""
+        normalized = [normalize_text(value) for value in texts]
+        keys = [text_key(self.model, value) for value in normalized]
+        vectors = self.cache.get_many(set(keys))
+        missing = list({key: value for key, value in zip(keys, normalized) if key not in vectors}.items())
+        with self._stats_lock:
+            self.stats["texts"] += len(keys)
+            self.stats["cached"] += len(keys) - len(missing)
+
+        batches = [missing[start:start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+        if len(batches) > 1 and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embed") as pool:
+                for computed in pool.map(self._embed_batch, batches):
+                    vectors.update(computed)
+        else:
+            for batch in batches:
+                vectors.update(self._embed_batch(batch))
+
+        if not keys:
+            return keys, np.empty((0, 0), dtype=np.float32)
+        return keys, np.vstack([vectors[key] for key in keys]).astype(np.float32)
+
+
+def catalog_texts(engine, table_name):
+    """One embedding text per catalog title (title, genres, creators and synopsis), indexed by id."""
+    creators = CREATOR_COLUMNS[table_name]
+    df = pd.read_sql(f"SELECT id, title, genres, {creators}, synopsis FROM {table_name} ORDER BY id", engine)
+    df = df.fillna("")
+    texts = (df["title"] + "\nGenres: " + df["genres"] + f"\n{creators.title()}: " + df[creators]
+             + "\n" + df["synopsis"])
+    return pd.Series(texts.to_numpy(), index=df["id"].to_numpy(dtype=np.int64))
+
+
+def review_texts(engine, feedback_ids=None):
+    """Review text of every written review (or the given ones), indexed by feedback id."""
+    query = "SELECT id, reviewcontent FROM feedback_table WHERE coalesce(reviewcontent, '') <> ''"
+    params = {}
+    if feedback_ids is not None:
+        query += " AND id = ANY(:ids)"
+        params["ids"] = [int(feedback_id) for feedback_id in feedback_ids]
+    df = pd.read_sql(text(query + " ORDER BY id"), engine, params=params)
+    return pd.Series(df["reviewcontent"].to_numpy(), index=df["id"].to_numpy(dtype=np.int64))
+
+
+def sync_embeddings(engine, pipeline, kind, texts):
+    """Point every entity of ``kind`` at the vector of its current text, embedding only what changed.
+
+    ``entity_embedding`` records the text key each title or review was last
+    embedded with; entities whose key is unchanged are skipped before the
+    cache is even consulted.
+    """
+    keys = pd.Series(pipeline.keys(texts.to_numpy()), index=texts.index)
+    with engine.connect() as connection:
+        current = pd.read_sql(text("SELECT entity_id, text_hash FROM entity_embedding "
+                                   "WHERE entity_type = :kind AND model = :model"),
+                              connection, params={"kind": kind, "model": pipeline.model})
+    current = pd.Series(current["text_hash"].str.strip().to_numpy(), index=current["entity_id"].to_numpy())
+    changed = keys[keys != current.reindex(keys.index)]
+    result = {"items": len(keys), "unchanged": len(keys) - len(changed)}
+    if len(changed):
+        pipeline.embed(texts.loc[changed.index].tolist())
+        rows = [(kind, int(entity_id), pipeline.model, key) for entity_id, key in changed.items()]
+        raw = engine.raw_connection()
+        try:
+            with raw.cursor() as cursor:
+                execute_values(cursor, """
+                    INSERT INTO entity_embedding (entity_type, entity_id, model, text_hash) VALUES %s
+                    ON CONFLICT (entity_type, entity_id, model)
+                    DO UPDATE SET text_hash = EXCLUDED.text_hash, updated_at = CURRENT_TIMESTAMP
+                """, rows)
+            raw.commit()
+        finally:
+            raw.close()
+    result["embedded"] = len(changed)
+    return result
+
+
+def embed_catalog(engine, pipeline, table_name):
+    """Embed the titles of a catalog table whose text changed since the last run."""
+    return sync_embeddings(engine, pipeline, entity_type(table_name), catalog_texts(engine, table_name))
+
+
+def embed_reviews(engine, pipeline, feedback_ids=None):
+    """Embed new or edited reviews (all of them, or only ``feedback_ids``)."""
+    return sync_embeddings(engine, pipeline, REVIEW_ENTITY, review_texts(engine, feedback_ids))
+
+
+def embed_reviews_in_background(engine, pipeline, feedback_ids):
+    """Embed just-submitted reviews without holding up the page."""
+    def run():
+        try:
+            embed_reviews(engine, pipeline, feedback_ids)
+        except Exception as error:
+            # The next data_ingest.py --embeddings run picks the review up
+            print(f"Embedding reviews {list(feedback_ids)} failed: {error}")
+
+    threading.Thread(target=run, name="embed-reviews", daemon=True).start()
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_embedding_pipeline(engine, config):
+    """Return the pipeline shared by the process, built from ``config`` on first use."""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = EmbeddingPipeline(make_embedder(config), PostgresEmbeddingCache(engine),
+                                              batch_size=config.EMBEDDING_BATCH_SIZE,
+                                              max_workers=config.EMBEDDING_MAX_WORKERS)
+    return _pipeline
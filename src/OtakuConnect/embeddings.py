@@ -0,0 +1,302 @@
+import hashlib
+import zlib
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from catalog_dimensions import entity_type
+from genre_index import get_genre_index, split_genres
+
+# Hashed buckets for studios/authors: thousands of names, so no one-hot vocabulary
+CREATOR_BUCKETS = 64
+CREATOR_WEIGHT = 0.5
+
+# A rating of 10 pulls the user vector fully towards an item, 1 pushes it away
+RATING_CENTER = 5.5
+RATING_SCALE = 4.5
+# Weight of favorite genres and of review texts next to rated items in a user vector
+GENRE_PREFERENCE_WEIGHT = 0.5
+REVIEW_WEIGHT = 0.5
+
+# entity_embedding.entity_type of review texts (titles use 'Anime'/'Manga')
+REVIEW_ENTITY = "Review"
+
+# Items within this much of the k-th float32 score are re-scored exactly before the cut
+SCORE_SLACK = 1e-5
+
+
+def normalize_rows(matrix):
+    """Contiguous float32 copy of ``matrix`` with every non-zero row scaled to unit length."""
+    matrix = np.array(matrix, dtype=np.float32, order="C")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def exact_scores(vectors, query):
+    """Float64 dot products of each row with ``query``, computed row by row.
+
+    Unlike a BLAS product, a row's score does not depend on which other
+    rows it was scored with, so equal vectors tie exactly and every engine
+    that re-scores the same float32 vectors gets the same ranking.
+    """
+    return (np.asarray(vectors, dtype=np.float64) * np.asarray(query, dtype=np.float64)).sum(axis=1)
+
+
+def normalize(vector):
+    norm = np.linalg.norm(vector)
+    return (vector / norm).astype(np.float32) if norm > 0 else None
+
+
+class EmbeddingStore:
+    """L2-normalized float32 item vectors aligned with a catalog DataFrame.
+
+    Row ``i`` of ``vectors`` belongs to ``ids[i]``, the catalog's row ``i``,
+    so boolean masks built from catalog columns (status, rating, genre
+    index) filter candidates directly. With unit vectors, cosine
+    similarity against every item is one matrix-vector product and the
+    top k come from ``argpartition`` without sorting the rest. ``source``
+    names the embedding space, so persisted indexes built from another
+    space are not reused.
+    """
+
+    def __init__(self, ids, vectors, source=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.source = source
+        self.vectors = normalize_rows(vectors)
+        if len(self.ids) != len(self.vectors):
+            raise ValueError(f"{len(self.ids)} ids but {len(self.vectors)} vectors")
+        self._order = np.argsort(self.ids, kind="stable")
+        # Items without features (zero rows) have no direction and are never recommended by similarity
+        self.empty = ~self.vectors.any(axis=1)
+        self._genre_vectors = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def positions(self, ids):
+        """Row positions of the given ids; ids not in the store are dropped."""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if not len(self.ids) or not len(ids):
+            return np.empty(0, dtype=np.int64)
+        found = np.searchsorted(self.ids, ids, sorter=self._order)
+        positions = self._order[np.minimum(found, len(self.ids) - 1)]
+        return positions[self.ids[positions] == ids]
+
+    def scores(self, query):
+        """Cosine similarity of every item to a unit query vector."""
+        return self.vectors @ np.asarray(query, dtype=np.float32)
+
+    def top_k(self, query, k, mask=None, exclude_ids=()):
+        """Positions and scores of the ``k`` items most similar to ``query``, best first.
+
+        ``mask`` (a boolean array over the store's rows) restricts the
+        candidates; ``exclude_ids`` drops items such as ones already rated.
+        Equal scores are ranked by id.
+        """
+        allowed = np.ones(len(self), dtype=bool) if mask is None else np.asarray(mask, dtype=bool).copy()
+        allowed[self.empty] = False
+        if len(exclude_ids):
+            allowed[self.positions(exclude_ids)] = False
+        candidates = np.flatnonzero(allowed)
+        k = min(k, len(candidates))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return self.rank(query, candidates, k)
+
+    def rank(self, query, candidates, k):
+        """The ``k`` best of the given row positions by similarity, best first.
+
+        One float32 matrix-vector product narrows the candidates to those
+        near the top k; they are re-scored with ``exact_scores`` and equal
+        scores go to the lower id, as in the pgvector engine.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        # A selective filter only pays for the rows it lets through
+        candidate_scores = (self.vectors @ query)[candidates] if len(candidates) * 4 > len(self) \
+            else self.vectors[candidates] @ query
+        if k < len(candidates):
+            threshold = candidate_scores[np.argpartition(-candidate_scores, k - 1)[k - 1]]
+            candidates = candidates[candidate_scores >= threshold - SCORE_SLACK]
+        scores = exact_scores(self.vectors[candidates], query)
+        best = np.lexsort((self.ids[candidates], -scores))[:k]
+        return candidates[best], scores[best]
+
+    def genre_vectors(self, genre_index):
+        """Unit centroid of the items tagged with each genre, keyed by genre name.
+
+        Puts favorite genres in the same space as the items whatever the
+        embedding source is. Rows are summed in id order, so every process
+        (and the pgvector sync) gets the same centroids bit for bit.
+        """
+        key = id(genre_index)
+        if key not in self._genre_vectors:
+            order = np.argsort(self.ids, kind="stable")
+            tagged, vectors = genre_index.matrix[order], self.vectors[order]
+            centroids = normalize_rows(np.stack([vectors[tagged[:, j]].sum(axis=0) for j in range(tagged.shape[1])])
+                                       if tagged.shape[1] else np.zeros((0, self.dim), dtype=np.float32))
+            self._genre_vectors = {key: dict(zip(genre_index.vocabulary, centroids))}
+        return self._genre_vectors[key]
+
+    def user_vector(self, ratings=None, favorite_genres=(), genre_index=None, reviews=None):
+        """Unit taste vector from ``(item id, rating)`` pairs and favorite genre names, or None.
+
+        See ``combine_taste``; ``reviews`` are review embeddings from the
+        same model as the items.
+        """
+        rated = None
+        if ratings is not None and len(ratings):
+            ratings = pd.DataFrame(ratings, columns=["id", "rating"]).drop_duplicates("id", keep="last")
+            ids = ratings["id"].astype("int64").to_numpy()
+            positions = self.positions(ids)
+            positions = positions[~self.empty[positions]]
+            found = pd.Series(ratings["rating"].to_numpy(dtype=np.float32), index=ids).loc[self.ids[positions]]
+            rated = (found.to_numpy(dtype=np.float32), self.vectors[positions])
+        if reviews is not None and reviews[1].shape[1] != self.dim:
+            reviews = None
+        centroids = []
+        if favorite_genres and genre_index is not None:
+            vectors = self.genre_vectors(genre_index)
+            centroids = [vectors[genre] for genre in favorite_genres if genre in vectors]
+        return combine_taste(rated, reviews, centroids)
+
+
+def combine_taste(rated=None, reviews=None, genre_centroids=()):
+    """Unit taste vector from a user's rated items, reviews and favorite genres, or None.
+
+    ``rated`` and ``reviews`` are ``(ratings, vectors)`` pairs. Ratings are
+    centered, so low ratings push away from an item. Review texts count at
+    ``REVIEW_WEIGHT`` and the mean of the favorite genres' centroids at
+    ``GENRE_PREFERENCE_WEIGHT`` next to rated items, or fully when they are
+    all there is. The in-process and pgvector engines both build taste
+    vectors here, from the same float32 inputs.
+    """
+    parts = []
+    for pair, weight in ((rated, 1.0), (reviews, REVIEW_WEIGHT)):
+        if pair is None or not len(pair[0]):
+            continue
+        weights = ((np.asarray(pair[0], dtype=np.float32) - RATING_CENTER) / RATING_SCALE).astype(np.float32)
+        # Summed by NumPy rather than BLAS so the result does not depend on the array layout
+        vector = normalize((weights[:, None] * np.asarray(pair[1], dtype=np.float32)).sum(axis=0))
+        if vector is not None:
+            parts.append((weight if parts else 1.0, vector))
+    if len(genre_centroids):
+        preferred = normalize(np.mean(genre_centroids, axis=0))
+        if preferred is not None:
+            parts.append((GENRE_PREFERENCE_WEIGHT if parts else 1.0, preferred))
+    if not parts:
+        return None
+    return normalize(sum(weight * vector for weight, vector in parts))
+
+
+def content_features(df, genre_index):
+    """Item features from catalog metadata: idf-weighted genres plus hashed studios/authors.
+
+    The default embedding source: it needs nothing but the cached catalog.
+    """
+    genres = genre_index.matrix.astype(np.float32)
+    document_frequency = genres.sum(axis=0)
+    idf = np.log((1 + len(df)) / (1 + document_frequency)) + 1
+    features = [genres * idf.astype(np.float32)]
+
+    creator_column = "studios" if "studios" in df else ("authors" if "authors" in df else None)
+    creators = np.zeros((len(df), CREATOR_BUCKETS), dtype=np.float32)
+    if creator_column:
+        names = df[creator_column].reset_index(drop=True).map(split_genres).explode().dropna()
+        if len(names):
+            buckets = names.map(lambda name: zlib.crc32(name.encode()) % CREATOR_BUCKETS).to_numpy(dtype=np.int64)
+            np.add.at(creators, (names.index.to_numpy(), buckets), CREATOR_WEIGHT)
+    features.append(creators)
+    return np.hstack(features)
+
+
+def build_content_store(df, genre_index):
+    # The feature columns are the genre vocabulary and the creator buckets
+    basis = hashlib.sha1("\x1f".join(genre_index.vocabulary).encode()).hexdigest()[:12]
+    return EmbeddingStore(df["id"].to_numpy(dtype=np.int64, na_value=-1), content_features(df, genre_index),
+                          source=f"content:{basis}:{CREATOR_BUCKETS}")
+
+
+def build_model_store(df, ids, vectors, model):
+    """Store of model vectors aligned with the catalog's rows; titles not embedded yet get zero vectors."""
+    rows = pd.Index(ids).get_indexer(df["id"].to_numpy(dtype=np.int64, na_value=-1))
+    matrix = np.zeros((len(df), vectors.shape[1]), dtype=np.float32)
+    matrix[rows >= 0] = vectors[rows[rows >= 0]]
+    return EmbeddingStore(df["id"].to_numpy(dtype=np.int64, na_value=-1), matrix, source=f"model:{model}")
+
+
+def get_item_embeddings(catalog, table_name, df=None, engine=None, model=None):
+    """Embedding store for a catalog table, built once per catalog version.
+
+    With ``model``, the vectors embedding_pipeline.py stored for that model
+    are used; the catalog's content features are the fallback until the
+    table has been embedded.
+    """
+    if df is None:
+        df = catalog.get(table_name)
+    # Resolved outside the builders: derived() holds the table's lock while building
+    genre_index = get_genre_index(catalog, table_name, df)
+    def content(frame):
+        return build_content_store(frame, genre_index)
+
+    if model is None:
+        return catalog.derived(table_name, "item_embeddings", content, df=df)
+
+    def from_model(frame):
+        ids, vectors = load_entity_vectors(engine, entity_type(table_name), model)
+        if not len(ids):
+            print(f"No {model} embeddings for {table_name} yet; using content features")
+            return content(frame)
+        return build_model_store(frame, ids, vectors, model)
+
+    return catalog.derived(table_name, f"item_embeddings:{model}", from_model, df=df)
+
+
+def load_user_ratings(engine, user_id, table_name):
+    """``(id, rating)`` pairs a user left on one catalog table's items; rejected feedback is left out."""
+    query = text("SELECT entityid AS id, rating FROM feedback_table "
+                 "WHERE userid = :user_id AND entitytype = :entity_type AND moderatedstatus <> 'Rejected' "
+                 "ORDER BY reviewdate, id")
+    return pd.read_sql(query, engine, params={"user_id": int(user_id), "entity_type": entity_type(table_name)})
+
+
+def load_favorite_genres(engine, user_id):
+    """Genre names from a user's ``favoritegenres`` profile field."""
+    query = text("SELECT favoritegenres FROM users WHERE id = :user_id")
+    with engine.connect() as connection:
+        value = connection.execute(query, {"user_id": int(user_id)}).scalar()
+    return split_genres(value)
+
+
+def load_entity_vectors(engine, kind, model):
+    """``(ids, vectors)`` of every entity of ``kind`` embedded with ``model``."""
+    query = text("SELECT e.entity_id, c.vector FROM entity_embedding e "
+                 "JOIN embedding_cache c ON c.text_hash = e.text_hash "
+                 "WHERE e.entity_type = :kind AND e.model = :model ORDER BY e.entity_id")
+    with engine.connect() as connection:
+        rows = connection.execute(query, {"kind": kind, "model": model}).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    return ids, np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+
+
+def load_user_review_vectors(engine, user_id, table_name, model):
+    """Ratings and review vectors of a user's reviews on one catalog table (rejected reviews left out)."""
+    query = text("SELECT f.rating, c.vector FROM feedback_table f "
+                 "JOIN entity_embedding e ON e.entity_type = :review AND e.entity_id = f.id AND e.model = :model "
+                 "JOIN embedding_cache c ON c.text_hash = e.text_hash "
+                 "WHERE f.userid = :user_id AND f.entitytype = :entity_type AND f.moderatedstatus <> 'Rejected' "
+                 "ORDER BY f.id")
+    with engine.connect() as connection:
+        rows = connection.execute(query, {"review": REVIEW_ENTITY, "model": model, "user_id": int(user_id),
+                                          "entity_type": entity_type(table_name)}).all()
+    if not rows:
+        return None
+    return (np.array([row[0] for row in rows], dtype=np.float32),
+            np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows]))
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+
+def split_genres(genres):
+    """Split a comma-joined genre string into a list of clean genre names."""
+    if not isinstance(genres, str):
+        return []
+    return [g.strip() for g in genres.split(",") if g.strip()]
+
+
+class GenreIndex:
+    """Multi-hot genre matrix for one catalog, aligned with the DataFrame's row positions.
+
+    ``matrix[i, j]`` is True when row ``i`` has genre ``vocabulary[j]``. Genre
+    filters become boolean column reductions instead of per-row string parsing,
+    and genres are matched exactly ("Music" never matches "Musical").
+    """
+
+    def __init__(self, vocabulary, matrix):
+        self.vocabulary = list(vocabulary)
+        self.matrix = matrix
+        self.positions = {genre: i for i, genre in enumerate(self.vocabulary)}
+
+    @classmethod
+    def from_series(cls, genres):
+        """Build the index from a Series of comma-joined genre strings."""
+        tokens = (
+            genres.reset_index(drop=True)
+            .fillna("")
+            .astype(str)
+            .str.split(",")
+            .explode()
+            .str.strip()
+        )
+        tokens = tokens[tokens != ""]
+
+        codes = pd.Categorical(tokens)
+        matrix = np.zeros((len(genres), len(codes.categories)), dtype=bool)
+        matrix[tokens.index.to_numpy(), codes.codes] = True
+        return cls(codes.categories.tolist(), matrix)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def _columns(self, genres):
+        return [self.positions[g] for g in genres if g in self.positions]
+
+    def mask_any(self, genres):
+        """Rows having at least one of the genres."""
+        columns = self._columns(genres)
+        if not columns:
+            return np.zeros(len(self), dtype=bool)
+        return self.matrix[:, columns].any(axis=1)
+
+    def mask_all(self, genres):
+        """Rows having every one of the genres."""
+        genres = list(dict.fromkeys(genres))
+        columns = self._columns(genres)
+        if len(columns) != len(genres):
+            # A genre missing from the vocabulary can never be matched
+            return np.zeros(len(self), dtype=bool)
+        if not columns:
+            return np.ones(len(self), dtype=bool)
+        return self.matrix[:, columns].all(axis=1)
+
+    def counts(self):
+        """Number of items per genre."""
+        return pd.Series(self.matrix.sum(axis=0), index=self.vocabulary)
+
+
+def get_genre_index(catalog, table_name, df=None):
+    """Genre index for a catalog table, built once per catalog version."""
+    return catalog.derived(table_name, "genre_index",
+                           lambda frame: GenreIndex.from_series(frame["genres"]), df=df)
@@ -0,0 +1,283 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+# Streamlit serves <app dir>/static at app/static once enableStaticServing is on
+# (.streamlit/config.toml), so thumbnails live under it
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "image_cache")
+STATIC_URL_PREFIX = "app/static/image_cache"
+
+# MAL "medium" posters are 225px wide; every thumbnail is cropped to exactly this size
+THUMB_SIZE = (225, 320)
+
+# "lazy": fetch pictures the first time a page shows them; "prefetched": only
+# serve what the ingest stored; "off": always hand out the remote URL
+CACHE_MODES = ("lazy", "prefetched", "off")
+
+
+class ImageCache:
+    """Content-addressed on-disk store of catalog pictures and their thumbnails.
+
+    A downloaded picture is stored once under the sha256 of its bytes
+    (``originals/ab/<sha>.<ext>``) next to a fixed-size WebP thumbnail
+    (``thumbs/ab/<sha>-225x320.webp``); ``index.jsonl`` maps source URLs to
+    hashes, so URLs that serve the same image share one copy. Pages ask for
+    a picture's local URL and get the remote one until it has been cached.
+    The index is append-only, so an ingest process and the app can fill the
+    same store; the app picks up new lines every ``refresh_seconds``.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, mode="lazy", thumb_size=THUMB_SIZE, quality=80,
+                 url_prefix=STATIC_URL_PREFIX, max_workers=4, timeout=15, refresh_seconds=5.0, session=None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown image cache mode '{mode}', expected one of {CACHE_MODES}")
+        self.root = root
+        self.mode = mode
+        self.thumb_size = tuple(thumb_size)
+        self.quality = quality
+        self.url_prefix = url_prefix.rstrip("/")
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.refresh_seconds = refresh_seconds
+        self.session = session or requests.Session()
+        self.stats = {"hits": 0, "misses": 0, "downloads": 0, "failures": 0, "bytes": 0, "thumb_bytes": 0}
+
+        # Reentrant: a download that is already done runs its callback while schedule() holds the lock
+        self._lock = threading.RLock()
+        self._index = {}
+        self._index_path = os.path.join(root, "index.jsonl")
+        self._index_offset = 0
+        self._refreshed_at = 0.0
+        self._pending = {}
+        self._pool = None
+        os.makedirs(root, exist_ok=True)
+        self.refresh(force=True)
+
+    # --- index ---
+
+    def refresh(self, force=False):
+        """Read index lines appended (by this or another process) since the last read."""
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_seconds:
+            return
+        self._refreshed_at = now
+        with self._lock:
+            try:
+                with open(self._index_path, "rb") as f:
+                    f.seek(self._index_offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return
+            # A line still being written has no newline yet; leave it for the next read
+            complete = data[:data.rfind(b"\n") + 1]
+            for line in complete.splitlines():
+                try:
+                    entry = json.loads(line)
+                    self._index[entry["url"]] = entry["sha256"]
+                except (ValueError, KeyError):
+                    continue
+            self._index_offset += len(complete)
+
+    def _record(self, url, digest):
+        line = json.dumps({"url": url, "sha256": digest}) + "\n"
+        with self._lock:
+            self._index[url] = digest
+            with open(self._index_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._index_offset = os.path.getsize(self._index_path)
+
+    def __len__(self):
+        return len(self._index)
+
+    def cached_hash(self, url):
+        self.refresh()
+        return self._index.get(url)
+
+    # --- paths ---
+
+    def _thumb_name(self, digest):
+        width, height = self.thumb_size
+        return f"thumbs/{digest[:2]}/{digest}-{width}x{height}.webp"
+
+    def thumbnail_path(self, digest):
+        return os.path.join(self.root, *self._thumb_name(digest).split("/"))
+
+    def original_path(self, digest):
+        folder = os.path.join(self.root, "originals", digest[:2])
+        if os.path.isdir(folder):
+            for name in os.listdir(folder):
+                if name.startswith(digest):
+                    return os.path.join(folder, name)
+        return None
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    # --- fetching ---
+
+    def make_thumbnail(self, data):
+        """Center-crop and resize image bytes to ``thumb_size``, encoded as WebP."""
+        # Imported here so a process serving only cached thumbnails never loads Pillow
+        from PIL import Image, ImageOps
+
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            thumb = ImageOps.fit(image, self.thumb_size, Image.LANCZOS)
+        out = io.BytesIO()
+        thumb.save(out, "WEBP", quality=self.quality, method=4)
+        return out.getvalue()
+
+    def store(self, url, data):
+        """Add downloaded bytes for ``url`` to the store and return their sha256."""
+        digest = hashlib.sha256(data).hexdigest()
+        thumb_path = self.thumbnail_path(digest)
+        if not os.path.exists(thumb_path):
+            from PIL import Image
+
+            thumb = self.make_thumbnail(data)
+            with Image.open(io.BytesIO(data)) as image:
+                extension = (image.format or "img").lower()
+            self._write_atomic(os.path.join(self.root, "originals", digest[:2], f"{digest}.{extension}"), data)
+            self._write_atomic(thumb_path, thumb)
+            self._count("thumb_bytes", len(thumb))
+        self._record(url, digest)
+        return digest
+
+    def fetch(self, url):
+        """Download ``url`` into the store unless it is already there. Returns the sha256 or None."""
+        digest = self._index.get(url)
+        if digest is not None:
+            return digest
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            digest = self.store(url, response.content)
+        except (requests.RequestException, OSError) as error:
+            # OSError covers PIL failing to decode what was served
+            self._count("failures")
+            print(f"Image fetch failed for {url}: {error}")
+            return None
+        self._count("downloads")
+        self._count("bytes", len(response.content))
+        return digest
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="image-cache")
+        return self._pool
+
+    def _done(self, url, future):
+        with self._lock:
+            self._pending.pop(url, None)
+
+    def schedule(self, urls):
+        """Queue background downloads of the given URLs that are neither cached nor queued."""
+        futures = []
+        for url in urls:
+            if not isinstance(url, str) or not url or url in self._index:
+                continue
+            with self._lock:
+                future = self._pending.get(url)
+                if future is None:
+                    future = self._executor().submit(self.fetch, url)
+                    self._pending[url] = future
+                    future.add_done_callback(lambda done, url=url: self._done(url, done))
+            futures.append(future)
+        return futures
+
+    def prefetch(self, urls):
+        """Download every missing picture concurrently and wait; returns fetched/cached/failed counts."""
+        urls = {url for url in urls if isinstance(url, str) and url}
+        cached = sum(url in self._index for url in urls)
+        futures = self.schedule(urls)
+        wait(futures)
+        fetched = sum(future.result() is not None for future in futures)
+        return {"fetched": fetched, "cached": cached, "failed": len(futures) - fetched}
+
+    def wait(self):
+        """Block until every queued download has finished."""
+        with self._lock:
+            futures = list(self._pending.values())
+        wait(futures)
+
+    # --- serving ---
+
+    def thumbnail_url(self, url):
+        """Static URL of the thumbnail for ``url``, or ``url`` itself while it is not cached.
+
+        In lazy mode a miss also queues the download, so the next render is local.
+        """
+        if self.mode == "off" or not isinstance(url, str) or not url:
+            return url
+        digest = self.cached_hash(url)
+        if digest is not None:
+            self.stats["hits"] += 1
+            return f"{self.url_prefix}/{self._thumb_name(digest)}"
+        self.stats["misses"] += 1
+        if self.mode == "lazy":
+            self.schedule([url])
+        return url
+
+    def image_source(self, url):
+        """Local path of the full-size picture for ``st.image``, or ``url`` while it is not cached."""
+        if self.mode == "off" or not isinstance(url, str) or not url:
+            return url
+        digest = self.cached_hash(url)
+        path = self.original_path(digest) if digest is not None else None
+        if path is None:
+            self.stats["misses"] += 1
+            if self.mode == "lazy":
+                self.schedule([url])
+            return url
+        self.stats["hits"] += 1
+        return path
+
+    def cached_count(self, urls):
+        """How many pictures in ``urls`` are stored; queues the missing ones in lazy mode."""
+        if self.mode == "off":
+            return 0
+        self.refresh()
+        urls = [url for url in urls if isinstance(url, str) and url]
+        missing = [url for url in urls if url not in self._index]
+        if missing and self.mode == "lazy":
+            self.schedule(missing)
+        return len(urls) - len(missing)
+
+    def summary(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "mode": self.mode, "images": len(self._index), "pending": len(self._pending),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache(mode="lazy", root=DEFAULT_CACHE_DIR):
+    """Return the image cache shared by every session in this process.
+
+    The first call's settings win, like get_catalog_store; pages call it
+    without arguments after animeApp has configured it.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ImageCache(root=root, mode=mode)
+    return _cache
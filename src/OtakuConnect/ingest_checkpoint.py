@@ -0,0 +1,83 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# <repo>/data/ingest, independent of the directory the ingest is started from
+DEFAULT_STATE_DIR = Path(__file__).resolve().parents[2] / "data" / "ingest"
+
+
+def _write_json_atomic(path, payload):
+    """Write via a temp file and rename so a crash never leaves half a file behind."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class IngestCheckpoint:
+    """Per-media-type ingest progress that survives a crash.
+
+    ``next_offset`` only moves past a page once that page is committed to
+    the database, so a rerun resumes from the first page that was not
+    written. A checkpoint is tied to the page size and field list it was
+    written with; a run with different settings starts over.
+    """
+
+    def __init__(self, state_dir=DEFAULT_STATE_DIR):
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.state_dir / "checkpoint.json"
+        self.state = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+        # anime and manga fetches commit pages from different threads
+        self._lock = threading.RLock()
+
+    def start(self, media_type, total, limit, fields):
+        """Return the offset to resume from, resetting the checkpoint if the run settings changed."""
+        with self._lock:
+            entry = self.state.get(media_type)
+            if entry and (entry["limit"], entry["fields"], entry["total"]) == (limit, fields, total):
+                return entry["next_offset"]
+            self.clear(media_type)
+            self.state[media_type] = {"limit": limit, "fields": fields, "total": total,
+                                      "next_offset": 0, "complete": False, "updated_at": time.time()}
+            self._save()
+            return 0
+
+    def commit_page(self, media_type, offset, count):
+        """Record that the page at ``offset`` (``count`` items) is in the database."""
+        with self._lock:
+            entry = self.state[media_type]
+            entry["next_offset"] = offset + entry["limit"]
+            entry["complete"] = count < entry["limit"] or entry["next_offset"] >= entry["total"]
+            entry["updated_at"] = time.time()
+            self._save()
+
+    def is_complete(self, media_type):
+        return bool(self.state.get(media_type, {}).get("complete"))
+
+    def next_offset(self, media_type):
+        return self.state.get(media_type, {}).get("next_offset", 0)
+
+    def mark_full_sync(self, media_type):
+        """Remember when a media type's whole ranking was last walked."""
+        with self._lock:
+            self.state.setdefault("full_sync", {})[media_type] = time.time()
+            self._save()
+
+    def full_sync_due(self, media_type, max_age_seconds):
+        """True if the whole ranking has not been walked within ``max_age_seconds``."""
+        last = self.state.get("full_sync", {}).get(media_type)
+        return last is None or time.time() - last >= max_age_seconds
+
+    def clear(self, media_type):
+        """Forget a media type's progress, e.g. once its ranking is fully ingested."""
+        with self._lock:
+            self.state.pop(media_type, None)
+            self._save()
+
+    def _save(self):
+        _write_json_atomic(self.path, self.state)
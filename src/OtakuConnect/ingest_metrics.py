@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+
+
+def latency_summary(samples):
+    """Count, mean and p50/p90/p99/max of a list of durations, in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples) * 1e3
+    summary = {"count": len(values), "mean_ms": float(values.mean())}
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{percentile}_ms"] = float(value)
+    summary["max_ms"] = float(values.max())
+    return summary
+
+
+class StageRecorder:
+    """Rows, bytes, pages and named counters handled by one timed pass through a stage."""
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+        self.pages = 0
+        self.counts = {}
+
+    def add(self, rows=0, nbytes=0, pages=0, **counts):
+        self.rows += rows
+        self.bytes += nbytes
+        self.pages += pages
+        for name, value in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + value
+
+
+class IngestMetrics:
+    """Per-stage totals for a streaming ingest (fetch, transform, write, ...).
+
+    Stage time is the time spent inside the stage, so rows/sec and bytes/sec
+    describe how fast that stage works rather than the run's wall clock.
+    Every pass through a stage is also kept as a latency sample, and
+    ``observe`` collects other latencies (MALClient reports each HTTP
+    request as "http"). With ``events``, a writable text stream, each stage
+    pass is written as a JSON line as it finishes and ``write_summary``
+    appends the run's totals. Anime and manga pipelines may record from
+    different threads.
+    """
+
+    def __init__(self, events=None, labels=None):
+        self.stages = {}
+        self.latencies = {}
+        self.events = events
+        self.labels = dict(labels or {})
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        recorder = StageRecorder()
+        start = time.perf_counter()
+        try:
+            yield recorder
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                totals = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "rows": 0, "bytes": 0,
+                                                       "pages": 0, "samples": []})
+                totals["calls"] += 1
+                totals["seconds"] += elapsed
+                totals["rows"] += recorder.rows
+                totals["bytes"] += recorder.bytes
+                totals["pages"] += recorder.pages
+                totals["samples"].append(elapsed)
+                for counter, value in recorder.counts.items():
+                    totals[counter] = totals.get(counter, 0) + value
+            self.emit({"event": "stage", "stage": name, "seconds": elapsed, "rows": recorder.rows,
+                       "bytes": recorder.bytes, "pages": recorder.pages, **recorder.counts})
+
+    def observe(self, name, seconds):
+        """Record one latency sample, e.g. a single HTTP request."""
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+
+    def emit(self, record):
+        """Write one JSON line to ``events`` (no-op without a stream)."""
+        if self.events is None:
+            return
+        line = json.dumps({"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                           **self.labels, **record}, default=str)
+        with self._lock:
+            self.events.write(line + "\n")
+            self.events.flush()
+
+    def summary(self):
+        """Totals plus rows/sec, bytes/sec, pages/sec and pass latency percentiles for every stage."""
+        with self._lock:
+            stages = {name: dict(totals) for name, totals in self.stages.items()}
+        for totals in stages.values():
+            seconds = totals["seconds"]
+            totals["rows_per_sec"] = totals["rows"] / seconds if seconds else 0.0
+            totals["bytes_per_sec"] = totals["bytes"] / seconds if seconds else 0.0
+            totals["pages_per_sec"] = totals["pages"] / seconds if seconds else 0.0
+            totals["latency"] = latency_summary(totals.pop("samples"))
+        return stages
+
+    def latency_summary(self):
+        """Percentiles of every series recorded with ``observe``."""
+        with self._lock:
+            latencies = {name: list(samples) for name, samples in self.latencies.items()}
+        return {name: latency_summary(samples) for name, samples in latencies.items()}
+
+    def write_summary(self, **run):
+        """Append one "summary" line per stage, one "latency" line per observed series and a "run" line.
+
+        ``run`` carries whatever else describes the run (client retry
+        counters, inserted/updated totals, the payload size, ...).
+        """
+        for name, totals in self.summary().items():
+            self.emit({"event": "summary", "stage": name, **totals})
+        for name, latency in self.latency_summary().items():
+            self.emit({"event": "latency", "name": name, **latency})
+        self.emit({"event": "run", "wall_seconds": time.perf_counter() - self.started, **run})
+
+    def report(self):
+        lines = [f"{'stage':<18} {'rows':>8} {'pages':>6} {'MB':>8} {'seconds':>8} {'rows/s':>10} {'MB/s':>8} "
+                 f"{'p50 ms':>8} {'p99 ms':>8}"]
+        for name, totals in self.summary().items():
+            latency = totals["latency"]
+            lines.append(f"{name:<18} {totals['rows']:>8} {totals['pages']:>6} {totals['bytes'] / 1e6:>8.2f} "
+                         f"{totals['seconds']:>8.2f} {totals['rows_per_sec']:>10.0f} "
+                         f"{totals['bytes_per_sec'] / 1e6:>8.2f} {latency.get('p50_ms', 0):>8.1f} "
+                         f"{latency.get('p99_ms', 0):>8.1f}")
+        for name, latency in self.latency_summary().items():
+            if latency["count"]:
+                lines.append(f"{name} latency: {latency['count']} samples, p50 {latency['p50_ms']:.1f} ms, "
+                             f"p90 {latency['p90_ms']:.1f} ms, p99 {latency['p99_ms']:.1f} ms, "
+                             f"max {latency['max_ms']:.1f} ms")
+        lines.append(f"wall clock: {time.perf_counter() - self.started:.2f}s")
+        return "\n".join(lines)
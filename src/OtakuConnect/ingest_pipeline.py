@@ -0,0 +1,171 @@
+import hashlib
+
+import pandas as pd
+
+from db_utils import upsert_dataframe
+from ingest_metrics import IngestMetrics
+from catalog import AIRING_STATUSES
+from mal_transform import transform_anime, transform_manga
+from catalog_dimensions import register_dimension_names, sync_dimensions
+
+ANIME_FIELDS = "id,title,main_picture,mean,rank,popularity,status,genres,num_episodes,duration,rating,studios,start_date,end_date,synopsis"
+
+MANGA_FIELDS = "id,title,authors{first_name,last_name},main_picture,mean,rank,popularity,status,genres,num_pages,num_volumes,num_chapters,media_type,start_date,end_date,synopsis"
+
+#Columns written to the DB; mal_id is MAL's own id and the upsert key,
+#record_hash fingerprints the other columns so unchanged rows are skipped
+ANIME_DB_COLUMNS = ['mal_id', 'title', 'main_picture', 'mean', 'rank', 'popularity', 'status',
+    'genres', 'num_episodes', 'start_date', 'end_date', 'synopsis',
+    'agerating', 'studios', 'record_hash']
+
+MANGA_DB_COLUMNS = ['mal_id', 'title', 'main_picture', 'authors', 'mean', 'rank', 'popularity',
+    'status', 'genres', 'num_volumes', 'num_chapters', 'media_type',
+    'start_date', 'end_date', 'synopsis', 'record_hash']
+
+
+def to_db_frame(df, columns, int_columns):
+    """Select the table's columns (missing ones become NULL) with nullable integer types for COPY."""
+    df = df.reindex(columns=columns)
+    for column in int_columns:
+        df[column] = pd.to_numeric(df[column], errors="coerce").astype("Int64")
+    return df
+
+def record_hashes(df, columns):
+    """md5 of each row's normalized values, in column order; None, NaN and NaT hash alike."""
+    rows = pd.Series("", index=df.index)
+    for column in columns:
+        rows = rows + "\x1f" + df[column].astype(str).where(df[column].notna(), "")
+    return [hashlib.md5(row.encode()).hexdigest() for row in rows]
+
+# media type -> (MAL fields, transform, DB columns, integer DB columns); the table is named after the media type
+INGEST_JOBS = {
+    "anime": (ANIME_FIELDS, transform_anime, ANIME_DB_COLUMNS, ['mal_id', 'rank', 'popularity', 'num_episodes']),
+    "manga": (MANGA_FIELDS, transform_manga, MANGA_DB_COLUMNS, ['mal_id', 'rank', 'popularity', 'num_volumes', 'num_chapters']),
+}
+
+
+def prepare_rows(media_type, nodes):
+    """Transform MAL nodes into DB-ready rows with their record hashes."""
+    _, transform, columns, int_columns = INGEST_JOBS[media_type]
+    df = to_db_frame(transform(nodes).dropna(subset=["title", "mal_id"]), columns, int_columns)
+    df["record_hash"] = record_hashes(df, [column for column in columns if column != "record_hash"])
+    return df
+
+
+def write_rows(engine, media_type, df, totals, metrics, images=None):
+    """Upsert prepared rows on mal_id, skipping rows whose hash is unchanged.
+
+    Genre/studio/author links of the rows that changed are rebuilt in the
+    same transaction; new names are committed just before it. With an
+    ImageCache, pictures not stored yet are queued for download in the
+    background.
+    """
+    columns = INGEST_JOBS[media_type][2]
+    with metrics.stage(f"{media_type} write") as stage:
+        register_dimension_names(engine, media_type, df)
+        # Rows stored before mal_id existed are matched once by title
+        result = upsert_dataframe(engine, media_type, df, "mal_id", columns,
+                                  claim_unkeyed_on="title", skip_unchanged_on="record_hash",
+                                  on_changed=lambda cursor, mal_ids: sync_dimensions(cursor, media_type, mal_ids))
+        stage.add(len(df), result["bytes"], inserted=result["inserted"], updated=result["updated"],
+                  unchanged=result["unchanged"])
+    for key in ("inserted", "updated", "unchanged"):
+        totals[key] += result[key]
+    if images is not None:
+        images.schedule(df["main_picture"].tolist())
+
+
+def ingest_ranking(client, engine, media_type, total=10000, limit=100, checkpoint=None, metrics=None, images=None):
+    """Stream a MAL ranking into its table one page at a time.
+
+    Each page is transformed and upserted on ``mal_id`` (COPY into a staging
+    table, then ``INSERT ... ON CONFLICT DO UPDATE``) as soon as it arrives,
+    so memory stays bounded by the pages in flight and existing titles get
+    fresh scores, ranks and statuses. Rows whose record hash matches the
+    stored one are not rewritten. With a checkpoint, the offset advances
+    only after a page is committed and a rerun resumes from there.
+    Returns ``{"inserted": n, "updated": n, "unchanged": n}``.
+    """
+    fields = INGEST_JOBS[media_type][0]
+    metrics = metrics or IngestMetrics()
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0}
+
+    start = 0
+    if checkpoint is not None:
+        start = checkpoint.start(media_type, total, limit, fields)
+        if checkpoint.is_complete(media_type):
+            return totals
+        if start:
+            print(f"Resuming {media_type} from offset {start}")
+
+    pages = client.stream_ranking(media_type, total, limit, fields, start_offset=start)
+    while True:
+        with metrics.stage(f"{media_type} fetch") as stage:
+            page = next(pages, None)
+            if page is not None:
+                stage.add(len(page[1]), page[2], pages=1)
+        if page is None:
+            break
+        offset, nodes, nbytes = page
+
+        if nodes:
+            with metrics.stage(f"{media_type} transform") as stage:
+                df = prepare_rows(media_type, nodes)
+                stage.add(len(nodes), nbytes)
+            write_rows(engine, media_type, df, totals, metrics, images)
+
+        if checkpoint is not None:
+            checkpoint.commit_page(media_type, offset, len(nodes))
+        print(f"{media_type}: {totals}, through offset {offset + len(nodes)}")
+
+    return totals
+
+
+def refresh_titles(client, engine, media_type, mal_ids, batch_size=100, metrics=None, images=None):
+    """Re-fetch specific titles from MAL's per-title endpoint and upsert the changed ones."""
+    fields = INGEST_JOBS[media_type][0]
+    metrics = metrics or IngestMetrics()
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0}
+
+    details = client.stream_details(media_type, mal_ids, fields)
+    while True:
+        batch, batch_bytes = [], 0
+        with metrics.stage(f"{media_type} refresh fetch") as stage:
+            for _, node, nbytes in details:
+                batch.append(node)
+                batch_bytes += nbytes
+                if len(batch) == batch_size:
+                    break
+            stage.add(len(batch), batch_bytes, pages=len(batch))
+        if not batch:
+            break
+        with metrics.stage(f"{media_type} transform") as stage:
+            df = prepare_rows(media_type, batch)
+            stage.add(len(batch), batch_bytes)
+        write_rows(engine, media_type, df, totals, metrics, images)
+
+    return totals
+
+
+def airing_ids(engine, media_type):
+    """MAL ids of stored titles that are still airing or publishing."""
+    statuses = ", ".join(f"'{status}'" for status in AIRING_STATUSES)
+    query = f"SELECT mal_id FROM {media_type} WHERE mal_id IS NOT NULL AND status IN ({statuses}) ORDER BY mal_id"
+    return pd.read_sql(query, con=engine)["mal_id"].tolist()
+
+
+def delta_sync(client, engine, media_type, checkpoint, full_sync_days=7, total=10000, limit=100, metrics=None,
+               images=None):
+    """Refresh what is likely to have changed, writing only rows whose hash moved.
+
+    Airing/publishing titles, whose scores and statuses drift daily, are
+    re-fetched on every run. The whole ranking (which also picks up new
+    titles) is walked only once the last full walk is older than
+    ``full_sync_days``. Returns per-pass inserted/updated/unchanged counts.
+    """
+    metrics = metrics or IngestMetrics()
+    report = {"airing": refresh_titles(client, engine, media_type, airing_ids(engine, media_type),
+                                       metrics=metrics, images=images)}
+    if checkpoint.full_sync_due(media_type, full_sync_days * 86400):
+        report["ranking"] = ingest_ranking(client, engine, media_type, total, limit, checkpoint, metrics, images)
+    return report
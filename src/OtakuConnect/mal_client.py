@@ -0,0 +1,216 @@
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from itertools import islice
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limit import TokenBucket
+
+MAL_BASE_URL = "https://api.myanimelist.net/v2"
+
+# Worth retrying: throttling, server errors and gateway timeouts
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry_after_seconds(value):
+    """Seconds to wait from a Retry-After header, or None if it cannot be parsed.
+
+    RFC 9110 allows either delay-seconds or an HTTP-date; a date in the past
+    means no wait. Callers fall back to ``backoff_delay`` on None.
+    """
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return max(seconds, 0.0) if math.isfinite(seconds) else None
+
+
+class MALClient:
+    """MyAnimeList API client shared by all ingest workers.
+
+    One keep-alive ``requests.Session`` and one token bucket are shared, so
+    anime and manga fetches running side by side stay under a single
+    client-id rate limit. 429 responses pause the whole bucket for the
+    server's Retry-After (seconds or an HTTP-date) before the page is
+    retried; without a usable Retry-After they back off. Other transient
+    failures (connection errors, timeouts, 5xx) are retried with jittered
+    exponential backoff, up to ``max_retries`` times per request.
+    With ``metrics`` (an IngestMetrics), every HTTP attempt's latency is
+    recorded as "http".
+    """
+
+    def __init__(self, client_id, base_url=MAL_BASE_URL, rate=2.0, burst=4, max_workers=4,
+                 timeout=30, max_retries=5, backoff_base=0.5, backoff_cap=30.0, session=None, metrics=None):
+        self.base_url = base_url.rstrip("/")
+        self.bucket = TokenBucket(rate, burst)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.metrics = metrics
+
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(2, max_workers * 2))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"X-MAL-CLIENT-ID": client_id})
+
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "retries": 0, "errors": 0, "bytes": 0}
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _observe(self, start):
+        if self.metrics is not None:
+            self.metrics.observe("http", time.perf_counter() - start)
+
+    def get(self, path, params):
+        """GET one endpoint and return its parsed JSON body."""
+        return self.get_response(path, params).json()
+
+    def get_response(self, path, params):
+        """GET one endpoint under the shared rate limit, retrying transient failures."""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self._count("requests")
+            start = time.perf_counter()
+            try:
+                response = self.session.get(f"{self.base_url}/{path}", params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self._observe(start)
+                if attempt == self.max_retries:
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+                continue
+
+            self._observe(start)
+            if response.status_code not in TRANSIENT_STATUSES or attempt == self.max_retries:
+                break
+            self._count("retries")
+            if response.status_code == 429:
+                self._count("rate_limited")
+                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                if retry_after is not None:
+                    self.bucket.pause(retry_after)
+                    continue
+            time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+
+        if response.status_code != 200:
+            self._count("errors")
+        response.raise_for_status()
+        self._count("bytes", len(response.content))
+        return response
+
+    def fetch_ranking_page(self, media_type, offset, limit, fields):
+        """Nodes of one ranking page (``media_type`` is "anime" or "manga")."""
+        return self._fetch_ranking_page(media_type, offset, limit, fields)[0]
+
+    def _fetch_ranking_page(self, media_type, offset, limit, fields):
+        params = {"ranking_type": "all", "limit": limit, "offset": offset, "fields": fields}
+        response = self.get_response(f"{media_type}/ranking", params)
+        return [entry["node"] for entry in response.json()["data"]], len(response.content)
+
+    def stream_ranking(self, media_type, total, limit, fields, start_offset=0):
+        """Yield ``(offset, nodes, nbytes)`` for each ranking page, in ranking order.
+
+        Up to ``max_workers`` pages are fetched concurrently, and at most
+        twice that many are held at once, so memory stays bounded however
+        large ``total`` is. A short page marks the end of the ranking. The
+        first page that still fails after retries ends the stream.
+        """
+        end = {"offset": total}
+        end_lock = threading.Lock()
+
+        def fetch(offset):
+            if offset >= end["offset"]:
+                return [], 0
+            nodes, nbytes = self._fetch_ranking_page(media_type, offset, limit, fields)
+            if len(nodes) < limit:
+                with end_lock:
+                    end["offset"] = min(end["offset"], offset + limit)
+            return nodes, nbytes
+
+        for offset, future in self._map_windowed(fetch, range(start_offset, total, limit), f"mal-{media_type}"):
+            try:
+                nodes, nbytes = future.result()
+            except requests.RequestException as error:
+                print(f"Error fetching {media_type} at offset {offset}:", error)
+                return
+            if offset >= end["offset"]:
+                return
+            yield offset, nodes, nbytes
+
+    def stream_details(self, media_type, mal_ids, fields):
+        """Yield ``(mal_id, node, nbytes)`` from the per-title endpoint, in ``mal_ids`` order.
+
+        Titles MAL no longer serves (404) are skipped; the first other
+        failure that persists after retries ends the stream.
+        """
+        def fetch(mal_id):
+            try:
+                response = self.get_response(f"{media_type}/{mal_id}", {"fields": fields})
+            except requests.HTTPError as error:
+                if error.response is not None and error.response.status_code == 404:
+                    return None, 0
+                raise
+            return response.json(), len(response.content)
+
+        for mal_id, future in self._map_windowed(fetch, mal_ids, f"mal-{media_type}-details"):
+            try:
+                node, nbytes = future.result()
+            except requests.RequestException as error:
+                print(f"Error fetching {media_type} {mal_id}:", error)
+                return
+            if node is not None:
+                yield mal_id, node, nbytes
+
+    def _map_windowed(self, fn, args, thread_name_prefix):
+        """Yield ``(arg, future)`` in argument order, with at most 2x ``max_workers`` calls pending."""
+        args = iter(args)
+        window = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=thread_name_prefix) as pool:
+            try:
+                for arg in islice(args, self.max_workers * 2):
+                    window.append((arg, pool.submit(fn, arg)))
+                while window:
+                    arg, future = window.popleft()
+                    for next_arg in islice(args, 1):
+                        window.append((next_arg, pool.submit(fn, next_arg)))
+                    yield arg, future
+            finally:
+                for _, pending in window:
+                    pending.cancel()
+
+    def fetch_ranking(self, media_type, total, limit, fields, start_offset=0):
+        """Fetch ranked items ``start_offset``..``total`` into one list, in ranking order."""
+        items = []
+        for _, nodes, _ in self.stream_ranking(media_type, total, limit, fields, start_offset):
+            items.extend(nodes)
+            if nodes:
+                print(f"Fetched {start_offset + len(items)} {media_type} so far...")
+        return items
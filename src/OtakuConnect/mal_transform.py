@@ -0,0 +1,83 @@
+import pandas as pd
+
+# MAL reports partial dates as "YYYY-MM" or "YYYY"; they map to the first day
+_DATE_FORMATS = ("%Y-%m-%d", "%Y-%m", "%Y")
+
+
+def parse_mal_dates(series):
+    """Parse a column of MAL date strings in one pass per format.
+
+    Full dates, year-month and year-only values are all accepted; anything
+    else (missing, empty, malformed) becomes None. Returns ``datetime.date``
+    objects, as the per-cell parser did.
+    """
+    values = series.astype("string")
+    parsed = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    for date_format in _DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(values[missing], format=date_format, errors="coerce")
+    return parsed.dt.date.astype(object).where(parsed.notna(), None)
+
+
+def join_nested(series, fields, sep=", ", empty="", missing=""):
+    """Join a field of every dict in a column of lists, without a per-row lambda.
+
+    The lists are exploded to one row per dict, flattened with
+    ``json_normalize`` and joined back per original row with a groupby.
+    ``fields`` is one dotted path (``"name"``) or several that are joined
+    with spaces (``["node.first_name", "node.last_name"]``). Rows holding
+    an empty list get ``empty``; rows without a list get ``missing``.
+    """
+    fields = [fields] if isinstance(fields, str) else list(fields)
+    lengths = series.str.len()
+    is_list = series.map(type).eq(list)
+
+    exploded = series[is_list & lengths.gt(0)].explode()
+    result = pd.Series(missing, index=series.index, dtype=object)
+    result[is_list] = empty
+    if exploded.empty:
+        return result
+
+    flat = pd.json_normalize(exploded.tolist())
+    text = flat[fields[0]].fillna("").astype(str)
+    for field in fields[1:]:
+        text = text + " " + flat[field].fillna("").astype(str)
+    text.index = exploded.index
+    # groupby-sum concatenates strings in cython; drop the trailing separator after
+    joined = (text + sep).groupby(level=0, sort=False).sum().str[:-len(sep) or None]
+    result.update(joined)
+    return result
+
+
+def _frame(nodes):
+    """DataFrame of MAL nodes with ``main_picture`` reduced to its medium-size URL."""
+    df = pd.DataFrame(nodes)
+    df["main_picture"] = df["main_picture"].str.get("medium") if "main_picture" in df else None
+    return df
+
+
+def transform_anime(anime_list):
+    """Normalize MAL anime nodes into the anime table's shape."""
+    animedf = _frame(anime_list)
+    animedf['genres'] = join_nested(animedf['genres'], "name") if 'genres' in animedf else ""
+    animedf['studios'] = join_nested(animedf['studios'], "name", missing=None) if 'studios' in animedf else None
+    animedf = animedf.rename(columns={'rating': 'agerating', 'id': 'mal_id'})
+    for column in ("start_date", "end_date"):
+        animedf[column] = parse_mal_dates(animedf[column]) if column in animedf else None
+    animedf['title'] = animedf['title'].str.replace('"', '')
+    return animedf
+
+
+def transform_manga(manga_list):
+    """Normalize MAL manga nodes into the manga table's shape."""
+    mangadf = _frame(manga_list)
+    mangadf['authors'] = (join_nested(mangadf['authors'], ["node.first_name", "node.last_name"])
+                          if 'authors' in mangadf else "")
+    mangadf['genres'] = join_nested(mangadf['genres'], "name") if 'genres' in mangadf else ""
+    for column in ("start_date", "end_date"):
+        mangadf[column] = parse_mal_dates(mangadf[column]) if column in mangadf else None
+    mangadf['title'] = mangadf['title'].str.replace('"', '')
+    mangadf = mangadf.rename(columns={'id': 'mal_id'})
+    return mangadf
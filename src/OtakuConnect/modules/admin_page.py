@@ -2,6 +2,11 @@ import streamlit as st
 import pandas as pd
 from sqlalchemy import text
 
+from catalog_store import get_catalog_store
+from db_utils import all_pool_stats
+from page_loader import PAGE_IMPORT_TIMES
+from image_cache import get_image_cache
+
 def admin_panel(engine):
     st.title("⚙️ Admin Dashboard")
 
@@ -9,6 +14,7 @@ def admin_panel(engine):
     options = ["Revoke/Restore User","Update Role", "Feedback Approval"]
     if st.session_state.role_id == '3':
         options.append("View Logs")  # Superuser only
+        options.append("Cache Stats")  # Superuser only
 
     # --- Session state to remember selected page ---
     if "selected_admin_page" not in st.session_state:
@@ -114,3 +120,23 @@ def admin_panel(engine):
             engine
         )
         st.dataframe(logs_df)
+
+    # -------------------
+    elif page == "Cache Stats" and st.session_state.role_id == '3':
+        st.subheader("🗄️ Catalog Cache & Connection Pool Statistics")
+        catalog = get_catalog_store()
+        stats_df = pd.DataFrame.from_dict(catalog.stats(), orient="index")
+        st.dataframe(stats_df)
+        if st.button("Refresh Catalog Now", key="refresh_catalog_btn"):
+            catalog.invalidate()
+            st.success("Catalog marked stale, it will reload on the next request.")
+            st.rerun()
+
+        st.markdown("#### Connection Pools")
+        st.dataframe(pd.DataFrame.from_dict(all_pool_stats(), orient="index"))
+
+        st.markdown("#### Page Module Import Times")
+        st.dataframe(pd.Series(PAGE_IMPORT_TIMES, name="seconds"))
+
+        st.markdown("#### Picture Cache")
+        st.dataframe(pd.Series(get_image_cache().summary(), name="value").astype(str))
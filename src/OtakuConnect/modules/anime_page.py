@@ -4,6 +4,15 @@ from sqlalchemy import text
 from datetime import datetime
 import time
 
+from db_utils import load_rows_by_id
+from catalog import ANIME_DETAIL_COLUMNS
+from catalog_store import get_catalog_store
+from genre_index import get_genre_index
+from search_index import get_title_index
+from pg_search import search_results
+from image_cache import get_image_cache
+from config import Config
+
 # Constants for readability
 ENTITY_TYPES = {
     "ANIME": 1,
@@ -16,7 +25,7 @@ ACTIVITY_TYPES = {
     "COMMENTED": 3
 }
 
-def anime(anime_df):
+def anime(anime_df, engine=None):
     st.title(":red[ANIMES]")
 
     items_per_row = 3
@@ -50,9 +59,8 @@ def anime(anime_df):
             on_change=reset_visible
         )
 
-        all_genres = sorted(
-            {g.strip() for sub in anime_df["genres"].dropna() for g in sub.split(",")}
-        )
+        genre_index = get_genre_index(get_catalog_store(), "anime", anime_df)
+        all_genres = genre_index.vocabulary
 
         selected_genres = col2.multiselect(
             "Filter by Genre",
@@ -62,18 +70,25 @@ def anime(anime_df):
 
     # ---- APPLY SEARCH ----
     if search_term:
-        anime_list = anime_df[anime_df["title"].str.contains(search_term, case=False, na=False)]
+        # Ranked by relevance; the "Default" sort keeps this order
+        if Config.SEARCH_BACKEND == "postgres" and engine is not None:
+            # Only the pages scrolled through so far are fetched and kept in the session
+            anime_list = search_results(
+                engine, "anime", search_term,
+                st.session_state.visible_anime + 1,
+                st.session_state.setdefault("anime_search_pages", {})
+            )
+        else:
+            title_index = get_title_index(get_catalog_store(), "anime", anime_df)
+            anime_list = anime_df.iloc[title_index.search_rows(search_term)]
         st.subheader(f"🔍 Search Results for '{search_term}'")
 
     else:
-        anime_list = anime_df.copy()
+        # The catalog frame is shared between sessions; filters and sorts below return new frames
+        anime_list = anime_df
 
         if selected_genres:
-            anime_list = anime_list[
-                anime_list["genres"]
-                .fillna("")
-                .apply(lambda x: all(g in x for g in selected_genres))
-            ]
+            anime_list = anime_list[genre_index.mask_all(selected_genres)]
 
     # ---- APPLY SORTING ----
     if sort_by == "Latest" and "start_date" in anime_list.columns:
@@ -87,8 +102,8 @@ def anime(anime_df):
 
     elif sort_by == "Lowest Rating":
         if "mean" in anime_list.columns:
-            anime_list["mean_numeric"] = (
-                pd.to_numeric(anime_list["mean"], errors="coerce").fillna(0)
+            anime_list = anime_list.assign(
+                mean_numeric=pd.to_numeric(anime_list["mean"], errors="coerce").fillna(0)
             )
             anime_list = anime_list.sort_values(by="mean_numeric", ascending=True)
 
@@ -105,6 +120,7 @@ def anime(anime_df):
 
     # ---- PAGINATION ----
     visible_df = anime_list.iloc[:st.session_state.visible_anime]
+    images = get_image_cache(mode=Config.IMAGE_CACHE_MODE)
 
     # ---- CSS ----
     st.markdown("""
@@ -136,9 +152,9 @@ def anime(anime_df):
                 with col:
 
                     # Image
-                    if pd.notna(anime_row["main_picture"]) and str(anime_row["main_picture"]).strip():
+                    if anime_row["has_picture"]:
                         st.markdown(
-                            f'<img class="anime-img" src="{anime_row["main_picture"]}" alt="{anime_row["title"]}">',
+                            f'<img class="anime-img" src="{images.thumbnail_url(anime_row["main_picture"])}" alt="{anime_row["title"]}">',
                             unsafe_allow_html=True
                         )
 
@@ -177,6 +193,11 @@ def anime_details(anime_df, engine, log_user_activity):
 
     anime_id = int(data['id'].iloc[0])
 
+    # The shared catalog leaves out long text fields, so fetch them for this title
+    full_row = load_rows_by_id(engine, 'anime', [anime_id], columns=ANIME_DETAIL_COLUMNS)
+    if not full_row.empty:
+        data = full_row
+
     # --- Display Anime Details ---
     st.title(f":red[{title}]")
     if st.session_state.get('previous_operation') == 'recommender':
@@ -197,7 +218,8 @@ def anime_details(anime_df, engine, log_user_activity):
         col1, col2 = st.columns([1, 2])
         with col1:
             if pd.notna(data['main_picture'].iloc[0]):
-                st.image(data['main_picture'].iloc[0], caption=data['title'].iloc[0])
+                st.image(get_image_cache(mode=Config.IMAGE_CACHE_MODE).image_source(data['main_picture'].iloc[0]),
+                         caption=data['title'].iloc[0])
         with col2:
             st.markdown(f"<span style='color:#BBB8FF'>Synopsis:</span> {data['synopsis'].iloc[0]}", unsafe_allow_html=True)
             st.markdown(f"<span style='color:#BBB8FF'>Status:</span> {data['status'].iloc[0]}", unsafe_allow_html=True)
@@ -239,11 +261,12 @@ def anime_details(anime_df, engine, log_user_activity):
                 auto_title = f"Review for {title}"
                 try:
                     with engine.begin() as conn:
-                        conn.execute(
+                        feedback_id = conn.execute(
                             text("""
                                 INSERT INTO feedback_table
                                 (rating, userid, entitytype, entityid, reviewtitle, reviewcontent, spoilerflag, reviewdate, moderatedstatus)
                                 VALUES (:rating, :userid, 'Anime', :entityid, :reviewtitle, :reviewcontent, :spoilerflag, :reviewdate, 'Pending')
+                                RETURNING id
                             """),
                             {
                                 "rating": int(rating),
@@ -254,7 +277,7 @@ def anime_details(anime_df, engine, log_user_activity):
                                 "spoilerflag": bool(spoiler_flag),
                                 "reviewdate": datetime.now()
                             }
-                        )
+                        ).scalar()
 
                         # Log user rating activity
                         log_user_activity(
@@ -266,6 +289,12 @@ def anime_details(anime_df, engine, log_user_activity):
                             f"Rated {rating}/10 for {title}"
                         )
 
+                    # The review text joins the user's taste vector once embedded; imported here
+                    # so pages ranking with content features never load the pipeline
+                    if Config.ITEM_EMBEDDINGS == "pipeline":
+                        from embedding_pipeline import embed_reviews_in_background, get_embedding_pipeline
+                        embed_reviews_in_background(engine, get_embedding_pipeline(engine, Config), [feedback_id])
+
                     st.success("✅ Feedback submitted! It will be visible once approved.")
                     st.toast("Your feedback was saved!", icon="🔥")
                     time.sleep(2)
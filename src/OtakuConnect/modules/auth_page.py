@@ -6,6 +6,8 @@ import os
 import time
 import re
 
+from catalog_store import get_catalog_store
+
 def signup(engine, user_df, genres_list):
     st.title("📝 :blue[Sign Up for OtakuConnect]")
 
@@ -109,6 +111,7 @@ def signup(engine, user_df, genres_list):
                     }
                 )
 
+            get_catalog_store().invalidate("users")
             st.success("✅ Account created successfully!")
             st.toast("Redirecting to login page..")
             time.sleep(2)
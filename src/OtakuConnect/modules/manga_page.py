@@ -5,6 +5,15 @@ import pandas as pd
 from datetime import datetime
 import time
 
+from db_utils import load_rows_by_id
+from catalog import MANGA_DETAIL_COLUMNS
+from catalog_store import get_catalog_store
+from genre_index import get_genre_index
+from search_index import get_title_index
+from pg_search import search_results
+from image_cache import get_image_cache
+from config import Config
+
 # Constants for readability
 ENTITY_TYPES = {
     "ANIME": 1,
@@ -17,7 +26,7 @@ ACTIVITY_TYPES = {
     "COMMENTED": 3
 }
 
-def manga(manga_df):
+def manga(manga_df, engine=None):
     st.title(":red[MANGAS]")
 
     items_per_row = 3
@@ -51,9 +60,8 @@ def manga(manga_df):
             on_change=reset_visible
         )
 
-        all_genres = sorted(
-            {g.strip() for sub in manga_df["genres"].dropna() for g in sub.split(",")}
-        )
+        genre_index = get_genre_index(get_catalog_store(), "manga", manga_df)
+        all_genres = genre_index.vocabulary
 
         selected_genres = col2.multiselect(
             "Filter by Genre",
@@ -63,18 +71,25 @@ def manga(manga_df):
 
     # ---- APPLY SEARCH ----
     if search_term:
-        manga_list = manga_df[manga_df["title"].str.contains(search_term, case=False, na=False)]
+        # Ranked by relevance; the "Default" sort keeps this order
+        if Config.SEARCH_BACKEND == "postgres" and engine is not None:
+            # Only the pages scrolled through so far are fetched and kept in the session
+            manga_list = search_results(
+                engine, "manga", search_term,
+                st.session_state.visible_manga + 1,
+                st.session_state.setdefault("manga_search_pages", {})
+            )
+        else:
+            title_index = get_title_index(get_catalog_store(), "manga", manga_df)
+            manga_list = manga_df.iloc[title_index.search_rows(search_term)]
         st.subheader(f"🔍 Search Results for '{search_term}'")
     else:
-        manga_list = manga_df.copy()
+        # The catalog frame is shared between sessions; filters and sorts below return new frames
+        manga_list = manga_df
 
         # ✔ Apply genre filters only when NOT searching
         if selected_genres:
-            manga_list = manga_list[
-                manga_list["genres"]
-                .fillna("")
-                .apply(lambda x: all(g in x for g in selected_genres))
-            ]
+            manga_list = manga_list[genre_index.mask_all(selected_genres)]
 
     # ---- APPLY SORTING ----
     if sort_by == "Latest" and "start_date" in manga_list.columns:
@@ -88,8 +103,8 @@ def manga(manga_df):
 
     elif sort_by == "Lowest Rating":
         if "mean" in manga_list.columns:
-            manga_list["mean_numeric"] = (
-                pd.to_numeric(manga_list["mean"], errors="coerce").fillna(0)
+            manga_list = manga_list.assign(
+                mean_numeric=pd.to_numeric(manga_list["mean"], errors="coerce").fillna(0)
             )
             manga_list = manga_list.sort_values(by="mean_numeric", ascending=True)
 
@@ -106,6 +121,7 @@ def manga(manga_df):
 
     # ---- PAGINATION ----
     visible_df = manga_list.iloc[:st.session_state.visible_manga]
+    images = get_image_cache(mode=Config.IMAGE_CACHE_MODE)
 
     # ---- CSS ----
     st.markdown("""
@@ -140,9 +156,9 @@ def manga(manga_df):
                 with col:
 
                     # Image
-                    if pd.notna(manga_row["main_picture"]) and str(manga_row["main_picture"]).strip():
+                    if manga_row["has_picture"]:
                         st.markdown(
-                            f'<img class="manga-img" src="{manga_row["main_picture"]}" alt="{manga_row["title"]}">',
+                            f'<img class="manga-img" src="{images.thumbnail_url(manga_row["main_picture"])}" alt="{manga_row["title"]}">',
                             unsafe_allow_html=True
                         )
 
@@ -183,6 +199,11 @@ def manga_details(manga_df, engine, log_user_activity):
 
     manga_id = int(data['id'].iloc[0])
 
+    # The shared catalog leaves out long text fields, so fetch them for this title
+    full_row = load_rows_by_id(engine, 'manga', [manga_id], columns=MANGA_DETAIL_COLUMNS)
+    if not full_row.empty:
+        data = full_row
+
     # ------------------- Display Manga Details -------------------
     st.title(f":red[{title}]")
     if st.session_state.get('previous_operation') == 'recommender':
@@ -203,7 +224,8 @@ def manga_details(manga_df, engine, log_user_activity):
         col1, col2 = st.columns([1,2])
         with col1:
             if pd.notna(data['main_picture'].iloc[0]):
-                st.image(data['main_picture'].iloc[0], caption=data['title'].iloc[0])
+                st.image(get_image_cache(mode=Config.IMAGE_CACHE_MODE).image_source(data['main_picture'].iloc[0]),
+                         caption=data['title'].iloc[0])
         with col2:
             st.markdown(f"<span style='color:#BBB8FF'>Synopsis:</span> {data['synopsis'].iloc[0]}", unsafe_allow_html=True)
             st.markdown(f"<span style='color:#BBB8FF'>Status:</span> {data['status'].iloc[0]}", unsafe_allow_html=True)
@@ -245,11 +267,12 @@ def manga_details(manga_df, engine, log_user_activity):
                 auto_title = f"Review for {title}"
                 try:
                     with engine.begin() as conn:
-                        conn.execute(
+                        feedback_id = conn.execute(
                             text("""
                                 INSERT INTO feedback_table
                                 (rating, userid, entitytype, entityid, reviewtitle, reviewcontent, spoilerflag, reviewdate, moderatedstatus)
                                 VALUES (:rating, :userid, 'Manga', :entityid, :reviewtitle, :reviewcontent, :spoilerflag, :reviewdate, 'Pending')
+                                RETURNING id
                             """),
                             {
                                 "rating": int(rating),
@@ -260,7 +283,7 @@ def manga_details(manga_df, engine, log_user_activity):
                                 "spoilerflag": bool(spoiler_flag),
                                 "reviewdate": datetime.now()
                             }
-                        )
+                        ).scalar()
 
                     # log rating activity
                     log_user_activity(
@@ -272,6 +295,12 @@ def manga_details(manga_df, engine, log_user_activity):
                         content=f"Rated {rating}/10 for {title}"
                     )
 
+                    # The review text joins the user's taste vector once embedded; imported here
+                    # so pages ranking with content features never load the pipeline
+                    if Config.ITEM_EMBEDDINGS == "pipeline":
+                        from embedding_pipeline import embed_reviews_in_background, get_embedding_pipeline
+                        embed_reviews_in_background(engine, get_embedding_pipeline(engine, Config), [feedback_id])
+
                     st.success("✅ Feedback submitted! It will be visible once approved.")
                     st.toast("Your feedback was saved!", icon="🔥")
                     time.sleep(2)
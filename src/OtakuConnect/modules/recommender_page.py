@@ -1,24 +1,34 @@
 import streamlit as st
 import time
 import random
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from modules.user_log import log_user_activity
+from db_utils import load_rows_by_id
+from catalog_dimensions import genre_filter_sql, genre_slug, similar_genre_filter_sql
+from catalog_store import get_catalog_store
+from genre_index import get_genre_index
+from embeddings import load_favorite_genres, load_user_ratings, load_user_review_vectors
+from embedding_pipeline import get_embedding_pipeline
+from ann_index import get_item_index, metadata_mask
+from pg_vectors import load_taste_vector, similar_items
+from image_cache import get_image_cache
+from query_cache import get_query_cache
+import hashlib
 import json
 import re
+import numpy as np
 import pandas as pd
-from openai import AzureOpenAI
 
 # Import config
 from config import Config
 
-def parse_query(message):
-    """Parse user message into structured JSON"""
-    try:
-        system_prompt = """You are a specialized query parser for an anime/manga recommendation system. 
+# Prompts of the model-based query parser; cached parses are keyed by a hash of these
+QUERY_MODEL = "gpt-4o-mini"
+QUERY_SYSTEM_PROMPT = """You are a specialized query parser for an anime/manga recommendation system. 
         Your task is to analyze user requests and extract their preferences into a structured JSON format.
         You must respond ONLY with valid JSON - no explanations, no markdown formatting, no additional text."""
-        
-        user_prompt = """Parse the following user request into a JSON object:
+
+QUERY_USER_PROMPT = """Parse the following user request into a JSON object:
 
                 User message: "{message}"
 
@@ -42,17 +52,37 @@ def parse_query(message):
                 - For watch_history: look for "similar to", "like", "based on what I've watched"
 
                 Return ONLY the JSON object, nothing else."""
-        
+
+QUERY_PARSER_VERSION = hashlib.sha1(f"{QUERY_MODEL}\x1f{QUERY_SYSTEM_PROMPT}\x1f{QUERY_USER_PROMPT}".encode()).hexdigest()[:12]
+
+
+def parse_query(message, use_cache=True, engine=None):
+    """Parse user message into structured JSON
+
+    Model answers are cached by normalized message (query_cache.py), so repeated
+    searches skip the round trip; ``use_cache=False`` always asks the model and
+    refreshes the cached answer. Rule-based fallbacks are never cached.
+    """
+    cache = get_query_cache(QUERY_PARSER_VERSION, Config, engine)
+    if use_cache and cache is not None:
+        cached = cache.get(message)
+        if cached is not None:
+            return cached
+
+    try:
+        # Imported here so opening the recommender page does not pay for the openai package
+        from openai import AzureOpenAI
+
         client = AzureOpenAI(
             azure_endpoint=Config.AZURE_OPENAI_ENDPOINT, 
             api_key=Config.AZURE_OPENAI_API_KEY, 
             api_version=Config.AZURE_OPENAI_API_VERSION,
         )
-        formatted_user_prompt = user_prompt.format(message=message)
+        formatted_user_prompt = QUERY_USER_PROMPT.format(message=message)
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=QUERY_MODEL,
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": QUERY_SYSTEM_PROMPT},
                 {"role": "user", "content": formatted_user_prompt}
             ],
             temperature=0.3,
@@ -60,6 +90,8 @@ def parse_query(message):
         )
 
         parsed_json = json.loads(response.choices[0].message.content)
+        if cache is not None:
+            cache.put(message, parsed_json)
         return parsed_json
     
     except Exception as e:
@@ -112,32 +144,65 @@ def parse_query(message):
         "years_back": years_back
     }
 
-def get_anime_recommendations(user_message, user_id=3, engine=None):
+def embedding_model(engine):
+    """Pipeline model whose vectors rank recommendations, or None for content features"""
+    return get_embedding_pipeline(engine, Config).model if Config.ITEM_EMBEDDINGS == "pipeline" else None
 
-    feedback_raw = pd.read_sql("SELECT * FROM FEEDBACK_TABLE", engine)
-    user_feedback = feedback_raw[feedback_raw["userid"] == user_id]
-    liked_entities = user_feedback[user_feedback["rating"] >= 8]
-    liked_anime_ids = set(liked_entities[liked_entities["entitytype"] == "Anime"]["entityid"].tolist())
-    liked_manga_ids = set(liked_entities[liked_entities["entitytype"] == "Manga"]["entityid"].tolist())
-    
-    parsed_query = parse_query(user_message)
+
+def taste_vector(table, user_id, engine, ratings=None):
+    """Item index of a catalog table and a user's taste vector in its embedding space (None if either is missing)
+
+    The pgvector engine has no in-process index: the taste vector is built from the vectors in Postgres.
+    """
+    pgvector = Config.RECOMMENDER_INDEX == "pgvector"
+    catalog = get_catalog_store()
+    try:
+        df = None if pgvector else catalog.get(table)
+    except KeyError:
+        # Catalog not registered (e.g. called outside the app)
+        return None, None
+    model = embedding_model(engine)
+    if ratings is None:
+        ratings = load_user_ratings(engine, user_id, table)
+    reviews = load_user_review_vectors(engine, user_id, table, model) if model else None
+    if pgvector:
+        return None, load_taste_vector(engine, table, ratings, load_favorite_genres(engine, user_id), reviews)
+    index = get_item_index(catalog, table, Config.RECOMMENDER_INDEX, Config.ANN_INDEX_DIR, df, engine, model)
+    taste = index.store.user_vector(ratings, load_favorite_genres(engine, user_id), get_genre_index(catalog, table, df),
+                                    reviews)
+    return index, taste
+
+
+def get_anime_recommendations(user_message, user_id=3, engine=None, use_cache=True):
+
+    parsed_query = parse_query(user_message, use_cache=use_cache, engine=engine)
     print(f"parsed_query:{parsed_query}")
     conditions = []
+    params = {}
     table = "anime"
     order_by = []
     
     if parsed_query['type_preference'].lower() == 'manga':
         table = "manga"
-        
+
+    ratings = load_user_ratings(engine, user_id, table)
+    liked = set(ratings.loc[ratings["rating"] >= 8, "id"].tolist())
+
+    # Rank by similarity to the user's taste when they asked for it or asked for no particular order
+    index, taste = taste_vector(table, user_id, engine, ratings)
+    use_similarity = taste is not None and (
+        parsed_query['watch_history_consideration'] or not (parsed_query['top_rated'] or parsed_query['latest'])
+    )
+
+    # Genre filters are semi-joins on the indexed item_genre table, not ILIKE scans of the genres text
     if parsed_query['genre_considered']:
-        genre_conditions = ' OR '.join([f"genres ILIKE '%{g}%'" for g in parsed_query['genre_considered']])
-        conditions.append(f"({genre_conditions})")
+        conditions.append(genre_filter_sql(table, "genres"))
+        params["genres"] = [genre_slug(g) for g in parsed_query['genre_considered']]
     
-    if parsed_query['watch_history_consideration']:
-        liked = liked_anime_ids if table == "anime" else liked_manga_ids
+    if parsed_query['watch_history_consideration'] and not use_similarity:
         if liked:
-            history_genre_conditions = ' OR '.join([f"genres ILIKE '%{g}%'" for g in liked])
-            conditions.append(f"({history_genre_conditions})")
+            conditions.append(similar_genre_filter_sql(table, "liked_ids"))
+            params["liked_ids"] = [int(i) for i in liked]
     
     if parsed_query['status_preference'] == 'ongoing':
         if table == "anime":
@@ -150,11 +215,12 @@ def get_anime_recommendations(user_message, user_id=3, engine=None):
         else:
             conditions.append(f"status = 'finished'")
     
+    # Plain date ranges (rather than EXTRACT on every row) so an index on start_date can be used
     if parsed_query['year_preference']:
-        conditions.append(f"EXTRACT(YEAR FROM start_date) >= {parsed_query['year_preference']}")
+        conditions.append(f"start_date >= make_date({int(parsed_query['year_preference'])}, 1, 1)")
         
     if parsed_query['years_back']:
-        conditions.append(f"EXTRACT(YEAR FROM start_date) >= (EXTRACT(YEAR FROM CURRENT_DATE) - {parsed_query['years_back']})")
+        conditions.append(f"start_date >= make_date(EXTRACT(YEAR FROM CURRENT_DATE)::int - {int(parsed_query['years_back'])}, 1, 1)")
     
     if parsed_query['top_rated']:
         order_by.append("rank ASC")
@@ -165,31 +231,67 @@ def get_anime_recommendations(user_message, user_id=3, engine=None):
     where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
     ordering = "ORDER BY " + ", ".join(order_by) if order_by else ""
     
-    sql_query = f"""
-        SELECT id, title, genres, synopsis, main_picture, mean, popularity, status, 
+    select_list = f"""id, title, genres, synopsis, main_picture, mean, popularity, status, 
         EXTRACT(YEAR FROM start_date) as year,
-        {f"num_episodes, studios" if table == "anime" else "num_volumes, num_chapters, authors"}
-        FROM {table}
-        {where_clause}
-        {ordering}
-        LIMIT {parsed_query['number_of_recommendations']}
-    """
-    sql_query = sql_query.strip()
-    print("sql_query:", sql_query[:500] if isinstance(sql_query, str) else sql_query)
-    
-    results = pd.read_sql(text(sql_query), engine)
-        
+        {f"num_episodes, studios" if table == "anime" else "num_volumes, num_chapters, authors"}"""
+
+    if use_similarity and index is None:
+        # pgvector: the filters and the similarity order run in one query
+        sql_query = f"SELECT {select_list} FROM {table} {where_clause} ORDER BY embedding <=> :query_vec".strip()
+        print("sql_query:", sql_query[:500])
+        results = similar_items(engine, table, select_list, taste, parsed_query['number_of_recommendations'],
+                                conditions, params, exclude_ids=ratings["id"], ef_search=Config.PGVECTOR_EF_SEARCH,
+                                probes=Config.PGVECTOR_PROBES, exact=Config.PGVECTOR_EXACT)
+    elif use_similarity:
+        # SQL applies the filters, the item index ranks the candidates by similarity
+        sql_query = f"SELECT id FROM {table} {where_clause}".strip()
+        print("sql_query:", sql_query[:500])
+        query = text(sql_query).bindparams(*[bindparam(name, expanding=True) for name in params])
+        candidate_ids = pd.read_sql(query, engine, params=params)["id"].to_numpy()
+        positions, scores = index.search(taste, parsed_query['number_of_recommendations'],
+                                         mask=np.isin(index.store.ids, candidate_ids), exclude_ids=ratings["id"])
+        ranked_ids = index.store.ids[positions]
+        results = load_rows_by_id(engine, table, ranked_ids.tolist(), columns=[select_list])
+        rank = pd.Series(np.arange(len(ranked_ids)), index=ranked_ids)
+        results = results.iloc[np.argsort(results["id"].map(rank).to_numpy(), kind="stable")].reset_index(drop=True)
+        results["similarity"] = pd.Series(scores, index=ranked_ids).loc[results["id"]].to_numpy()
+    else:
+        sql_query = f"""
+            SELECT {select_list}
+            FROM {table}
+            {where_clause}
+            {ordering}
+            LIMIT {parsed_query['number_of_recommendations']}
+        """
+        sql_query = sql_query.strip()
+        print("sql_query:", sql_query[:500] if isinstance(sql_query, str) else sql_query)
+
+        query = text(sql_query).bindparams(*[bindparam(name, expanding=True) for name in params])
+        results = pd.read_sql(query, engine, params=params)
+
+    query_cache = get_query_cache(QUERY_PARSER_VERSION, Config, engine)
     return {
         "response": results,
         "media_type": "Anime" if table == "anime" else "Manga",
         "debug_info": {
             "parsed_query": parsed_query,
             "sql_query": sql_query.strip(),
-            "result_count": len(results)
+            "result_count": len(results),
+            "query_cache": query_cache.summary() if query_cache is not None else None
         }
     }
 
 
+def attach_synopsis(items, media_type, engine):
+    """Add the synopsis column (not kept in the shared catalog) for a few sampled items"""
+    if items.empty or 'synopsis' in items.columns:
+        return items
+    table = "anime" if media_type == "Anime" else "manga"
+    synopses = load_rows_by_id(engine, table, items['id'].tolist(), columns=['id', 'synopsis'])
+    synopses['id'] = synopses['id'].astype(items['id'].dtype)
+    return items.merge(synopses, on='id', how='left')
+
+
 def display_recommendations_grid(recommendations, media_type, source="shuffle"):
     """Reusable function to display recommendations in a grid format"""
     if len(recommendations) == 0:
@@ -205,7 +307,7 @@ def display_recommendations_grid(recommendations, media_type, source="shuffle"):
             
             with col1:
                 if item.get('main_picture'):
-                    st.image(item['main_picture'])
+                    st.image(get_image_cache(mode=Config.IMAGE_CACHE_MODE).image_source(item['main_picture']))
                 else:
                     st.info("No image available")
             
@@ -374,20 +476,42 @@ def shuffle_recommender(anime_df, manga_df, engine):
         time.sleep(0.2)
         
         selected_df = anime_df if st.session_state.media_type == "Anime" else manga_df
-        filtered_items = selected_df[selected_df['mean'] >= min_rating].copy()
-        
-        if rec_type == "Based on My Preferences" and user_genres:
-            def has_matching_genre(genres_str):
-                if not genres_str or genres_str == '' or genres_str is None:
-                    return False
-                genre_list = [g.strip() for g in str(genres_str).split(',')]
-                return any(user_genre in genre_list for user_genre in user_genres)
-            
-            filtered_items = filtered_items[filtered_items['genres'].apply(has_matching_genre)]
-            
+        rating_mask = metadata_mask(selected_df, min_rating=min_rating)
+        filtered_items = selected_df[rating_mask]
+        
+        if rec_type == "Based on My Preferences" and (user_genres or user_id):
+            table_name = "anime" if st.session_state.media_type == "Anime" else "manga"
+            catalog = get_catalog_store()
+            model = embedding_model(engine)
+            ratings = load_user_ratings(engine, user_id, table_name) if user_id else None
+            reviews = load_user_review_vectors(engine, user_id, table_name, model) if model and user_id else None
+
+            # Shuffle within the closest matches: a pool a few times the requested size, ranked by cosine similarity
+            filtered_items = selected_df.iloc[:0]
+            if Config.RECOMMENDER_INDEX == "pgvector":
+                taste = load_taste_vector(engine, table_name, ratings, user_genres, reviews)
+                if taste is not None:
+                    ranked = similar_items(engine, table_name, "id", taste, num_recommendations * 3,
+                                           ["mean >= :min_rating"], {"min_rating": float(min_rating)},
+                                           exclude_ids=ratings["id"] if ratings is not None else (),
+                                           ef_search=Config.PGVECTOR_EF_SEARCH, probes=Config.PGVECTOR_PROBES,
+                                           exact=Config.PGVECTOR_EXACT)
+                    positions = pd.Index(selected_df["id"]).get_indexer(ranked["id"])
+                    filtered_items = selected_df.iloc[positions[positions >= 0]].assign(
+                        similarity=ranked["similarity"].to_numpy()[positions >= 0])
+            else:
+                index = get_item_index(catalog, table_name, Config.RECOMMENDER_INDEX, Config.ANN_INDEX_DIR,
+                                       selected_df, engine, model)
+                taste = index.store.user_vector(ratings, user_genres,
+                                                get_genre_index(catalog, table_name, selected_df), reviews)
+                if taste is not None:
+                    positions, scores = index.search(taste, num_recommendations * 3, mask=rating_mask,
+                                                     exclude_ids=ratings["id"] if ratings is not None else ())
+                    filtered_items = selected_df.iloc[positions].assign(similarity=scores)
+
             if len(filtered_items) == 0:
                 st.warning(f"No {st.session_state.media_type.lower()} found matching your genre preferences. Showing popular picks instead!")
-                filtered_items = selected_df[selected_df['mean'] >= min_rating].copy()
+                filtered_items = selected_df[rating_mask]
                 filtered_items = filtered_items.sort_values('popularity', ascending=True)
         
         elif rec_type == "Popular Picks":
@@ -399,7 +523,12 @@ def shuffle_recommender(anime_df, manga_df, engine):
         
         if len(filtered_items) > 0:
             sample_size = min(num_recommendations, len(filtered_items))
-            st.session_state.shuffle_recommendations = filtered_items.sample(n=sample_size)
+            picks = filtered_items.sample(n=sample_size)
+            if 'similarity' in picks:
+                picks = picks.sort_values('similarity', ascending=False)
+            st.session_state.shuffle_recommendations = attach_synopsis(
+                picks, st.session_state.media_type, engine
+            )
             
             if user_id and st.session_state.get('logged_in'):
                 try:
@@ -533,7 +662,7 @@ def chatbot_recommender(anime_df, manga_df, engine):
                 filtered_items = filtered_items.sort_values('popularity', ascending=True)
                 
                 sample_size = min(5, len(filtered_items))
-                recommendations = filtered_items.head(sample_size)
+                recommendations = attach_synopsis(filtered_items.head(sample_size), media_type, engine)
             
             st.session_state.chatbot_recommendations = recommendations
             st.session_state.chatbot_media_type = media_type
@@ -4,6 +4,8 @@ import time
 import os
 import bcrypt
 
+from catalog_store import get_catalog_store
+
 def profile(user_df, engine):
     st.title("👤 Your Profile")
 
@@ -89,6 +91,7 @@ def profile(user_df, engine):
                         "uid": st.session_state.user_id
                     }
                 )
+            get_catalog_store().invalidate("users")
             st.success("✅ Profile updated successfully!")
             time.sleep(2)
             st.rerun()
@@ -146,6 +149,7 @@ def profile(user_df, engine):
                 try:
                     with engine.begin() as conn:
                         conn.execute(text("DELETE FROM users WHERE id = :uid"), {"uid": st.session_state.user_id})
+                    get_catalog_store().invalidate("users")
 
                     st.success("✅ Account deleted successfully.")
                     st.session_state.clear()
@@ -0,0 +1,114 @@
+import builtins
+import importlib
+import sys
+import time
+
+# operation -> (module, function). Page modules are imported the first time
+# their operation is routed to, so heavy dependencies (openai, bcrypt, ...)
+# stay out of cold start until a page actually needs them.
+PAGE_ROUTES = {
+    "anime": ("modules.anime_page", "anime"),
+    "anime_details": ("modules.anime_page", "anime_details"),
+    "manga": ("modules.manga_page", "manga"),
+    "manga_details": ("modules.manga_page", "manga_details"),
+    "community": ("modules.community_page", "community"),
+    "recommender": ("modules.recommender_page", "recommender"),
+    "admin_panel": ("modules.admin_page", "admin_panel"),
+    "login": ("modules.auth_page", "login"),
+    "signup": ("modules.auth_page", "signup"),
+    "forgot_password": ("modules.auth_page", "forgot_password"),
+    "reset_password": ("modules.auth_page", "reset_password"),
+    "edit_profile": ("modules.user_profile", "profile"),
+}
+
+# Seconds spent importing each page module, recorded on first use
+PAGE_IMPORT_TIMES = {}
+
+
+def get_page(operation):
+    """Return the page function for an operation, importing its module on first use."""
+    module_name, function_name = PAGE_ROUTES[operation]
+    module = sys.modules.get(module_name)
+    if module is None:
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        PAGE_IMPORT_TIMES[module_name] = time.perf_counter() - start
+    return getattr(module, function_name)
+
+
+class ImportProfiler:
+    """Records the cost of every first-time import made while it is active.
+
+    ``cumulative`` includes the module's own imports, ``self`` excludes them,
+    similar to ``python -X importtime`` but available from inside the app.
+    ``importlib.import_module`` bypasses ``builtins.__import__``, so modules
+    loaded that way go through ``import_module`` here to be recorded.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self._stack = []
+        self._original_import = None
+
+    def __enter__(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+        return self
+
+    def __exit__(self, *exc_info):
+        builtins.__import__ = self._original_import
+        return False
+
+    def import_module(self, name):
+        """``importlib.import_module``, recorded like the imports it triggers."""
+        if name in sys.modules:
+            return sys.modules[name]
+        return self._timed(name, importlib.import_module, name)
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        return self._timed(name, self._original_import, name, globals, locals, fromlist, level)
+
+    def _timed(self, name, load, *args):
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return load(*args)
+        finally:
+            cumulative = time.perf_counter() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += cumulative
+            self.records[name] = {"cumulative": cumulative, "self": cumulative - children}
+
+    def report(self, top=25):
+        """Slowest imports first, formatted like ``-X importtime`` output."""
+        rows = sorted(self.records.items(), key=lambda item: item[1]["cumulative"], reverse=True)[:top]
+        lines = [f"{'cumulative ms':>14} {'self ms':>9}  module"]
+        for name, record in rows:
+            lines.append(f"{record['cumulative'] * 1e3:>14.1f} {record['self'] * 1e3:>9.1f}  {name}")
+        return "\n".join(lines)
+
+
+def profile_imports(top=25):
+    """Print the import cost of app startup and of each page module on its own."""
+    with ImportProfiler() as profiler:
+        start = time.perf_counter()
+        profiler.import_module("animeApp")
+        startup = time.perf_counter() - start
+    print(f"Startup imports (animeApp): {startup * 1e3:.1f} ms")
+    print(profiler.report(top))
+
+    for module_name in dict.fromkeys(module for module, _ in PAGE_ROUTES.values()):
+        with ImportProfiler() as profiler:
+            start = time.perf_counter()
+            profiler.import_module(module_name)
+            elapsed = time.perf_counter() - start
+        print(f"\n{module_name}: {elapsed * 1e3:.1f} ms on first use")
+        print(profiler.report(10))
+
+
+if __name__ == "__main__":
+    # python page_loader.py  ->  per-module import cost of startup and every page
+    profile_imports()
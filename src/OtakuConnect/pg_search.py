@@ -0,0 +1,76 @@
+import pandas as pd
+from sqlalchemy import text
+
+from catalog import ANIME_COLUMNS, MANGA_COLUMNS, apply_catalog_dtypes
+
+SEARCH_COLUMNS = {
+    "anime": ANIME_COLUMNS,
+    "manga": MANGA_COLUMNS,
+}
+
+
+def _like_pattern(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def search_titles(engine, table_name, term, limit=15, after=None, include_synopsis=False):
+    """Run one page of a pg_trgm title search inside Postgres.
+
+    Results are ordered by trigram similarity (best first) and then id, and
+    paginated with a keyset cursor instead of OFFSET: pass the returned
+    ``next_cursor`` as ``after`` to fetch the following page. Returns
+    ``(df, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    columns = ", ".join(SEARCH_COLUMNS[table_name])
+    match = "title ILIKE :pattern OR :term <% title"
+    if include_synopsis:
+        match += " OR synopsis ILIKE :pattern"
+
+    query = text(f"""
+        SELECT * FROM (
+            SELECT {columns},
+                   ROUND(GREATEST(similarity(title, :term), word_similarity(:term, title))::numeric, 6) AS score
+            FROM {table_name}
+            WHERE {match}
+        ) hits
+        WHERE CAST(:after_score AS numeric) IS NULL
+           OR score < CAST(:after_score AS numeric)
+           OR (score = CAST(:after_score AS numeric) AND id > :after_id)
+        ORDER BY score DESC, id ASC
+        LIMIT :limit
+    """)
+    after_score, after_id = after if after else (None, None)
+    params = {
+        "term": term,
+        "pattern": _like_pattern(term),
+        "after_score": after_score,
+        "after_id": after_id,
+        "limit": limit + 1,
+    }
+    df = pd.read_sql(query, engine, params=params)
+
+    next_cursor = None
+    if len(df) > limit:
+        df = df.iloc[:limit].copy()
+        last = df.iloc[-1]
+        next_cursor = (float(last["score"]), int(last["id"]))
+    return apply_catalog_dtypes(table_name, df), next_cursor
+
+
+def search_results(engine, table_name, term, count, state, page_size=15):
+    """Keep fetching pages into ``state`` (a per-session dict) until ``count`` rows are loaded.
+
+    Only the pages a user has actually scrolled through are held in memory.
+    """
+    if state.get("term") != term:
+        state.clear()
+        state.update({"term": term, "rows": None, "cursor": None, "done": False})
+
+    while not state["done"] and (state["rows"] is None or len(state["rows"]) < count):
+        page, cursor = search_titles(engine, table_name, term, limit=page_size, after=state["cursor"])
+        state["rows"] = page if state["rows"] is None else pd.concat([state["rows"], page], ignore_index=True)
+        state["cursor"] = cursor
+        state["done"] = cursor is None
+
+    return state["rows"]
@@ -0,0 +1,199 @@
+import io
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from embeddings import SCORE_SLACK, combine_taste, exact_scores
+
+PGVECTOR_METHODS = ("hnsw", "ivfflat")
+
+# Rows fetched per requested result, re-scored like the in-process engine before the cut
+OVERSAMPLE = 3
+# IVFFlat lists per catalog row (pgvector suggests rows / 1000 up to a million rows)
+IVFFLAT_ROWS_PER_LIST = 1000
+
+
+def vector_literal(vector):
+    """pgvector text form of a float32 vector; repr round-trips every value exactly."""
+    return "[" + ",".join(map(repr, np.asarray(vector, dtype=np.float32).tolist())) + "]"
+
+
+def parse_vector(value):
+    return np.array(value[1:-1].split(","), dtype=np.float32)
+
+
+def index_name(table_name):
+    return f"{table_name}_embedding_idx"
+
+
+# Created by the first sync, so installs that never turn on the pgvector engine need no extension.
+# The embedding vector(dim) column and its index are added per table, since the dimension depends
+# on the embedding source recorded in item_vector_sync
+SYNC_TABLES = (
+    """CREATE TABLE IF NOT EXISTS item_vector_sync (
+        table_name  VARCHAR(20) PRIMARY KEY,
+        source      VARCHAR(200) NOT NULL,
+        dim         INT NOT NULL,
+        synced_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS genre_vector (
+        table_name  VARCHAR(20) NOT NULL,
+        genre       VARCHAR(100) NOT NULL,
+        vector      vector NOT NULL,
+        PRIMARY KEY (table_name, genre)
+    )""",
+)
+
+
+def sync_item_vectors(engine, table_name, store, genre_index, method="hnsw"):
+    """Copy a table's item vectors and genre centroids into Postgres for the pgvector engine.
+
+    Vectors live in an ``embedding vector(dim)`` column of the catalog
+    table itself, so the recommender's filters and the similarity order run
+    in one query. A new embedding space (source or dimension) replaces the
+    column; otherwise only changed rows are written. Items without vectors
+    are left NULL and never recommended, as in the in-process engine.
+    """
+    if method not in PGVECTOR_METHODS:
+        raise ValueError(f"Unknown pgvector index '{method}', expected one of {PGVECTOR_METHODS}")
+    present = ~store.empty & (store.ids >= 0)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        for statement in SYNC_TABLES:
+            connection.execute(text(statement))
+        synced = connection.execute(text("SELECT source, dim FROM item_vector_sync WHERE table_name = :table_name"),
+                                    {"table_name": table_name}).one_or_none()
+        if synced is None or tuple(synced) != (store.source, store.dim):
+            connection.execute(text(f"DROP INDEX IF EXISTS {index_name(table_name)}"))
+            connection.execute(text(f"ALTER TABLE {table_name} DROP COLUMN IF EXISTS embedding"))
+            connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN embedding vector({store.dim})"))
+
+        connection.execute(text(f"CREATE TEMP TABLE item_vector_stage (id INT PRIMARY KEY, embedding vector({store.dim})) "
+                                "ON COMMIT DROP"))
+        payload = io.StringIO("".join(f"{item_id}\t{vector_literal(vector)}\n"
+                                      for item_id, vector in zip(store.ids[present].tolist(), store.vectors[present])))
+        with connection.connection.cursor() as cursor:
+            cursor.copy_expert("COPY item_vector_stage (id, embedding) FROM STDIN", payload)
+        updated = connection.execute(text(
+            f"UPDATE {table_name} t SET embedding = s.embedding FROM item_vector_stage s "
+            "WHERE t.id = s.id AND t.embedding IS DISTINCT FROM s.embedding")).rowcount
+        cleared = connection.execute(text(
+            f"UPDATE {table_name} t SET embedding = NULL WHERE t.embedding IS NOT NULL "
+            "AND NOT EXISTS (SELECT 1 FROM item_vector_stage s WHERE s.id = t.id)")).rowcount
+
+        # Centroids are computed here, from the same vectors, so taste vectors match the in-process ones
+        connection.execute(text("DELETE FROM genre_vector WHERE table_name = :table_name"), {"table_name": table_name})
+        centroids = [{"table_name": table_name, "genre": genre, "vector": vector_literal(vector)}
+                     for genre, vector in store.genre_vectors(genre_index).items()]
+        if centroids:
+            connection.execute(text("INSERT INTO genre_vector (table_name, genre, vector) "
+                                    "VALUES (:table_name, :genre, CAST(:vector AS vector))"), centroids)
+
+        existing = connection.execute(text("SELECT indexdef FROM pg_indexes WHERE indexname = :name"),
+                                      {"name": index_name(table_name)}).scalar()
+        if existing is not None and f"USING {method} " not in existing:
+            connection.execute(text(f"DROP INDEX {index_name(table_name)}"))
+            existing = None
+        if existing is None:
+            options = f" WITH (lists = {max(1, int(present.sum()) // IVFFLAT_ROWS_PER_LIST)})" if method == "ivfflat" else ""
+            connection.execute(text(f"CREATE INDEX {index_name(table_name)} ON {table_name} "
+                                    f"USING {method} (embedding vector_cosine_ops){options}"))
+
+        connection.execute(text(
+            "INSERT INTO item_vector_sync (table_name, source, dim, synced_at) "
+            "VALUES (:table_name, :source, :dim, CURRENT_TIMESTAMP) "
+            "ON CONFLICT (table_name) DO UPDATE SET source = EXCLUDED.source, dim = EXCLUDED.dim, "
+            "synced_at = EXCLUDED.synced_at"), {"table_name": table_name, "source": store.source, "dim": store.dim})
+    return {"vectors": int(present.sum()), "updated": updated, "cleared": cleared, "index": method}
+
+
+def load_taste_vector(engine, table_name, ratings=None, favorite_genres=(), reviews=None):
+    """A user's taste vector from the vectors synced to Postgres, or None.
+
+    Same inputs, in the same order, as ``EmbeddingStore.user_vector``, so
+    both engines rank with the same query vector. Only the rated items'
+    vectors and the favorite genres' centroids are read. None until the
+    first sync has created the tables.
+    """
+    with engine.connect() as connection:
+        if connection.execute(text("SELECT to_regclass('item_vector_sync')")).scalar() is None:
+            return None
+        dim = connection.execute(text("SELECT dim FROM item_vector_sync WHERE table_name = :table_name"),
+                                 {"table_name": table_name}).scalar()
+        if dim is None:
+            return None
+        rated = None
+        if ratings is not None and len(ratings):
+            ratings = pd.DataFrame(ratings, columns=["id", "rating"]).drop_duplicates("id", keep="last")
+            rows = connection.execute(
+                text(f"SELECT id, embedding::text FROM {table_name} WHERE id IN :ids AND embedding IS NOT NULL")
+                .bindparams(bindparam("ids", expanding=True)),
+                {"ids": ratings["id"].astype(int).tolist()}).all()
+            vectors = {item_id: parse_vector(value) for item_id, value in rows}
+            ratings = ratings[ratings["id"].isin(list(vectors))]
+            if len(ratings):
+                rated = (ratings["rating"].to_numpy(dtype=np.float32),
+                         np.stack([vectors[item_id] for item_id in ratings["id"].tolist()]))
+        centroids = []
+        if favorite_genres:
+            rows = connection.execute(
+                text("SELECT genre, vector::text FROM genre_vector WHERE table_name = :table_name AND genre IN :genres")
+                .bindparams(bindparam("genres", expanding=True)),
+                {"table_name": table_name, "genres": list(favorite_genres)}).all()
+            stored = {genre: parse_vector(value) for genre, value in rows}
+            centroids = [stored[genre] for genre in favorite_genres if genre in stored]
+    if reviews is not None and reviews[1].shape[1] != dim:
+        reviews = None
+    return combine_taste(rated, reviews, centroids)
+
+
+def similar_items(engine, table_name, columns, taste, k, conditions=(), params=None, exclude_ids=(),
+                  ef_search=100, probes=10, exact=False):
+    """The ``k`` rows matching ``conditions`` most similar to ``taste``, best first, with a similarity column.
+
+    The filters and ``ORDER BY embedding <=> :query_vec`` run in one
+    statement; the few extra rows fetched are re-scored with
+    ``exact_scores`` and cut with ties to the lower id, exactly as the
+    in-process engine ranks. When the rows near the cut are tied within
+    float error (common with content features) the whole tied band is
+    fetched, since pgvector's float32 distances order it arbitrarily.
+    HNSW and IVFFlat are approximate: ``exact`` disables index scans, and a
+    query the index answers short (a very selective filter) is retried
+    exactly.
+    """
+    conditions = list(conditions) + ["embedding IS NOT NULL"]
+    params = dict(params or {})
+    exclude_ids = [int(item_id) for item_id in exclude_ids]
+    if exclude_ids:
+        conditions.append("id NOT IN :exclude_ids")
+        params["exclude_ids"] = exclude_ids
+    params.update(query_vec=vector_literal(taste), fetch=int(k) * OVERSAMPLE)
+    select = (f"SELECT {columns}, embedding::text AS embedding_text, "
+              f"embedding <=> CAST(:query_vec AS vector) AS distance FROM {table_name} WHERE {' AND '.join(conditions)}")
+    # No secondary sort key: pgvector indexes only serve a bare ORDER BY distance
+    sql_query = f"{select} ORDER BY distance LIMIT :fetch"
+
+    def fetch(settings, statement=sql_query):
+        # SET LOCAL ends with the transaction, so pooled connections keep their defaults;
+        # sent with the SELECT as one statement batch
+        query = text(settings + statement).bindparams(*[bindparam(name, expanding=True)
+                                                        for name, value in params.items() if isinstance(value, list)])
+        with engine.begin() as connection:
+            return pd.read_sql(query, connection, params=params)
+
+    exact_scan = "SET LOCAL enable_indexscan = off; "
+    results = fetch(exact_scan if exact else (f"SET LOCAL hnsw.ef_search = {max(int(ef_search), params['fetch'])}; "
+                                              f"SET LOCAL ivfflat.probes = {int(probes)}; "))
+    if not exact and len(results) < k:
+        results = fetch(exact_scan)
+    if len(results) == params["fetch"] and results["distance"].iloc[-1] <= results["distance"].iloc[k - 1] + SCORE_SLACK:
+        params["cutoff"] = float(results["distance"].iloc[k - 1] + SCORE_SLACK)
+        results = fetch("", f"{select} AND embedding <=> CAST(:query_vec AS vector) <= :cutoff")
+    results = results.drop(columns="distance")
+    if results.empty:
+        return results.drop(columns="embedding_text").assign(similarity=np.empty(0))
+    vectors = np.stack(results["embedding_text"].map(parse_vector).to_numpy())
+    scores = exact_scores(vectors, taste)
+    best = np.lexsort((results["id"].to_numpy(), -scores))[:k]
+    return results.iloc[best].drop(columns="embedding_text").assign(similarity=scores[best]).reset_index(drop=True)
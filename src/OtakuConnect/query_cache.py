@@ -0,0 +1,164 @@
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+# "memory": per-process LRU; "postgres": the same LRU in front of the shared query_cache table
+QUERY_CACHE_BACKENDS = ("off", "memory", "postgres")
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize_message(message):
+    """Case-folded message with runs of punctuation and whitespace folded to single spaces.
+
+    "Show me the BEST comedy anime!" and "show me the best comedy anime"
+    share one cache entry; digits are kept, so "5 action anime" and
+    "10 action anime" do not.
+    """
+    return _SEPARATORS.sub(" ", unicodedata.normalize("NFKC", str(message or "")).casefold()).strip()
+
+
+def query_key(namespace, normalized):
+    """Shared-store key of a normalized message for one parser version."""
+    return hashlib.sha256(f"{namespace}\x1f{normalized}".encode()).hexdigest()
+
+
+class PostgresQueryStore:
+    """Parsed queries in the ``query_cache`` table, shared by every app worker."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def get(self, key, ttl):
+        """``(parsed, age in seconds)`` of a row younger than ``ttl``, or None."""
+        with self.engine.connect() as connection:
+            row = connection.execute(text(
+                "SELECT parsed, EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - created_at) FROM query_cache "
+                "WHERE query_hash = :key AND created_at > CURRENT_TIMESTAMP - make_interval(secs => :ttl)"),
+                {"key": key, "ttl": ttl}).one_or_none()
+        if row is None:
+            return None
+        parsed = row[0] if isinstance(row[0], dict) else json.loads(row[0])
+        return parsed, float(row[1])
+
+    def put(self, key, message, parsed):
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO query_cache (query_hash, message, parsed) VALUES (:key, :message, CAST(:parsed AS JSONB)) "
+                "ON CONFLICT (query_hash) DO UPDATE SET parsed = EXCLUDED.parsed, created_at = CURRENT_TIMESTAMP"),
+                {"key": key, "message": message, "parsed": json.dumps(parsed)})
+
+
+class QueryCache:
+    """LRU of parsed chatbot queries keyed by normalized message, with a TTL.
+
+    Lookups go to the in-process LRU first and then to the optional shared
+    ``store``, whose hits are copied into the LRU for the rest of their
+    TTL. ``namespace`` identifies the parser (model and prompt), so answers
+    from an older prompt are never served. Callers get their own copy of a
+    cached answer. A failing shared store is logged and skipped: the cache
+    never fails a search.
+    """
+
+    def __init__(self, namespace, max_entries=1024, ttl=86400, store=None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "stores": 0,
+                      "shared_errors": 0}
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, message):
+        """Copy of the cached answer for ``message``, or None."""
+        normalized = normalize_message(message)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(normalized)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(normalized)
+                    self.stats["hits"] += 1
+                    return copy.deepcopy(entry[1])
+                del self._entries[normalized]
+                self.stats["expired"] += 1
+
+        if self.store is not None:
+            try:
+                found = self.store.get(query_key(self.namespace, normalized), self.ttl)
+            except Exception as e:
+                self.stats["shared_errors"] += 1
+                print(f"Query cache store error: {e}")
+                found = None
+            if found is not None:
+                parsed, age = found
+                with self._lock:
+                    self.stats["shared_hits"] += 1
+                    self._remember(normalized, parsed, now + max(self.ttl - age, 0))
+                return copy.deepcopy(parsed)
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, message, parsed):
+        """Cache a fresh answer here and in the shared store."""
+        normalized = normalize_message(message)
+        parsed = copy.deepcopy(parsed)
+        with self._lock:
+            self.stats["stores"] += 1
+            self._remember(normalized, parsed, time.monotonic() + self.ttl)
+        if self.store is not None:
+            try:
+                self.store.put(query_key(self.namespace, normalized), normalized, parsed)
+            except Exception as e:
+                self.stats["shared_errors"] += 1
+                print(f"Query cache store error: {e}")
+
+    def _remember(self, normalized, parsed, expires_at):
+        self._entries[normalized] = (expires_at, parsed)
+        self._entries.move_to_end(normalized)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def summary(self):
+        lookups = self.stats["hits"] + self.stats["shared_hits"] + self.stats["misses"]
+        return {**self.stats, "entries": len(self._entries), "max_entries": self.max_entries, "ttl": self.ttl,
+                "shared": self.store is not None,
+                "hit_rate": (self.stats["hits"] + self.stats["shared_hits"]) / lookups if lookups else 0.0}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache(namespace, config, engine=None):
+    """Return the query cache shared by every session in this process, or None when it is off.
+
+    Built from ``config`` on first use, like get_embedding_pipeline.
+    """
+    global _cache
+    if config.QUERY_CACHE_BACKEND == "off":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if config.QUERY_CACHE_BACKEND not in QUERY_CACHE_BACKENDS:
+                    raise ValueError(f"Unknown query cache backend '{config.QUERY_CACHE_BACKEND}', "
+                                     f"expected one of {QUERY_CACHE_BACKENDS}")
+                store = PostgresQueryStore(engine) if config.QUERY_CACHE_BACKEND == "postgres" and engine else None
+                _cache = QueryCache(namespace, config.QUERY_CACHE_SIZE, config.QUERY_CACHE_TTL_SECONDS, store)
+    return _cache
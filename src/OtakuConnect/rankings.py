@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+
+def top_n(df, column, n, ascending=False):
+    """Rows with the n largest (or smallest) values of a column, in order.
+
+    Uses argpartition so only the selected n rows (and any tied with the
+    n-th) are sorted; missing values always rank last and ties keep catalog
+    order.
+    """
+    values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    if not ascending:
+        values = -values
+    values = np.where(np.isnan(values), np.inf, values)
+
+    n = min(n, len(values))
+    if n == 0:
+        return df.iloc[:0]
+    if n < len(values):
+        # argpartition picks arbitrarily among rows tied with the n-th value, so take all of them
+        kth = values[np.argpartition(values, n - 1)[n - 1]]
+        candidates = np.flatnonzero(values <= kth)
+    else:
+        candidates = np.arange(len(values))
+    order = candidates[np.lexsort((candidates, values[candidates]))][:n]
+    return df.iloc[order]
+
+
+def recent_releases(df, months, today=None):
+    """Titles that started within the last ``months`` months, newest first, with a picture."""
+    today = today or pd.Timestamp.today()
+    start = df["start_date"]
+    recent = df[(start > today - pd.DateOffset(months=months)) & (start <= today) & df["has_picture"]]
+    return recent.sort_values("start_date", ascending=False)
+
+
+def build_rankings(df, n=20, recent_months=3):
+    """Precompute the home-page slices for one catalog."""
+    return {
+        "top_rated": top_n(df, "mean", n),
+        # MAL popularity is a rank: 1 is the most popular title
+        "most_viewed": top_n(df, "popularity", n, ascending=True),
+        "recent": recent_releases(df, recent_months)[["id", "title", "main_picture", "has_picture"]],
+    }
+
+
+def get_rankings(catalog, table_name, df=None, n=20, recent_months=3):
+    """Home-page rankings for a catalog table, computed once per catalog version."""
+    return catalog.derived(table_name, ("rankings", n, recent_months),
+                           lambda frame: build_rankings(frame, n, recent_months), df=df)
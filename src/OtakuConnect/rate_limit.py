@@ -0,0 +1,50 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker that calls one API.
+
+    ``rate`` tokens are added per second up to ``capacity``; ``acquire``
+    blocks until a token is available. ``pause`` stops all callers for a
+    while, e.g. when the server answers 429 with a Retry-After header.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def _refill(self, now):
+        # _updated may sit in the future while paused; tokens start refilling after it
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def acquire(self, tokens=1):
+        """Block until ``tokens`` are available, then take them."""
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.waited_seconds += now - started
+                    return
+                wait = max(self._paused_until - now, (tokens - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold back every caller for ``seconds`` and drop the accumulated burst."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = max(now, self._paused_until)
@@ -0,0 +1,183 @@
+import bisect
+import re
+import unicodedata
+from collections import defaultdict, namedtuple
+
+import numpy as np
+
+SearchHit = namedtuple("SearchHit", ["row", "rank", "position"])
+
+# Match classes, best first
+EXACT, PREFIX, WORD_START, SUBSTRING, ALL_WORDS = range(5)
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_EMPTY = np.empty(0, dtype=np.int32)
+_MAX_CHAR = "\uffff"
+
+
+def normalize_title(title):
+    """Casefold, strip accents and fold punctuation/whitespace runs into single spaces."""
+    if not isinstance(title, str):
+        return ""
+    text = unicodedata.normalize("NFKD", title)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _intersect_sorted(a, b):
+    """Intersection of two sorted, unique int arrays."""
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a):
+        return a
+    idx = np.searchsorted(b, a)
+    idx[idx == len(b)] = 0
+    return a[b[idx] == a]
+
+
+class TitleSearchIndex:
+    """Inverted index over one catalog's titles, aligned with DataFrame row positions.
+
+    Three structures answer a query, best match class first:
+      * a sorted copy of the normalized titles for exact/prefix matches (bisect),
+      * a sorted token vocabulary with postings for word-start matches,
+      * trigram postings for matches anywhere in the title.
+    Within a class, shorter titles rank first. Each hit carries the character
+    position of the match in the normalized title.
+    """
+
+    def __init__(self, titles):
+        self.titles = [normalize_title(t) for t in titles]
+        self.lengths = np.fromiter((len(t) for t in self.titles), dtype=np.int32, count=len(self.titles))
+
+        order = sorted(range(len(self.titles)), key=self.titles.__getitem__)
+        self.sorted_titles = [self.titles[i] for i in order]
+        self.sorted_rows = np.array(order, dtype=np.int32)
+
+        trigram_rows = defaultdict(list)
+        token_rows = defaultdict(list)
+        for row, title in enumerate(self.titles):
+            for gram in _trigrams(title):
+                trigram_rows[gram].append(row)
+            for token in set(title.split()):
+                token_rows[token].append(row)
+
+        self.trigrams = {gram: np.array(rows, dtype=np.int32) for gram, rows in trigram_rows.items()}
+        self.tokens = sorted(token_rows)
+        self.token_postings = [np.array(token_rows[token], dtype=np.int32) for token in self.tokens]
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _prefix_rows(self, term):
+        lo = bisect.bisect_left(self.sorted_titles, term)
+        hi = bisect.bisect_left(self.sorted_titles, term + _MAX_CHAR)
+        return np.sort(self.sorted_rows[lo:hi])
+
+    def _word_rows(self, term):
+        lo = bisect.bisect_left(self.tokens, term)
+        hi = bisect.bisect_left(self.tokens, term + _MAX_CHAR)
+        if lo == hi:
+            return _EMPTY
+        if hi - lo == 1:
+            return self.token_postings[lo]
+        return np.unique(np.concatenate(self.token_postings[lo:hi]))
+
+    def _substring_rows(self, term):
+        postings = []
+        for gram in _trigrams(term):
+            rows = self.trigrams.get(gram)
+            if rows is None:
+                return _EMPTY
+            postings.append(rows)
+        postings.sort(key=len)
+        rows = postings[0]
+        for other in postings[1:]:
+            rows = _intersect_sorted(rows, other)
+            if not len(rows):
+                return _EMPTY
+        if len(term) > 3:
+            # Sharing every trigram does not guarantee the whole term is present
+            titles = self.titles
+            rows = rows[np.fromiter((term in titles[r] for r in rows), dtype=bool, count=len(rows))]
+        return rows
+
+    def _by_length(self, rows):
+        return rows[np.argsort(self.lengths[rows], kind="stable")]
+
+    def search(self, query, limit=None):
+        """Return ranked SearchHits for a free-text title query.
+
+        Lower match classes are only computed while fewer than ``limit``
+        hits have been found.
+        """
+        term = normalize_title(query)
+        if not term:
+            return []
+
+        groups = []
+        found = 0
+
+        prefix = self._prefix_rows(term)
+        exact = prefix[self.lengths[prefix] == len(term)]
+        prefix = np.setdiff1d(prefix, exact, assume_unique=True)
+        seen = np.union1d(exact, prefix)
+        for rank, rows in ((EXACT, exact), (PREFIX, prefix)):
+            groups.append((rank, self._by_length(rows)))
+            found += len(rows)
+
+        if limit is None or found < limit:
+            words = np.setdiff1d(self._word_rows(term), seen, assume_unique=True)
+            groups.append((WORD_START, self._by_length(words)))
+            found += len(words)
+            seen = np.union1d(seen, words)
+
+        if len(term) >= 3 and (limit is None or found < limit):
+            inside = np.setdiff1d(self._substring_rows(term), seen, assume_unique=True)
+            groups.append((SUBSTRING, self._by_length(inside)))
+            found += len(inside)
+
+        tokens = term.split()
+        if not found and len(tokens) > 1:
+            groups.append((ALL_WORDS, self._by_length(self._all_words_rows(tokens))))
+
+        hits = []
+        for rank, rows in groups:
+            if limit is not None:
+                rows = rows[:limit - len(hits)]
+            hits.extend(SearchHit(int(row), rank, self._position(row, rank, term, tokens)) for row in rows)
+        return hits
+
+    def _all_words_rows(self, tokens):
+        """Fallback for multi-word queries: every word must start a word in the title."""
+        rows = None
+        for token in tokens:
+            candidates = self._word_rows(token)
+            rows = candidates if rows is None else _intersect_sorted(rows, candidates)
+            if not len(rows):
+                return _EMPTY
+        return rows
+
+    def _position(self, row, rank, term, tokens):
+        title = self.titles[row]
+        if rank <= PREFIX:
+            return 0
+        if rank == WORD_START:
+            return title.find(" " + term) + 1
+        if rank == SUBSTRING:
+            return title.find(term)
+        return 0 if title.startswith(tokens[0]) else title.find(" " + tokens[0]) + 1
+
+    def search_rows(self, query, limit=None):
+        """Row positions of the ranked matches, ready for ``df.iloc``."""
+        return [hit.row for hit in self.search(query, limit)]
+
+
+def get_title_index(catalog, table_name, df=None):
+    """Title search index for a catalog table, built once per catalog version."""
+    return catalog.derived(table_name, "title_index",
+                           lambda frame: TitleSearchIndex(frame["title"].tolist()), df=df)